@@ -0,0 +1,58 @@
+# Stored baselines, regression checks and percentiles shared by the bench_* scripts.
+# percentile() is the package's own, so benchmarks and the API's /metrics agree.
+#
+# A baseline is a JSON object of metric name -> value, where lower is better
+# (latencies, bytes). --save-baseline writes the current run, and
+# --baseline compares against a stored run and exits with status 1 when a
+# metric got worse by more than --tolerance.
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from epidemiccare.metrics import percentile  # noqa: E402,F401
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+
+
+def default_path(name):
+    return os.path.join(BASELINE_DIR, f"{name}.json")
+
+
+def add_arguments(parser, name):
+    parser.add_argument("--baseline", nargs="?", const=default_path(name), metavar="PATH",
+                        help=f"compare with a stored run (default {os.path.relpath(default_path(name))})")
+    parser.add_argument("--save-baseline", nargs="?", const=default_path(name), metavar="PATH",
+                        help="store this run as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed slowdown as a fraction of the baseline (default 0.2)")
+
+
+# (metric, baseline, current) for each metric more than `tolerance` worse than its baseline
+def regressions(baseline, metrics, tolerance):
+    found = []
+    for metric, value in metrics.items():
+        expected = baseline.get(metric)
+        if expected is not None and value > expected * (1 + tolerance):
+            found.append((metric, expected, value))
+    return found
+
+
+# Save and/or check a run's metrics as requested on the command line
+def report(args, metrics):
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save_baseline)), exist_ok=True)
+        with open(args.save_baseline, "w") as f:
+            json.dump(metrics, f, indent=2, sort_keys=True)
+        print(f"baseline saved to {args.save_baseline}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        found = regressions(baseline, metrics, args.tolerance)
+        for metric, expected, value in found:
+            print(f"REGRESSION {metric}: {value:.4g} vs baseline {expected:.4g} "
+                  f"(+{(value / expected - 1) * 100:.0f}%)")
+        if found:
+            sys.exit(1)
+        print(f"no regressions beyond {args.tolerance:.0%} of {args.baseline}")
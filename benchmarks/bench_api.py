@@ -0,0 +1,92 @@
+# Latency and throughput of the triage API under concurrent clients.
+#
+# Starts the API on the built-in server in this process and keeps
+# --concurrency keep-alive connections busy with /triage requests.
+#
+#   python benchmarks/bench_api.py --requests 20000 --concurrency 64 --max-batch-size 64 --max-wait-ms 2
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from baseline import percentile  # noqa: E402
+from epidemiccare.api import TriageAPI, serve  # noqa: E402
+
+
+def payloads(count, seed=0):
+    rng = random.Random(seed)
+    bodies = []
+    for _ in range(count):
+        answers = {f"symptom_{step}": rng.choice(("Yes", "No", "Not sure")) for step in range(3, 10)}
+        body = json.dumps({"answers": answers}).encode()
+        bodies.append(b"POST /triage HTTP/1.1\r\nhost: localhost\r\ncontent-type: application/json\r\n"
+                      b"content-length: %d\r\n\r\n%s" % (len(body), body))
+    return bodies
+
+
+async def read_response(reader):
+    length = 0
+    status = int((await reader.readline()).split()[1])
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.partition(b":")
+        if name.strip().lower() == b"content-length":
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+
+async def client(port, requests, latencies):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    for request in requests:
+        start = time.perf_counter()
+        writer.write(request)
+        await writer.drain()
+        if await read_response(reader) != 200:
+            raise RuntimeError("request failed")
+        latencies.append(time.perf_counter() - start)
+    writer.close()
+
+
+async def run(args):
+    app = TriageAPI(args.max_batch_size, args.max_wait_ms / 1000)
+    server = asyncio.get_running_loop().create_task(serve(app, "127.0.0.1", args.port))
+    await asyncio.sleep(0.2)
+
+    bodies = payloads(args.requests)
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(client(args.port, bodies[i::args.concurrency], latencies)
+                           for i in range(args.concurrency)))
+    elapsed = time.perf_counter() - start
+    server.cancel()
+
+    latencies.sort()
+    sizes = app.batcher.batch_sizes
+    print(f"{len(latencies)} requests, {args.concurrency} clients, "
+          f"max batch {args.max_batch_size}, max wait {args.max_wait_ms} ms")
+    print(f"  client p50 {percentile(latencies, 0.5) * 1000:.2f} ms, "
+          f"p99 {percentile(latencies, 0.99) * 1000:.2f} ms, "
+          f"{len(latencies) / elapsed:,.0f} requests/s")
+    print(f"  server {app.stats.snapshot()['latency_ms']}, mean batch {sum(sizes) / len(sizes):.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Triage API load test")
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--max-batch-size", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=2.0)
+    parser.add_argument("--port", type=int, default=8765)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# Bytes per page view and time to first render of the welcome page with
+# the self-hosted assets.
+#
+# Reports each asset raw and pre-compressed, what a first and a repeat visit
+# transfer, and the stylesheet markup sent with every rerun, inlined or as a
+# cached link. --app-test also times the welcome page's first run through
+# AppTest, the server side of first render, for this tree and for --app
+# (e.g. an older checkout that hot-links its image). The old hero image is
+# fetched once to size it, when the network allows.
+#
+#   python benchmarks/bench_assets.py
+#   python benchmarks/bench_assets.py --app-test --app /tmp/old/streamlit_app.py
+import argparse
+import logging
+import os
+import statistics
+import sys
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from epidemiccare.assets import STATIC_DIR, AssetBundle  # noqa: E402
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "streamlit_app.py")
+OLD_HERO = "https://images.unsplash.com/photo-1576091160399-112ba8d25d1f?ixlib=rb-1.2.1&auto=format&fit=crop&w=800&q=80"
+BROWSER_ENCODINGS = b"gzip, deflate, br"
+
+
+def remote_size(url, timeout=5):
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            return len(response.read())
+    except OSError:
+        return None
+
+
+def first_render(app, runs, asset_url=None):
+    from streamlit.testing.v1 import AppTest
+
+    import epidemiccare.assets
+
+    # Stands in for EPIDEMICCARE_ASSET_URL, which is read once at import
+    epidemiccare.assets._default_bundle = AssetBundle(base_url=asset_url)
+    times = []
+    for _ in range(runs + 1):
+        at = AppTest.from_file(app, default_timeout=120)
+        start = time.perf_counter()
+        at.run()
+        times.append(time.perf_counter() - start)
+        markup = sum(len(element.value) for element in at.markdown)
+    # The first run pays for imports
+    return statistics.median(times[1:]), markup
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Welcome page bytes and first render time")
+    parser.add_argument("--app-test", action="store_true", help="time the welcome page through AppTest")
+    parser.add_argument("--app", help="older app script to compare against")
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    bundle = AssetBundle(STATIC_DIR, base_url="/static")
+    print(f"{'asset':<24} {'raw':>7} {'gzip':>7} {'br':>7}")
+    for asset in bundle.assets.values():
+        sizes = [len(asset.data)] + [len(asset.encodings[name]) if name in asset.encodings else None
+                                     for name in ("gzip", "br")]
+        print(f"{asset.fingerprinted:<24} " + " ".join(f"{size:7d}" if size else f"{'-':>7}" for size in sizes))
+
+    first = 0
+    revalidate = 0
+    for name, asset in bundle.assets.items():
+        _, headers, body = bundle.response(asset.fingerprinted, BROWSER_ENCODINGS)
+        first += len(body) + sum(len(key) + len(value) + 4 for key, value in headers)
+        _, headers, body = bundle.response(name, BROWSER_ENCODINGS, asset.etag)
+        revalidate += sum(len(key) + len(value) + 4 for key, value in headers)
+    print(f"first visit {first} bytes of assets; repeat visits 0 (immutable), {revalidate} to revalidate")
+
+    inline = AssetBundle(STATIC_DIR).stylesheet_tag("app.css")
+    link = bundle.stylesheet_tag("app.css")
+    print(f"stylesheet markup per rerun: {len(inline)} bytes inlined, {len(link)} bytes as a link")
+
+    size = remote_size(OLD_HERO)
+    print(f"old hot-linked hero image: {f'{size} bytes' if size else 'unreachable (as on an air-gapped network)'}")
+
+    if args.app_test:
+        logging.getLogger("streamlit").setLevel(logging.ERROR)
+        sys.path.insert(0, os.path.dirname(APP))
+        for label, app, asset_url in (("inlined", APP, None), ("linked", APP, "/static"),
+                                      ("--app", args.app, None)):
+            if app is None:
+                continue
+            seconds, markup = first_render(app, args.runs, asset_url)
+            print(f"welcome page, {label:<8} first render {seconds * 1000:6.1f} ms, {markup} bytes of markup")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# Credential throughput: logins per second per core at each hashing pool
+# size, and the cost of the token check every signed-in rerun makes.
+#
+# --clients threads log in concurrently against an in-memory store, so the
+# figures are the hashing pool's alone. Rate limits are lifted for the run.
+#
+#   python benchmarks/bench_auth.py --logins 200 --clients 16
+#   python benchmarks/bench_auth.py --save-baseline
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from baseline import add_arguments, report  # noqa: E402
+from epidemiccare.auth import CredentialStore, RateLimiter, hash_password  # noqa: E402
+from epidemiccare.storage import MemoryStorage  # noqa: E402
+
+PASSWORD = "bench-password"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Login throughput per core")
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--clients", type=int, default=16, help="concurrent login threads")
+    add_arguments(parser, "auth")
+    args = parser.parse_args()
+
+    storage = MemoryStorage()
+    encoded = hash_password(PASSWORD)
+    emails = [f"patient{i}@example.com" for i in range(args.logins)]
+    for email in emails:
+        storage.set_password_hash(email, encoded)
+
+    cores = os.cpu_count()
+    metrics = {}
+    for workers in sorted({1, max(cores // 2, 1), cores}):
+        unlimited = RateLimiter(0, float("inf"))
+        store = CredentialStore(storage, workers=workers, account_limiter=unlimited, address_limiter=unlimited)
+        with ThreadPoolExecutor(args.clients) as clients:
+            start = time.perf_counter()
+            tokens = list(clients.map(lambda email: store.login(email, PASSWORD, "127.0.0.1"), emails))
+            wall = time.perf_counter() - start
+        rate = len(tokens) / wall
+        print(f"pool {workers:>3}: {rate:7.1f} logins/s, {rate / workers:6.1f} per core, "
+              f"{wall / len(tokens) * 1000 * args.clients:6.1f} ms per login at {args.clients} clients")
+        metrics[f"ms_per_login_{workers}_workers"] = 1000 / rate
+
+    # What a signed-in rerun pays instead of a verification: a cached token lookup,
+    # and a signature check when the cache does not hold the token
+    calls = 100000
+    token = tokens[0]
+    start = time.perf_counter()
+    for _ in range(calls):
+        store.session_user(token)
+    cached = (time.perf_counter() - start) / calls
+    fresh = CredentialStore(storage, workers=1, secret=store.secret)
+    start = time.perf_counter()
+    for _ in range(calls // 10):
+        fresh._tokens.clear()
+        fresh.session_user(token)
+    uncached = (time.perf_counter() - start) / (calls // 10)
+    print(f"token check: {cached * 1e6:.2f} us cached, {uncached * 1e6:.2f} us uncached")
+    metrics["token_check_us"] = cached * 1e6
+    report(args, metrics)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# Accuracy, calibration and latency of the naive-Bayes diagnosis against the
+# match-count heuristic, on synthetic patients.
+#
+# Each patient has one disease from the catalog, reports each of its listed
+# symptoms with probability --sensitivity and any other symptom with
+# probability --noise, and answers "Not sure" to a --unsure share of them.
+#
+#   python benchmarks/bench_bayes.py --patients 20000
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from epidemiccare.bayes import BayesModel  # noqa: E402
+from epidemiccare.engine import TriageEngine  # noqa: E402
+from epidemiccare.knowledge import get_knowledge_base  # noqa: E402
+
+
+def synthetic_patients(model, count, sensitivity, noise, unsure, seed=0):
+    rng = random.Random(seed)
+    vocabulary = list(model.vocabulary)
+    patients = []
+    labels = []
+    for _ in range(count):
+        label = rng.randrange(len(model.disease_names))
+        listed = set(np.flatnonzero(model.membership[label]).tolist())
+        present, absent = [], []
+        for col, symptom in enumerate(vocabulary):
+            if rng.random() < unsure:
+                continue
+            reported = rng.random() < (sensitivity if col in listed else noise)
+            (present if reported else absent).append(symptom)
+        patients.append((present, absent))
+        labels.append(label)
+    return patients, np.array(labels)
+
+
+def heuristic_top1(engine, patients):
+    # Ties go to catalog order, as in generate_diagnosis()
+    counts = engine.match_counts(engine.encode(present for present, _ in patients))
+    return np.argmax(counts, axis=1)
+
+
+def reliability(posteriors, labels, bins=5):
+    confidence = posteriors.max(axis=1)
+    correct = posteriors.argmax(axis=1) == labels
+    rows = []
+    edges = np.linspace(0, 1, bins + 1)
+    for low, high in zip(edges[:-1], edges[1:]):
+        mask = (confidence > low) & (confidence <= high)
+        if mask.any():
+            rows.append((low, high, int(mask.sum()), confidence[mask].mean(), correct[mask].mean()))
+    return rows
+
+
+def log_loss(posteriors, labels):
+    return float(-np.log(np.clip(posteriors[np.arange(len(labels)), labels], 1e-12, 1)).mean())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Naive-Bayes diagnosis vs the match-count heuristic")
+    parser.add_argument("--patients", type=int, default=20000)
+    parser.add_argument("--sensitivity", type=float, default=0.75)
+    parser.add_argument("--noise", type=float, default=0.08)
+    parser.add_argument("--unsure", type=float, default=0.2)
+    args = parser.parse_args()
+
+    diseases = get_knowledge_base().diseases
+    engine = TriageEngine(diseases)
+    model = BayesModel(diseases)
+    patients, labels = synthetic_patients(model, args.patients, args.sensitivity, args.noise, args.unsure)
+    half = len(patients) // 2
+
+    # Calibrate the two model parameters on the first half, evaluate on the second
+    best = None
+    for sensitivity in (0.6, 0.7, 0.8, 0.85, 0.9, 0.95):
+        for false_positive in (0.02, 0.05, 0.1, 0.15, 0.2):
+            candidate = BayesModel(diseases, sensitivity, false_positive)
+            loss = log_loss(candidate.posterior(candidate.encode_many(patients[:half])), labels[:half])
+            if best is None or loss < best[0]:
+                best = (loss, sensitivity, false_positive)
+    print(f"Calibrated sensitivity={best[1]} false_positive={best[2]} (train log loss {best[0]:.3f})")
+    calibrated = BayesModel(diseases, best[1], best[2])
+
+    test, test_labels = patients[half:], labels[half:]
+    evidence = calibrated.encode_many(test)
+    posteriors = calibrated.posterior(evidence)
+    print(f"Top-1 accuracy on {len(test)} patients:")
+    print(f"  heuristic       {(heuristic_top1(engine, test) == test_labels).mean():.3f}")
+    print(f"  bayes (default) {(model.posterior(model.encode_many(test)).argmax(axis=1) == test_labels).mean():.3f}")
+    print(f"  bayes (fitted)  {(posteriors.argmax(axis=1) == test_labels).mean():.3f}"
+          f"  log loss {log_loss(posteriors, test_labels):.3f}")
+    print("Reliability (confidence bin, patients, mean confidence, accuracy):")
+    for low, high, count, confidence, accuracy in reliability(posteriors, test_labels):
+        print(f"  ({low:.1f}, {high:.1f}]  {count:6d}  {confidence:.3f}  {accuracy:.3f}")
+
+    sample = test[:2000]
+    start = time.perf_counter()
+    for present, absent in sample:
+        engine.diagnose(present, 2)
+    heuristic = (time.perf_counter() - start) / len(sample)
+    start = time.perf_counter()
+    for present, absent in sample:
+        calibrated.diagnose(present, absent, limit=2)
+    bayes = (time.perf_counter() - start) / len(sample)
+    start = time.perf_counter()
+    calibrated.posterior(evidence)
+    batch = (time.perf_counter() - start) / len(test)
+    print(f"Latency per patient: heuristic {heuristic * 1e6:.1f} us, bayes {bayes * 1e6:.1f} us, "
+          f"bayes batch posterior {batch * 1e6:.2f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+# Scripted end-to-end consultations through AppTest: welcome, sign-up,
+# every question the scheduler asks, results and a daily check-in, with the
+# latency and (with --memory) the allocation peak of every rerun.
+#
+# ScriptedConsultation advances one interaction per step(), so bench_load.py
+# can interleave many of them.
+#
+#   python benchmarks/bench_consultation.py --consultations 20 --memory
+#   python benchmarks/bench_consultation.py --baseline
+import argparse
+import logging
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+import uuid
+from collections import defaultdict
+
+from streamlit.testing.v1 import AppTest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from baseline import add_arguments, percentile, report  # noqa: E402
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "streamlit_app.py")
+
+ANSWERS = ("Yes", "No", "Not sure")
+PASSWORD = "bench-password"
+
+
+class ScriptedConsultation:
+    def __init__(self, app=APP, seed=0, email=None, memory=False):
+        self.at = AppTest.from_file(app, default_timeout=120)
+        self.rng = random.Random(seed)
+        # A fresh address, so sign-up does not restore an earlier run's consultation
+        self.email = email or f"patient{seed}-{uuid.uuid4().hex[:8]}@example.com"
+        self.memory = memory
+        self.stage = "welcome"
+        self.done = False
+
+    # Run one interaction; returns (stage, seconds, peak bytes or None)
+    def _run(self, stage, interaction):
+        if self.memory:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        interaction().run()
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] - before if self.memory else None
+        if self.at.exception:
+            raise RuntimeError(f"{stage}: {self.at.exception[0].value}")
+        return stage, elapsed, peak
+
+    def _step_key(self):
+        keys = [button.key for button in self.at.button if button.key and button.key.startswith("button_")]
+        return int(keys[0][len("button_"):]) if keys else None
+
+    def _answer(self, step):
+        at = self.at
+        if step == 0:
+            at.text_input(key="input_0").input("Bench")
+        elif step == 1:
+            at.number_input(key="input_1").set_value(self.rng.randint(1, 90))
+        elif step == 2:
+            at.text_input(key="input_2").input(self.rng.choice(("None", "asthma", "diabetes, stuffy nose")))
+        else:
+            at.radio(key=f"input_{step}").set_value(self.rng.choice(ANSWERS))
+        return at.button(key=f"button_{step}").click()
+
+    def _checkin(self):
+        at = self.at
+        at.slider(key="daily_rating").set_value(self.rng.randint(1, 10))
+        at.multiselect[0].set_value(self.rng.sample(["Fever", "Cough", "Headache", "Fatigue"], 2))
+        medication = next(box for box in at.checkbox if box.label == "I took my medication as prescribed")
+        if self.rng.random() < 0.8:
+            medication.check()
+        else:
+            medication.uncheck()
+        return at.button(key="save_progress").click()
+
+    def step(self):
+        at = self.at
+        if self.stage == "welcome":
+            self.stage = "signup"
+            return self._run("welcome", lambda: at)
+        if self.stage == "signup":
+            self.stage = "signup_form"
+            return self._run("open_signup", lambda: at.button(key="welcome_btn").click())
+        if self.stage == "signup_form":
+            at.text_input(key="reg_name").input("Bench Patient")
+            at.text_input(key="reg_email").input(self.email)
+            at.text_input(key="reg_password").input(PASSWORD)
+            at.text_input(key="reg_confirm").input(PASSWORD)
+            self.stage = "questions"
+            return self._run("signup", lambda: at.button(key="reg_btn").click())
+        if self.stage == "questions":
+            step = self._step_key()
+            if step is not None:
+                return self._run(f"question_{step}", lambda: self._answer(step))
+            self.stage = "checkin"
+            return self._run("results", lambda: at)
+        if self.stage == "checkin":
+            self.done = True
+            return self._run("checkin", self._checkin)
+        raise RuntimeError("consultation already finished")
+
+    # Every sample of a whole consultation
+    def run(self):
+        samples = []
+        while not self.done:
+            samples.append(self.step())
+        return samples
+
+
+def summarize(samples):
+    by_stage = defaultdict(list)
+    for stage, elapsed, peak in samples:
+        by_stage[stage].append((elapsed, peak))
+    latencies = sorted(elapsed for _, elapsed, _ in samples)
+    print(f"{'stage':<14} {'reruns':>6} {'p50 ms':>8} {'max ms':>8} {'peak KiB':>9}")
+    for stage, values in by_stage.items():
+        times = [elapsed for elapsed, _ in values]
+        peaks = [peak for _, peak in values if peak is not None]
+        peak = f"{max(peaks) / 1024:9.0f}" if peaks else f"{'-':>9}"
+        print(f"{stage:<14} {len(values):>6} {statistics.median(times) * 1000:8.1f} {max(times) * 1000:8.1f} {peak}")
+    metrics = {
+        "rerun_p50_ms": statistics.median(latencies) * 1000,
+        "rerun_p99_ms": percentile(latencies, 0.99) * 1000,
+    }
+    peaks = [peak for _, _, peak in samples if peak is not None]
+    if peaks:
+        metrics["rerun_peak_kib"] = max(peaks) / 1024
+    print(f"all reruns: p50={metrics['rerun_p50_ms']:.1f} ms p99={metrics['rerun_p99_ms']:.1f} ms")
+    return metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scripted end-to-end consultations")
+    parser.add_argument("--consultations", type=int, default=20)
+    parser.add_argument("--memory", action="store_true", help="trace allocation peaks (slower)")
+    parser.add_argument("--app", default=APP, help="app script to load, e.g. an older checkout")
+    add_arguments(parser, "consultation")
+    args = parser.parse_args()
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+
+    # streamlit run puts the app directory on sys.path; AppTest does not
+    sys.path.insert(0, os.path.dirname(os.path.abspath(args.app)))
+    if args.memory:
+        tracemalloc.start()
+
+    # The first consultation pays for imports and cache warm-up and is not counted
+    ScriptedConsultation(args.app, seed=-1).run()
+    samples = []
+    start = time.perf_counter()
+    for seed in range(args.consultations):
+        samples.extend(ScriptedConsultation(args.app, seed, memory=args.memory).run())
+    wall = time.perf_counter() - start
+    print(f"{args.consultations} consultations, {len(samples)} reruns, "
+          f"{wall / args.consultations * 1000:.0f} ms per consultation")
+    report(args, summarize(samples))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+# Micro-benchmarks of the scoring functions and treatment-plan lookup
+# across catalog sizes.
+#
+# Each catalog size gets a synthetic knowledge base: the real diseases plus
+# made-up ones over a proportionally larger symptom vocabulary, with the
+# real questions, plans and synonyms. Per-call times are the best of
+# --repeat runs over the same patients. "uncached" bypasses the shared
+# assessment cache; "cached" is the steady state of a busy server.
+#
+#   python benchmarks/bench_core.py --sizes 5,50,500,5000 --patients 2000
+#   python benchmarks/bench_core.py --save-baseline
+#   python benchmarks/bench_core.py --baseline
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from baseline import add_arguments, report  # noqa: E402
+from epidemiccare.bayes import BayesModel  # noqa: E402
+from epidemiccare.cache import LRUCache  # noqa: E402
+from epidemiccare.core import Triage  # noqa: E402
+from epidemiccare.engine import TriageEngine  # noqa: E402
+from epidemiccare.knowledge import KnowledgeBase, get_knowledge_base  # noqa: E402
+
+
+def synthetic_knowledge_base(size, seed=0):
+    real = get_knowledge_base()
+    rng = random.Random(seed)
+    diseases = dict(list(real.diseases.items())[:size])
+    vocabulary = sorted({symptom for info in real.diseases.values() for symptom in info["symptoms"]})
+    vocabulary += [f"finding {i}" for i in range(max(0, size * 2 - len(vocabulary)))]
+    while len(diseases) < size:
+        diseases[f"Disease {len(diseases)}"] = {
+            "symptoms": rng.sample(vocabulary, rng.randint(3, 6)),
+            "description": "Synthetic disease.",
+            "precautions": ["Rest"],
+        }
+    return KnowledgeBase(f"bench-{size}", real.versions, diseases, real.questions, real.question_symptoms,
+                         real.treatment_plans, real.precautions, real.synonyms), vocabulary
+
+
+# Questionnaire answers for the step questions plus a few named findings
+def synthetic_answers(knowledge_base, vocabulary, count, seed=1):
+    rng = random.Random(seed)
+    patients = []
+    for _ in range(count):
+        answers = {f"symptom_{step}": rng.choice(("Yes", "No", "Not sure"))
+                   for step in range(3, len(knowledge_base.questions) - 1)}
+        for symptom in rng.sample(vocabulary, min(3, len(vocabulary))):
+            answers[f"symptom_{symptom.replace(' ', '_')}"] = "Yes"
+        patients.append(answers)
+    return patients
+
+
+# Best per-call time in microseconds over `repeat` passes
+def per_call(func, items, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for item in items:
+            func(item)
+        best = min(best, time.perf_counter() - start)
+    return best / len(items) * 1e6
+
+
+def bench_size(size, patients, repeat):
+    knowledge_base, vocabulary = synthetic_knowledge_base(size)
+    answers = synthetic_answers(knowledge_base, vocabulary, patients)
+
+    uncached = Triage(knowledge_base, cache=LRUCache(maxsize=0))
+    cached = Triage(knowledge_base, cache=LRUCache())
+    symptoms = [uncached.evidence(patient)[0] for patient in answers]
+    for patient in symptoms:
+        cached.assess(patient)
+        cached.diagnose(patient, 2)
+
+    engine = TriageEngine(knowledge_base.diseases, synonyms=knowledge_base.synonyms)
+    model = BayesModel(knowledge_base.diseases, synonyms=knowledge_base.synonyms)
+    evidence = [uncached.evidence(patient) for patient in answers]
+    levels = ("low", "medium", "high")
+
+    results = {
+        "evidence_from_answers": per_call(uncached.evidence, answers, repeat),
+        "assess_uncached": per_call(uncached.assess, symptoms, repeat),
+        "assess_cached": per_call(cached.assess, symptoms, repeat),
+        "diagnose_top2_uncached": per_call(lambda patient: uncached.diagnose(patient, 2), symptoms, repeat),
+        "diagnose_top2_cached": per_call(lambda patient: cached.diagnose(patient, 2), symptoms, repeat),
+        "diagnose_all_uncached": per_call(uncached.diagnose, symptoms, repeat),
+        "treatment_plan": per_call(uncached.treatment_plan, levels * 100, repeat),
+        "bayes_diagnose_top2": per_call(lambda pair: model.diagnose(*pair, limit=2), evidence, repeat),
+        # Whole batch per call, reported per patient
+        "engine_batch_per_patient": per_call(lambda batch: engine.triage_answers(batch, 2), [answers], repeat)
+        / len(answers),
+    }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scoring micro-benchmarks across catalog sizes")
+    parser.add_argument("--sizes", default="5,50,500,5000", help="comma-separated disease counts")
+    parser.add_argument("--patients", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    add_arguments(parser, "core")
+    args = parser.parse_args()
+
+    metrics = {}
+    for size in (int(size) for size in args.sizes.split(",")):
+        results = bench_size(size, args.patients, args.repeat)
+        print(f"{size} diseases (us per call)")
+        for name, value in results.items():
+            print(f"  {name:<26} {value:10.2f}")
+            metrics[f"{name}[{size}]"] = value
+    report(args, metrics)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+# Throughput of the bulk-intake CLI on a synthetic questionnaire file.
+#
+#   python benchmarks/bench_intake.py --patients 200000 --workers 4
+import argparse
+import csv
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def write_input(path, patients, seed=0):
+    rng = random.Random(seed)
+    steps = range(3, 10)
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id"] + [f"symptom_{step}" for step in steps])
+        for i in range(patients):
+            writer.writerow([i] + [rng.choice(("Yes", "No", "Not sure")) for _ in steps])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-intake throughput")
+    parser.add_argument("--patients", type=int, default=200000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "answers.csv")
+        target = os.path.join(tmp, "results.jsonl")
+        write_input(source, args.patients)
+
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-m", "epidemiccare.intake", source, "-o", target,
+                        "--workers", str(args.workers), "--chunk-size", str(args.chunk_size)],
+                       cwd=ROOT, check=True)
+        elapsed = time.perf_counter() - start
+        with open(target) as f:
+            written = sum(1 for _ in f)
+
+    print(f"patients={written} workers={args.workers} wall={elapsed:.2f}s "
+          f"throughput={written / elapsed * 60:,.0f} per minute (including startup)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# Concurrent consultation load test with regression checks.
+#
+# --workers processes each keep --sessions scripted consultations in flight,
+# advancing them round-robin one interaction at a time, so workers x
+# sessions patients are mid-consultation at once. Process-wide caches and
+# the storage backend are shared within a worker as on a real server.
+#
+#   python benchmarks/bench_load.py --workers 8 --sessions 25 --save-baseline
+#   python benchmarks/bench_load.py --workers 8 --sessions 25 --baseline --tolerance 0.15
+import argparse
+import logging
+import os
+import resource
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from baseline import add_arguments, percentile, report
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "streamlit_app.py")
+
+
+def load_worker(app, worker, sessions):
+    from bench_consultation import ScriptedConsultation
+
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(app)))
+    active = [ScriptedConsultation(app, seed=worker * sessions + i) for i in range(sessions)]
+    latencies = []
+    completed = 0
+    while active:
+        for consultation in list(active):
+            _, elapsed, _ = consultation.step()
+            latencies.append(elapsed)
+            if consultation.done:
+                active.remove(consultation)
+                completed += 1
+    return latencies, completed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent consultation load test")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--sessions", type=int, default=25, help="simultaneous sessions per worker")
+    parser.add_argument("--app", default=APP, help="app script to load, e.g. an older checkout")
+    add_arguments(parser, "load")
+    args = parser.parse_args()
+
+    # AppTest swaps sys.modules["__main__"] inside the workers, so hand them
+    # the worker function through its importable module name
+    from bench_load import load_worker
+
+    with ProcessPoolExecutor(args.workers) as pool:
+        # Warm up every worker so imports are not counted
+        list(pool.map(load_worker, [args.app] * args.workers, range(args.workers), [1] * args.workers))
+        start = time.perf_counter()
+        results = list(pool.map(load_worker, [args.app] * args.workers, range(args.workers),
+                                [args.sessions] * args.workers))
+        wall = time.perf_counter() - start
+
+    latencies = sorted(latency for worker_latencies, _, _ in results for latency in worker_latencies)
+    completed = sum(count for _, count, _ in results)
+    # ru_maxrss is in KiB on Linux
+    rss = max(maxrss for _, _, maxrss in results) / 1024
+    metrics = {
+        "rerun_p50_ms": statistics.median(latencies) * 1000,
+        "rerun_p99_ms": percentile(latencies, 0.99) * 1000,
+        "seconds_per_consultation": wall / completed,
+        "worker_max_rss_mib": rss,
+    }
+    print(f"{args.workers} workers x {args.sessions} sessions: {completed} consultations, "
+          f"{len(latencies)} reruns in {wall:.1f} s")
+    print(f"  throughput {completed / wall:.1f} consultations/s, {len(latencies) / wall:.0f} reruns/s")
+    print(f"  rerun p50={metrics['rerun_p50_ms']:.1f} ms p99={metrics['rerun_p99_ms']:.1f} ms, "
+          f"worker max RSS {rss:.0f} MiB")
+    report(args, metrics)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# Login throughput load test.
+#
+# Each worker process drives its own AppTest sessions through the login
+# form, so the workers log in concurrently the way script-runner threads
+# do on a busy server. Accounts are registered before the timed logins.
+#
+#   python benchmarks/bench_login.py --workers 8 --logins 20
+import argparse
+import logging
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from baseline import percentile
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "streamlit_app.py")
+PASSWORD = "bench-password"
+
+
+def login_worker(app, worker, logins):
+    from streamlit.testing.v1 import AppTest
+
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(app)))
+    from epidemiccare.auth import AuthError, get_credentials
+
+    emails = [f"patient{worker}-{i}@example.com" for i in range(logins)]
+    for email in emails:
+        try:
+            get_credentials().register(email, PASSWORD)
+        except AuthError:
+            # Registered by an earlier run against the same database
+            pass
+    latencies = []
+    for email in emails:
+        at = AppTest.from_file(app, default_timeout=120)
+        at.session_state["show_welcome"] = False
+        at.run()
+        at.text_input(key="login_email").input(email)
+        at.text_input(key="login_password").input(PASSWORD)
+        start = time.perf_counter()
+        at.button(key="login_btn").click().run()
+        latencies.append(time.perf_counter() - start)
+        if at.exception or not at.session_state["authenticated"]:
+            raise RuntimeError(f"login failed: {at.exception}")
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Login throughput load test")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--logins", type=int, default=20, help="logins per worker")
+    parser.add_argument("--app", default=APP, help="app script to load, e.g. an older checkout")
+    args = parser.parse_args()
+
+    # AppTest swaps sys.modules["__main__"] inside the workers, so hand them
+    # the worker function through its importable module name
+    from bench_login import login_worker
+
+    with ProcessPoolExecutor(args.workers) as pool:
+        # Warm up every worker so imports are not counted
+        list(pool.map(login_worker, [args.app] * args.workers, range(args.workers), [1] * args.workers))
+        start = time.perf_counter()
+        results = list(pool.map(login_worker, [args.app] * args.workers, range(args.workers),
+                                [args.logins] * args.workers))
+        wall = time.perf_counter() - start
+
+    latencies = sorted(latency for worker in results for latency in worker)
+    print(f"workers={args.workers} logins={len(latencies)}")
+    print(f"throughput: {len(latencies) / wall:.1f} logins/s")
+    print(f"login latency p50={statistics.median(latencies) * 1000:.1f} ms "
+          f"p99={percentile(latencies, 0.99) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# Throughput of free-text symptom extraction on a large synthetic corpus:
+# the compiled Aho–Corasick matcher against one regex alternation of every
+# symptom name and synonym, and both against a vocabulary --scale times as
+# large to show how each grows with the number of phrases.
+#
+#   python benchmarks/bench_matcher.py --documents 20000 --scale 20
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from epidemiccare.core import get_triage  # noqa: E402
+from epidemiccare.index import normalize_symptom  # noqa: E402
+from epidemiccare.matcher import SymptomMatcher  # noqa: E402
+
+FILLER = ("i", "have", "had", "since", "monday", "and", "a", "bit", "of", "some", "the", "really",
+          "mild", "bad", "at", "night", "no", "also", "my", "kids", "feel", "like", "today")
+
+
+def corpus(phrases, count, seed=0):
+    rng = random.Random(seed)
+    documents = []
+    for _ in range(count):
+        words = [rng.choice(FILLER) for _ in range(rng.randint(8, 40))]
+        for _ in range(rng.randint(0, 3)):
+            words.insert(rng.randrange(len(words) + 1), rng.choice(phrases))
+        documents.append(" ".join(words))
+    return documents
+
+
+# Unrelated made-up phrases, so a larger vocabulary finds the same symptoms
+def padded(phrases, scale, seed=1):
+    rng = random.Random(seed)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    vocabulary = dict(phrases)
+    while len(vocabulary) < len(phrases) * scale:
+        name = " ".join("".join(rng.choice(letters) for _ in range(rng.randint(4, 9)))
+                        for _ in range(rng.randint(1, 3)))
+        vocabulary.setdefault(name, name)
+    return vocabulary
+
+
+class RegexMatcher:
+    def __init__(self, phrases):
+        self.names = {normalize_symptom(phrase): normalize_symptom(symptom) for phrase, symptom in phrases.items()}
+        names = sorted(self.names, key=len, reverse=True)
+        self.pattern = re.compile(r"\b(?:" + "|".join(re.escape(name) for name in names) + r")\b")
+
+    def find(self, text):
+        return list(dict.fromkeys(self.names[name] for name in self.pattern.findall(normalize_symptom(text))))
+
+
+def measure(label, matcher, documents):
+    size = sum(len(document) for document in documents)
+    start = time.perf_counter()
+    found = [matcher.find(document) for document in documents]
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<28} {size / elapsed / 1e6:6.2f} MB/s, "
+          f"{len(documents) / elapsed:>9,.0f} documents/s")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Free-text symptom extraction throughput")
+    parser.add_argument("--documents", type=int, default=20000)
+    parser.add_argument("--scale", type=int, default=20,
+                        help="vocabulary size multiplier for the padded run")
+    args = parser.parse_args()
+
+    phrases = get_triage().matcher.names
+    documents = corpus(list(phrases), args.documents)
+
+    for vocabulary in (phrases, padded(phrases, args.scale)):
+        start = time.perf_counter()
+        matcher = SymptomMatcher(vocabulary)
+        build = time.perf_counter() - start
+        print(f"{len(vocabulary)} phrases, {len(documents)} documents, automaton built in {build * 1000:.1f} ms")
+        automaton = measure("aho-corasick", matcher, documents)
+        regex = measure("regex alternation", RegexMatcher(vocabulary), documents)
+        agree = sum(a == r for a, r in zip(automaton, regex)) / len(documents)
+        print(f"  same symptoms found in {agree:.1%} of documents")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+# Overhead of the metrics instrumentation: the cost of one timed call and
+# of one timer block, and the slowdown of core.triage() with metrics on
+# against a copy decorated by a disabled registry.
+#
+#   python benchmarks/bench_metrics.py --calls 200000
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from epidemiccare import core  # noqa: E402
+from epidemiccare.metrics import Metrics  # noqa: E402
+
+
+def per_call(func, calls, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(calls):
+            func()
+        best = min(best, time.perf_counter() - start)
+    return best / calls * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Metrics instrumentation overhead")
+    parser.add_argument("--calls", type=int, default=200000)
+    args = parser.parse_args()
+
+    enabled = Metrics(enabled=True)
+    disabled = Metrics(enabled=False)
+
+    def noop():
+        pass
+
+    def block():
+        with enabled.timer("block"):
+            pass
+
+    base = per_call(noop, args.calls)
+    print(f"timed call       +{per_call(enabled.timed('noop')(noop), args.calls) - base:7.0f} ns")
+    print(f"timer block      +{per_call(block, args.calls) - base:7.0f} ns")
+
+    # Same function, instrumented and not; cached answers, the cheapest real call
+    triage = core.triage.__wrapped__
+    answers = {"symptom_3": "Yes", "symptom_4": "No", "symptom_7": "Yes"}
+    plain = disabled.timed("triage")(lambda: triage(answers))
+    timed = enabled.timed("triage")(lambda: triage(answers))
+    calls = args.calls // 10
+    plain_ns = per_call(plain, calls)
+    timed_ns = per_call(timed, calls)
+    print(f"core.triage      {plain_ns / 1000:7.2f} us plain, {timed_ns / 1000:7.2f} us timed "
+          f"({(timed_ns / plain_ns - 1) * 100:+.1f}%)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# Replay of synthetic check-ins through the outbreak detector: throughput,
+# memory, detection delay and false alerts.
+#
+# Background reports arrive at a steady rate from --sites clinics scattered
+# over a region about 1000 km across, with random symptoms. From
+# --outbreak-day on, one site reports a growing cluster of fever and cough.
+# A hotspot alert for the outbreak site is a detection; every other alert
+# is counted as false.
+#
+#   python benchmarks/bench_outbreak.py --events 1000000 --days 60
+#   python benchmarks/bench_outbreak.py --max-series 20000 --save-baseline
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from baseline import add_arguments, report  # noqa: E402
+from epidemiccare.outbreak import OutbreakDetector, cell_geohash, grid_cell  # noqa: E402
+from epidemiccare.progress import CHECKIN_SYMPTOMS  # noqa: E402
+
+DAY = 24 * 3600
+START = 1767225600  # 2026-01-01 UTC
+
+
+def synthetic_events(rng, events, days, sites, outbreak_day, outbreak_site):
+    background = events / days
+    for day in range(days):
+        reports = []
+        for _ in range(int(rng.gauss(background, background ** 0.5))):
+            site = sites[rng.randrange(len(sites))]
+            symptoms = rng.sample(CHECKIN_SYMPTOMS, rng.choice((0, 1, 1, 2)))
+            reports.append((START + day * DAY + rng.random() * DAY, site, symptoms))
+        if day >= outbreak_day:
+            # Doubles every two days, starting from a handful of cases
+            for _ in range(int(4 * 2 ** ((day - outbreak_day) / 2))):
+                reports.append((START + day * DAY + rng.random() * DAY, outbreak_site, ["Fever", "Cough"]))
+        reports.sort(key=lambda report: report[0])
+        yield from reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Outbreak detector replay on synthetic data")
+    parser.add_argument("--events", type=int, default=200000, help="background reports in total")
+    parser.add_argument("--days", type=int, default=60)
+    parser.add_argument("--sites", type=int, default=2000)
+    parser.add_argument("--outbreak-day", type=int, default=40)
+    parser.add_argument("--max-series", type=int, default=200000)
+    parser.add_argument("--memory", action="store_true", help="trace the detector's memory (slower)")
+    add_arguments(parser, "outbreak")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    sites = [(rng.uniform(-5.0, 5.0), rng.uniform(30.0, 40.0)) for _ in range(args.sites)]
+    outbreak_site = sites[0]
+    outbreak_cell = grid_cell(*outbreak_site)
+    # The outbreak may be reported by any region whose 3x3 block contains its cell
+    outbreak_regions = {cell_geohash((outbreak_cell[0] + dx, outbreak_cell[1] + dy))
+                        for dx in (-1, 0, 1) for dy in (-1, 0, 1)}
+    replay = list(synthetic_events(rng, args.events, args.days, sites, args.outbreak_day, outbreak_site))
+
+    if args.memory:
+        tracemalloc.start()
+    detector = OutbreakDetector(max_series=args.max_series)
+    start = time.perf_counter()
+    for when, site, symptoms in replay:
+        detector.add(symptoms, when, site)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] if args.memory else None
+
+    alerts = list(detector.sink.alerts)
+    detections = [alert for alert in alerts if alert.kind == "hotspot" and alert.region in outbreak_regions
+                  and alert.time >= START + args.outbreak_day * DAY]
+    false_alerts = [alert for alert in alerts if alert not in detections and alert.kind == "hotspot"]
+    surges = [alert for alert in alerts if alert.kind == "surge"]
+    stats = detector.stats()
+    print(f"{len(replay)} reports over {args.days} days from {args.sites} sites")
+    print(f"  {len(replay) / elapsed:,.0f} reports/s, {elapsed / len(replay) * 1e6:.1f} us per report")
+    print(f"  {stats['series']} series (cap {stats['max_series']}), {stats['evictions']} evicted"
+          + (f", peak {peak / 2 ** 20:.1f} MiB" if peak is not None else ""))
+    metrics = {"us_per_report": elapsed / len(replay) * 1e6}
+    if detections:
+        delay = (detections[0].time - (START + args.outbreak_day * DAY)) / 3600
+        print(f"  outbreak detected {delay:.1f} h after it began, "
+              f"{detections[0].count} reports in region {detections[0].region}")
+        metrics["detection_delay_hours"] = delay
+    else:
+        print("  outbreak not detected")
+    print(f"  {len(false_alerts)} false hotspot alerts, {len(surges)} overall surge alerts")
+    metrics["false_hotspot_alerts"] = len(false_alerts)
+    report(args, metrics)
+
+
+if __name__ == "__main__":
+    main()
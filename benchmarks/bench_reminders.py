@@ -0,0 +1,63 @@
+# Arming and dispatch throughput of the reminder timing wheel with many
+# patients spread over several timezones, over one simulated day.
+#
+#   python benchmarks/bench_reminders.py --users 200000
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from epidemiccare.core import get_triage  # noqa: E402
+from epidemiccare.reminders import ReminderScheduler, plan_reminders  # noqa: E402
+
+TIMEZONES = ("UTC", "Asia/Kolkata", "Europe/London", "America/New_York", "Australia/Sydney", "Africa/Lagos")
+
+
+class CountingNotifier:
+    def __init__(self):
+        self.notifications = 0
+        self.batches = 0
+
+    def __call__(self, notifications):
+        self.notifications += len(notifications)
+        self.batches += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reminder scheduler throughput")
+    parser.add_argument("--users", type=int, default=200000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    plans = {level: plan_reminders(get_triage().treatment_plan(level)) for level in ("low", "medium", "high")}
+    clock = [1_800_000_000.0]
+    notifier = CountingNotifier()
+    scheduler = ReminderScheduler(notifier, batch_size=args.batch_size, clock=lambda: clock[0])
+
+    rng = random.Random(0)
+    start = time.perf_counter()
+    for user in range(args.users):
+        scheduler.set_schedule(user, plans[rng.choice(tuple(plans))], rng.choice(TIMEZONES))
+    armed = time.perf_counter() - start
+    pending = len(scheduler)
+    print(f"{args.users} users, {pending} pending reminders armed in {armed:.2f} s "
+          f"({pending / armed:,.0f}/s)")
+
+    busiest = 0.0
+    start = time.perf_counter()
+    for _ in range(24 * 60):
+        clock[0] += 60
+        tick = time.perf_counter()
+        scheduler.run_pending()
+        busiest = max(busiest, time.perf_counter() - tick)
+    elapsed = time.perf_counter() - start
+    print(f"  one day: {notifier.notifications} dispatched in {notifier.batches} batches, "
+          f"{notifier.notifications / elapsed:,.0f}/s, busiest tick {busiest * 1000:.0f} ms, "
+          f"{len(scheduler)} re-armed")
+
+
+if __name__ == "__main__":
+    main()
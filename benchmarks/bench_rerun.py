@@ -0,0 +1,82 @@
+# Per-rerun CPU time of the consultation page across many sessions.
+#
+# AppTest is not thread-safe, so sessions are interleaved round-robin in one
+# thread; process-wide caches are still shared between them as in a server.
+# The app runs through a small wrapper that reads the CPU time of the script
+# thread, so the polling done by the test harness itself is not counted.
+#
+#   python benchmarks/bench_rerun.py --sessions 50 --reruns 10
+import argparse
+import logging
+import os
+import statistics
+import sys
+import time
+import types
+
+from streamlit.testing.v1 import AppTest
+
+from baseline import percentile
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "streamlit_app.py")
+
+WRAPPER = f"""
+import runpy
+import sys
+import time
+
+_start = time.thread_time()
+try:
+    runpy.run_path({APP!r}, run_name="__main__")
+finally:
+    sys.modules["_bench_rerun"].samples.append(time.thread_time() - _start)
+"""
+
+# streamlit run puts the app directory on sys.path; runpy does not
+sys.path.insert(0, os.path.dirname(APP))
+
+from epidemiccare.auth import get_credentials  # noqa: E402
+
+probe = sys.modules.setdefault("_bench_rerun", types.ModuleType("_bench_rerun"))
+probe.samples = []
+
+
+def new_session():
+    at = AppTest.from_string(WRAPPER, default_timeout=120)
+    at.session_state["show_welcome"] = False
+    at.session_state["authenticated"] = True
+    at.session_state["user_data"] = {"name": "Bench", "email": "bench@example.com"}
+    at.session_state["auth_token"] = get_credentials().issue_token("bench@example.com")
+    return at
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-rerun CPU time of the consultation page")
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--reruns", type=int, default=10)
+    args = parser.parse_args()
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+
+    # First run of every session is excluded, so imports and widget setup don't count
+    sessions = [new_session().run() for _ in range(args.sessions)]
+
+    latencies = []
+    probe.samples.clear()
+    for _ in range(args.reruns):
+        for at in sessions:
+            start = time.perf_counter()
+            at.run()
+            latencies.append(time.perf_counter() - start)
+            if at.exception:
+                raise RuntimeError(at.exception[0].value)
+
+    latencies.sort()
+    print(f"sessions={args.sessions} reruns={len(latencies)}")
+    print(f"script cpu per rerun: mean={statistics.mean(probe.samples) * 1000:.2f} ms "
+          f"p50={statistics.median(probe.samples) * 1000:.2f} ms")
+    print(f"latency p50={statistics.median(latencies) * 1000:.2f} ms "
+          f"p99={percentile(latencies, 0.99) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
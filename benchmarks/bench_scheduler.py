@@ -0,0 +1,89 @@
+# Questions asked per consultation with the adaptive scheduler versus the
+# fixed questionnaire, on synthetic patients. Every answered question is one
+# Streamlit rerun and one round trip for the patient.
+#
+#   python benchmarks/bench_scheduler.py --patients 5000 --min-gain 0.1
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from epidemiccare.bayes import BayesModel  # noqa: E402
+from epidemiccare.knowledge import get_knowledge_base  # noqa: E402
+from epidemiccare.scheduler import QuestionScheduler  # noqa: E402
+
+
+# Answers a patient would give to every question, keyed by step
+def synthetic_answers(scheduler, rng, sensitivity, noise, unsure):
+    model = scheduler.model
+    disease = rng.randrange(len(model.disease_names))
+    listed = {symptom for symptom, col in model.vocabulary.items() if model.membership[disease, col]}
+    present = {symptom for symptom in model.vocabulary
+               if rng.random() < (sensitivity if symptom in listed else noise)}
+    answers = {}
+    for step in range(scheduler.intro, scheduler.final_step):
+        if rng.random() < unsure:
+            answers[step] = "Not sure"
+        elif scheduler.question_symptoms[step]:
+            answers[step] = "Yes" if present & set(scheduler.question_symptoms[step]) else "No"
+        else:
+            answers[step] = rng.choice(("Yes", "No"))
+    return answers
+
+
+# Walk one consultation through the scheduler; returns the answers it asked for
+def consult(scheduler, full_answers):
+    asked = {}
+    step = 0
+    count = 1
+    while step != scheduler.final_step:
+        if step in full_answers:
+            asked[step] = full_answers[step]
+        step = scheduler.next_step(step, asked)
+        count += 1
+    return asked, count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Adaptive question scheduler simulation")
+    parser.add_argument("--patients", type=int, default=5000)
+    parser.add_argument("--min-gain", type=float, default=0.1, help="bits")
+    parser.add_argument("--sensitivity", type=float, default=0.75)
+    parser.add_argument("--noise", type=float, default=0.08)
+    parser.add_argument("--unsure", type=float, default=0.1)
+    args = parser.parse_args()
+
+    knowledge_base = get_knowledge_base()
+    scheduler = QuestionScheduler(knowledge_base.questions, knowledge_base.question_symptoms,
+                                  BayesModel(knowledge_base.diseases), min_gain=args.min_gain)
+    rng = random.Random(0)
+
+    fixed = len(knowledge_base.questions)
+    counts = []
+    same_risk = 0
+    same_top = 0
+    start = time.perf_counter()
+    for _ in range(args.patients):
+        full = synthetic_answers(scheduler, rng, args.sensitivity, args.noise, args.unsure)
+        asked, count = consult(scheduler, full)
+        counts.append(count)
+        same_risk += scheduler.risk_bounds(asked)[0] == scheduler.risk_bounds(full)[0]
+        same_top += int(np.argmax(scheduler.posterior(asked))) == int(np.argmax(scheduler.posterior(full)))
+    elapsed = time.perf_counter() - start
+
+    mean = sum(counts) / len(counts)
+    print(f"{args.patients} consultations, min gain {args.min_gain} bits")
+    print(f"  questions per consultation: fixed {fixed}, adaptive {mean:.2f} "
+          f"({(1 - mean / fixed) * 100:.0f}% fewer reruns), min {min(counts)}, max {max(counts)}")
+    print(f"  same risk level as the full questionnaire: {same_risk / args.patients:.1%}")
+    print(f"  same top diagnosis as the full questionnaire: {same_top / args.patients:.1%}")
+    print(f"  scheduling cost: {elapsed / sum(counts) * 1e6:.0f} us per question")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# Memory per consultation session: the server-side PatientSession and its
+# columnar ProgressLog against the plain dicts the app used to keep in
+# st.session_state, plus snapshot size and the cost of saving sessions to
+# the shared backend in write-behind batches and loading them back, as
+# another replica would.
+#
+#   python benchmarks/bench_sessions.py --sessions 20000 --days 14
+#   python benchmarks/bench_sessions.py --backend redis://localhost:6379/0
+import argparse
+import copy
+import datetime
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from epidemiccare.core import get_triage  # noqa: E402
+from epidemiccare.knowledge import get_knowledge_base  # noqa: E402
+from epidemiccare.progress import CHECKIN_SYMPTOMS, ProgressLog  # noqa: E402
+from epidemiccare.session import SessionStore, deep_sizeof, open_session_backend  # noqa: E402
+
+
+def answers(rng, questions):
+    values = {"name": rng.choice(("Asha", "Ben", "Chen")), "age": rng.randint(1, 90), "conditions": "None"}
+    for step in range(3, len(questions)):
+        values[f"symptom_{step}"] = rng.choice(("Yes", "No", "Not sure"))
+    return values
+
+
+# (day, rating, symptoms, medication taken) for `days` daily check-ins
+def checkins(rng, days):
+    start = datetime.date(2026, 1, 1)
+    return [(start + datetime.timedelta(days=offset), rng.randint(1, 10),
+             rng.sample(CHECKIN_SYMPTOMS, rng.randint(0, 3)), rng.random() < 0.8) for offset in range(days)]
+
+
+# What one session held before: fresh key strings, a per-session plan copy
+# and three lists of per-day dicts
+def legacy_state(rng, questions, days):
+    symptoms = {"".join(key): value for key, value in answers(rng, questions).items()}
+    entries = checkins(rng, days)
+    return {
+        "symptoms": symptoms,
+        "treatment_plan": copy.deepcopy(get_triage().treatment_plan(rng.choice(("low", "medium", "high")))),
+        "progress_data": {
+            "start_date": datetime.date(2026, 1, 1),
+            "symptoms_track": [{"date": day, "symptoms": list(symptoms)} for day, _, symptoms, _ in entries],
+            "medication_taken": [{"date": day, "taken": taken} for day, _, _, taken in entries],
+            "daily_rating": [{"date": day, "rating": rating} for day, rating, _, _ in entries],
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Session memory, snapshot size and save cost")
+    parser.add_argument("--sessions", type=int, default=20000)
+    parser.add_argument("--days", type=int, default=14, help="daily check-ins per session")
+    parser.add_argument("--backend", help="session backend URL (default: a temporary SQLite file)")
+    parser.add_argument("--batch", type=int, default=100, help="sessions saved per flush")
+    args = parser.parse_args()
+
+    questions = get_knowledge_base().questions
+    rng = random.Random(0)
+    legacy = [legacy_state(rng, questions, args.days) for _ in range(args.sessions)]
+    legacy_bytes = sum(deep_sizeof(state) for state in legacy) / len(legacy)
+
+    clock = [0.0]
+    backend = open_session_backend(args.backend or "sqlite:///" + os.path.join(tempfile.mkdtemp(), "sessions.db"))
+    store = SessionStore(backend, idle_timeout=60, sweep_interval=float("inf"), clock=lambda: clock[0])
+    rng = random.Random(0)
+    ids = []
+    for _ in range(args.sessions):
+        session = store.create()
+        for key, value in answers(rng, questions).items():
+            session.record_answer(key, value)
+        session.risk_level = rng.choice(("low", "medium", "high"))
+        session.progress = ProgressLog(datetime.date(2026, 1, 1))
+        for day, rating, symptoms, taken in checkins(rng, args.days):
+            session.progress.add(day, rating, symptoms, taken)
+        session.chat_history.append("doctor", questions[3])
+        session.chat_history.append("user", "Yes")
+        ids.append(session.session_id)
+    stats = store.stats()
+    print(f"{args.sessions} sessions, {args.days} check-ins each")
+    print(f"  legacy dicts    {legacy_bytes:8.0f} bytes/session (without the chat log)")
+    print(f"  PatientSession  {stats['bytes_per_session']:8.0f} bytes/session (with a two-message chat log)")
+
+    # Write-behind: the sessions changed in one flush interval are saved as one batch
+    start = time.perf_counter()
+    for offset in range(0, len(ids), args.batch):
+        for session_id in ids[offset:offset + args.batch]:
+            store.save(store.get(session_id))
+        store.flush()
+    save = time.perf_counter() - start
+    stats = store.stats()
+    print(f"  snapshot {stats['snapshot_bytes']:6.0f} bytes, save {save / len(ids) * 1e6:.0f} us/session, "
+          f"{stats['flush_ms']:.1f} ms per batch of {args.batch}")
+
+    # Another replica: nothing in memory, every session loaded from the backend
+    replica = SessionStore(backend, sweep_interval=float("inf"))
+    start = time.perf_counter()
+    for session_id in ids:
+        replica.resume(session_id)
+    load = time.perf_counter() - start
+    print(f"  load {load / len(ids) * 1e6:.0f} us/session on another replica")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,4 @@
+# Headless EpidemicCare triage logic shared by the Streamlit app and batch jobs
+from epidemiccare.core import assess_risk, generate_diagnosis, generate_treatment_plan, triage
+
+__all__ = ["assess_risk", "generate_diagnosis", "generate_treatment_plan", "triage"]
@@ -0,0 +1,243 @@
+# Population-level daily aggregates for outbreak monitoring.
+#
+# Counts are kept per day in growable numpy columns and updated as each
+# check-in or consultation arrives, so charts read a few small arrays
+# instead of rescanning raw records. Records are only ever added for the
+# current day, so past days are final: they are saved to an .npz snapshot,
+# and a restart loads it and reads only the records from the day it was
+# taken onwards.
+import atexit
+import datetime
+import hashlib
+import os
+import tempfile
+import threading
+
+import numpy as np
+
+from epidemiccare.paths import private_dir, state_dir
+from epidemiccare.progress import CHECKIN_SYMPTOMS
+from epidemiccare.storage import SQLiteStorage, get_storage
+
+RISK_LEVELS = ("low", "medium", "high")
+
+
+class DailyAggregates:
+    def __init__(self, symptoms=CHECKIN_SYMPTOMS, capacity=64):
+        self.symptoms = list(symptoms)
+        self._symptom_columns = {symptom: col for col, symptom in enumerate(self.symptoms)}
+        self._rows = {}
+        self._lock = threading.Lock()
+        # Ordinal of the first day not covered by the snapshot this was loaded from
+        self.until = None
+        # Bumped on every update so derived frames know when to rebuild
+        self.version = 0
+        self._frames = {}
+
+        self.days = np.zeros(capacity, dtype=np.int32)
+        self.checkins = np.zeros(capacity, dtype=np.int64)
+        self.medication_taken = np.zeros(capacity, dtype=np.int64)
+        self.symptom_counts = np.zeros((capacity, len(self.symptoms)), dtype=np.int64)
+        self.risk_counts = np.zeros((capacity, len(RISK_LEVELS)), dtype=np.int64)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def _grow(self, rows, cols):
+        capacity, width = self.symptom_counts.shape
+        if rows > capacity:
+            new_capacity = max(rows, capacity * 2)
+            for name in ("days", "checkins", "medication_taken", "symptom_counts", "risk_counts"):
+                old = getattr(self, name)
+                new = np.zeros((new_capacity,) + old.shape[1:], dtype=old.dtype)
+                new[:len(old)] = old
+                setattr(self, name, new)
+        if cols > width:
+            new = np.zeros((self.symptom_counts.shape[0], cols), dtype=np.int64)
+            new[:, :width] = self.symptom_counts
+            self.symptom_counts = new
+
+    def _row(self, day):
+        ordinal = day.toordinal()
+        row = self._rows.get(ordinal)
+        if row is None:
+            row = len(self._rows)
+            self._grow(row + 1, 0)
+            self._rows[ordinal] = row
+            self.days[row] = ordinal
+        return row
+
+    def _symptom_column(self, symptom):
+        col = self._symptom_columns.get(symptom)
+        if col is None:
+            col = len(self.symptoms)
+            self.symptoms.append(symptom)
+            self._symptom_columns[symptom] = col
+            self._grow(0, col + 1)
+        return col
+
+    def add_checkin(self, day, symptoms, medication_taken):
+        with self._lock:
+            row = self._row(day)
+            self.checkins[row] += 1
+            self.medication_taken[row] += bool(medication_taken)
+            # Resolve columns first: adding a symptom may reallocate symptom_counts
+            cols = [self._symptom_column(symptom) for symptom in set(symptoms)]
+            self.symptom_counts[row, cols] += 1
+            self.version += 1
+
+    def add_consultation(self, day, risk_level):
+        with self._lock:
+            row = self._row(day)
+            self.risk_counts[row, RISK_LEVELS.index(risk_level)] += 1
+            self.version += 1
+
+    # Used rows in date order
+    def _ordered(self):
+        n = len(self._rows)
+        order = np.argsort(self.days[:n], kind="stable")
+        dates = [datetime.date.fromordinal(int(ordinal)) for ordinal in self.days[:n][order]]
+        return order, dates
+
+    # DataFrames are rebuilt only after an update and otherwise shared between reruns
+    def _frame(self, name, build):
+        with self._lock:
+            cached = self._frames.get(name)
+            if cached is not None and cached[0] == self.version:
+                return cached[1]
+            import pandas as pd
+
+            order, dates = self._ordered()
+            frame = build(pd, order, pd.Index(dates, name="date"))
+            self._frames[name] = (self.version, frame)
+            return frame
+
+    # Share of each day's check-ins reporting each symptom
+    def prevalence_frame(self):
+        def build(pd, order, index):
+            checkins = self.checkins[order][:, None]
+            counts = self.symptom_counts[order, :len(self.symptoms)]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                prevalence = np.where(checkins > 0, counts / checkins, np.nan)
+            return pd.DataFrame(prevalence, index=index, columns=list(self.symptoms))
+        return self._frame("prevalence", build)
+
+    # Consultations per risk level and day
+    def risk_frame(self):
+        def build(pd, order, index):
+            return pd.DataFrame(self.risk_counts[order], index=index, columns=list(RISK_LEVELS))
+        return self._frame("risk", build)
+
+    # Share of check-ins with medication taken, per day
+    def adherence_frame(self):
+        def build(pd, order, index):
+            checkins = self.checkins[order]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                adherence = np.where(checkins > 0, self.medication_taken[order] / checkins, np.nan)
+            return pd.DataFrame({"adherence": adherence, "checkins": checkins}, index=index)
+        return self._frame("adherence", build)
+
+    def totals(self):
+        with self._lock:
+            n = len(self._rows)
+            return {
+                "days": n,
+                "checkins": int(self.checkins[:n].sum()),
+                "consultations": int(self.risk_counts[:n].sum()),
+                "medication_taken": int(self.medication_taken[:n].sum()),
+            }
+
+    # Columnar snapshot of the days before `until` (default: today, the
+    # finished days) as a compressed .npz file, replaced atomically
+    def save(self, path, until=None):
+        until = (until or datetime.date.today()).toordinal()
+        with self._lock:
+            n = len(self._rows)
+            rows = np.flatnonzero(self.days[:n] < until)
+            arrays = dict(days=self.days[rows], checkins=self.checkins[rows],
+                          medication_taken=self.medication_taken[rows],
+                          symptom_counts=self.symptom_counts[rows, :len(self.symptoms)],
+                          risk_counts=self.risk_counts[rows], symptoms=np.array(self.symptoms),
+                          until=np.array(until))
+        directory = private_dir(os.path.dirname(os.path.abspath(path)))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez_compressed(f, **arrays)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            aggregates = cls(data["symptoms"].tolist(), capacity=max(len(data["days"]), 1))
+            n = len(data["days"])
+            aggregates.days[:n] = data["days"]
+            aggregates.checkins[:n] = data["checkins"]
+            aggregates.medication_taken[:n] = data["medication_taken"]
+            aggregates.symptom_counts[:n] = data["symptom_counts"]
+            aggregates.risk_counts[:n] = data["risk_counts"]
+            aggregates._rows = {int(ordinal): row for row, ordinal in enumerate(data["days"])}
+            aggregates.until = int(data["until"])
+        return aggregates
+
+    # Build aggregates from a storage backend. With a snapshot `path`, the
+    # snapshot is loaded if it exists, only newer records are read, and the
+    # finished days are saved back for the next start.
+    @classmethod
+    def from_storage(cls, storage, path=None):
+        aggregates = None
+        if path is not None:
+            try:
+                aggregates = cls.load(path)
+            except (OSError, KeyError, ValueError):
+                # Missing, from an older version, or truncated: rebuild
+                aggregates = None
+        if aggregates is None:
+            aggregates = cls()
+        since = datetime.date.fromordinal(aggregates.until) if aggregates.until else None
+        for day, symptoms, medication_taken in storage.iter_checkins(since):
+            aggregates.add_checkin(day, symptoms, medication_taken)
+        for day, risk_level in storage.iter_consultations(since):
+            aggregates.add_consultation(day, risk_level)
+        if path is not None:
+            aggregates.save_quietly(path)
+        return aggregates
+
+    # Snapshots only save start-up time, so an unwritable location is not an error
+    def save_quietly(self, path):
+        try:
+            self.save(path)
+        except OSError:
+            pass
+
+
+# Snapshot file for a storage backend: $EPIDEMICCARE_AGGREGATES_FILE, or one per
+# SQLite database in the private state dir; None for in-memory storage
+def snapshot_path(storage):
+    path = os.environ.get("EPIDEMICCARE_AGGREGATES_FILE")
+    if path or not isinstance(storage, SQLiteStorage):
+        return path
+    digest = hashlib.sha256(os.path.abspath(storage.path).encode()).hexdigest()[:16]
+    return state_dir("analytics", f"daily-{digest}.npz")
+
+
+_default_aggregates = None
+_default_lock = threading.Lock()
+
+
+# Function to get the process-wide aggregates, loaded from the snapshot and
+# storage on first use and saved again at exit
+def get_daily_aggregates():
+    global _default_aggregates
+    if _default_aggregates is None:
+        with _default_lock:
+            if _default_aggregates is None:
+                storage = get_storage()
+                path = snapshot_path(storage)
+                _default_aggregates = DailyAggregates.from_storage(storage, path)
+                if path is not None:
+                    atexit.register(_default_aggregates.save_quietly, path)
+    return _default_aggregates
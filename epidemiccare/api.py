@@ -0,0 +1,419 @@
+# Headless JSON triage API for kiosks, SMS gateways and other systems.
+#
+# A plain ASGI application: concurrent /triage requests are collected by a
+# micro-batcher and scored together with one vectorized TriageEngine call.
+#
+#   python -m epidemiccare.api --port 8000 --max-batch-size 64 --max-wait-ms 5
+#
+# Runs under uvicorn when it is installed, otherwise on a small built-in
+# asyncio HTTP/1.1 server, so no external services are needed.
+#
+#   POST /triage          {"answers": {"symptom_3": "Yes", "symptom_8": "rash"}} or {"symptoms": ["fever", ...]}
+#   POST /triage/batch    {"patients": [{"answers": {...}}, ...]}, at most --max-batch-patients
+#
+# Request bodies over --max-body-bytes get a 413; the built-in server
+# refuses them from the Content-Length header without reading the body.
+#
+#   POST /treatment-plan  {"risk_level": "high"}
+#   GET  /metrics         latency percentiles, requests per second and batch sizes
+#   GET  /metrics/prometheus  process-wide timers, counters and gauges as Prometheus text
+#   GET  /health
+#   GET  /static/<name>   the app's stylesheet and images, pre-compressed and cacheable (see epidemiccare.assets)
+import argparse
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import deque
+
+from epidemiccare.assets import get_assets
+from epidemiccare.core import FREE_TEXT_KEYS, get_triage, symptoms_from_answers
+from epidemiccare.engine import TriageEngine
+from epidemiccare.knowledge import get_knowledge_base
+from epidemiccare.metrics import metrics as process_metrics, percentile, timed
+
+logger = logging.getLogger(__name__)
+
+# Largest request body accepted, in bytes
+MAX_BODY_BYTES = 1 << 20
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+# Collects submitted items for up to max_wait seconds or max_batch_size items,
+# then processes them with one call
+class MicroBatcher:
+    def __init__(self, process, max_batch_size=64, max_wait=0.005):
+        self.process = process
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.batch_sizes = deque(maxlen=10000)
+        self._queue = None
+        self._worker = None
+
+    def start(self):
+        if self._worker is None:
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    async def submit(self, item):
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future))
+        return await future
+
+    async def _collect(self):
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            self.batch_sizes.append(len(batch))
+            items = [item for item, _ in batch]
+            try:
+                results = await loop.run_in_executor(None, self.process, items)
+            except Exception as exc:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+                continue
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+
+# Request latencies and throughput over the most recent requests
+class LatencyStats:
+    def __init__(self, window=10000):
+        self.latencies = deque(maxlen=window)
+        self.finished = deque(maxlen=window)
+        self.requests = 0
+        self.errors = 0
+        self.started = time.monotonic()
+
+    def record(self, latency, error=False):
+        self.requests += 1
+        self.errors += error
+        self.latencies.append(latency)
+        self.finished.append(time.monotonic())
+
+    def snapshot(self):
+        latencies = sorted(self.latencies)
+
+        def milliseconds(fraction):
+            return round(percentile(latencies, fraction) * 1000, 3) if latencies else None
+
+        rps = 0.0
+        if len(self.finished) > 1:
+            span = self.finished[-1] - self.finished[0]
+            if span > 0:
+                rps = (len(self.finished) - 1) / span
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "uptime_s": round(time.monotonic() - self.started, 3),
+            "latency_ms": {"p50": milliseconds(0.50), "p99": milliseconds(0.99)},
+            "requests_per_second": round(rps, 1),
+        }
+
+
+def _plan_json(plan):
+    return {key: list(value) if isinstance(value, tuple) else value for key, value in plan.items()}
+
+
+class TriageAPI:
+    def __init__(self, max_batch_size=64, max_wait=0.005, top=2, max_batch_patients=1000,
+                 max_body_bytes=MAX_BODY_BYTES):
+        self.top = top
+        self.max_batch_patients = max_batch_patients
+        self.max_body_bytes = max_body_bytes
+        self.stats = LatencyStats()
+        self.batcher = MicroBatcher(self._triage_batch, max_batch_size, max_wait)
+        self._engine = None
+        self._engine_lock = threading.Lock()
+
+    # Engine for the current knowledge base, rebuilt when it reloads
+    def engine(self):
+        knowledge_base = get_knowledge_base()
+        with self._engine_lock:
+            if self._engine is None or self._engine[0] is not knowledge_base:
+                self._engine = (knowledge_base, TriageEngine(knowledge_base.diseases, synonyms=knowledge_base.synonyms))
+            return knowledge_base, self._engine[1]
+
+    @staticmethod
+    def _symptoms(patient):
+        if not isinstance(patient, dict):
+            raise HTTPError(400, "Each patient must be a JSON object")
+        if "symptoms" in patient:
+            symptoms = patient["symptoms"]
+            if not isinstance(symptoms, list) or not all(isinstance(s, str) for s in symptoms):
+                raise HTTPError(400, "'symptoms' must be a list of strings")
+            triage = get_triage()
+            return [triage.canonical(symptom) for symptom in symptoms]
+        answers = patient.get("answers")
+        if not isinstance(answers, dict):
+            raise HTTPError(400, "Provide 'answers' (object) or 'symptoms' (list)")
+        for key, value in answers.items():
+            if key in FREE_TEXT_KEYS and not isinstance(value, str):
+                raise HTTPError(400, f"Answer {key!r} must be a string")
+            if not isinstance(value, (str, bool)):
+                raise HTTPError(400, f"Answer {key!r} must be a string or a boolean")
+        return symptoms_from_answers(answers)
+
+    # Scores a batch of symptom lists; runs in a worker thread
+    @timed("api.triage_batch")
+    def _triage_batch(self, patients):
+        knowledge_base, engine = self.engine()
+        results = engine.triage(patients, limit=self.top)
+        return [
+            {
+                "risk_level": result.risk_level,
+                "risk_score": result.risk_score,
+                "diseases": [
+                    {"name": disease, "match_count": match_count, "match_percentage": match_percentage,
+                     "description": description, "precautions": list(precautions)}
+                    for disease, match_count, description, match_percentage, precautions in result.diseases
+                ],
+                "treatment_plan": _plan_json(knowledge_base.treatment_plans[result.risk_level]),
+            }
+            for result in results
+        ]
+
+    async def handle(self, method, path, body):
+        if path == "/health":
+            return 200, {"status": "ok"}
+        if path == "/metrics":
+            metrics = self.stats.snapshot()
+            sizes = self.batcher.batch_sizes
+            metrics["batches"] = len(sizes)
+            metrics["mean_batch_size"] = round(sum(sizes) / len(sizes), 2) if sizes else None
+            metrics["process"] = process_metrics.snapshot()
+            return 200, metrics
+        if path == "/metrics/prometheus":
+            return 200, process_metrics.render_prometheus()
+
+        routes = ("/triage", "/triage/batch", "/treatment-plan")
+        if path not in routes:
+            raise HTTPError(404, "Not found")
+        if method != "POST":
+            raise HTTPError(405, "Use POST")
+        try:
+            payload = json.loads(body or b"null")
+        except ValueError:
+            raise HTTPError(400, "Body must be JSON") from None
+        if not isinstance(payload, dict):
+            raise HTTPError(400, "Body must be a JSON object")
+
+        if path == "/triage":
+            return 200, await self.batcher.submit(self._symptoms(payload))
+        if path == "/triage/batch":
+            patients = payload.get("patients")
+            if not isinstance(patients, list):
+                raise HTTPError(400, "'patients' must be a list")
+            if len(patients) > self.max_batch_patients:
+                raise HTTPError(413, f"At most {self.max_batch_patients} patients per batch")
+            symptoms = [self._symptoms(patient) for patient in patients]
+            results = await asyncio.get_running_loop().run_in_executor(None, self._triage_batch, symptoms)
+            return 200, {"results": results}
+
+        plans = get_knowledge_base().treatment_plans
+        risk_level = payload.get("risk_level")
+        if risk_level not in plans:
+            raise HTTPError(400, f"'risk_level' must be one of {', '.join(plans)}")
+        return 200, {"risk_level": risk_level, "treatment_plan": _plan_json(plans[risk_level])}
+
+    # ASGI entry point
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                if message["type"] == "lifespan.startup":
+                    self.batcher.start()
+                    await send({"type": "lifespan.startup.complete"})
+                elif message["type"] == "lifespan.shutdown":
+                    await self.batcher.stop()
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+        if scope["type"] != "http":
+            return
+        if scope["path"].startswith("/static/"):
+            await self._send_asset(scope, send)
+            return
+
+        start = time.perf_counter()
+        body = b""
+        too_large = False
+        while True:
+            message = await receive()
+            if not too_large:
+                body += message.get("body", b"")
+                # Drain the rest without keeping it
+                if len(body) > self.max_body_bytes:
+                    too_large, body = True, b""
+            if not message.get("more_body"):
+                break
+
+        try:
+            if too_large:
+                raise HTTPError(413, f"Request body is larger than {self.max_body_bytes} bytes")
+            status, payload = await self.handle(scope["method"], scope["path"], body)
+        except HTTPError as exc:
+            status, payload = exc.status, {"error": exc.message}
+        except Exception:
+            # Details stay in the server log, not in the response
+            logger.exception("Unhandled error for %s %s", scope["method"], scope["path"])
+            status, payload = 500, {"error": "Internal server error"}
+
+        if isinstance(payload, str):
+            data, content_type = payload.encode(), b"text/plain; version=0.0.4"
+        else:
+            data, content_type = json.dumps(payload).encode(), b"application/json"
+        await send({"type": "http.response.start", "status": status,
+                    "headers": [(b"content-type", content_type),
+                                (b"content-length", str(len(data)).encode())]})
+        await send({"type": "http.response.body", "body": data})
+        if scope["path"] not in ("/metrics", "/metrics/prometheus", "/health"):
+            self.stats.record(time.perf_counter() - start, error=status >= 400)
+
+    async def _send_asset(self, scope, send):
+        headers = dict(scope.get("headers", ()))
+        status, response_headers, data = get_assets().response(
+            scope["path"][len("/static/"):], headers.get(b"accept-encoding", b""), headers.get(b"if-none-match", b""))
+        if status == 304:
+            response_headers.append((b"content-length", b"0"))
+        await send({"type": "http.response.start", "status": status, "headers": response_headers})
+        await send({"type": "http.response.body", "body": data})
+
+
+REASONS = {200: "OK", 304: "Not Modified", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Content Too Large", 500: "Internal Server Error"}
+
+
+# Minimal HTTP/1.1 server for running the ASGI app without extra dependencies.
+# A request whose Content-Length is over `max_body_bytes` gets a 413 and the
+# connection is closed before any of its body is read.
+async def serve(app, host="127.0.0.1", port=8000, max_body_bytes=MAX_BODY_BYTES):
+    async def handle_connection(reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = []
+                length = 0
+                keep_alive = True
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    name, value = name.strip().lower(), value.strip()
+                    headers.append((name.encode(), value.encode()))
+                    if name == "content-length":
+                        length = int(value)
+                        if length < 0:
+                            raise ValueError("negative Content-Length")
+                    elif name == "connection" and value.lower() == "close":
+                        keep_alive = False
+                if length > max_body_bytes:
+                    data = json.dumps({"error": f"Request body is larger than {max_body_bytes} bytes"}).encode()
+                    writer.write(f"HTTP/1.1 413 {REASONS[413]}\r\ncontent-type: application/json\r\n"
+                                 f"content-length: {len(data)}\r\nconnection: close\r\n\r\n".encode("latin-1")
+                                 + data)
+                    await writer.drain()
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                path, _, query = target.partition("?")
+                scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+                         "method": method, "path": path, "query_string": query.encode(),
+                         "headers": headers}
+                sent_body = False
+
+                async def receive():
+                    nonlocal sent_body
+                    if sent_body:
+                        return {"type": "http.disconnect"}
+                    sent_body = True
+                    return {"type": "http.request", "body": body, "more_body": False}
+
+                async def send(message):
+                    if message["type"] == "http.response.start":
+                        status = message["status"]
+                        lines = [f"HTTP/1.1 {status} {REASONS.get(status, '')}"]
+                        lines += [f"{k.decode()}: {v.decode()}" for k, v in message["headers"]]
+                        if not keep_alive:
+                            lines.append("connection: close")
+                        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+                    elif message["type"] == "http.response.body":
+                        writer.write(message.get("body", b""))
+                        await writer.drain()
+
+                await app(scope, receive, send)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    if hasattr(app, "batcher"):
+        app.batcher.start()
+    server = await asyncio.start_server(handle_connection, host, port)
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m epidemiccare.api", description="EpidemicCare triage API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--max-batch-size", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--max-batch-patients", type=int, default=1000, help="largest /triage/batch request")
+    parser.add_argument("--max-body-bytes", type=int, default=MAX_BODY_BYTES, help="largest request body")
+    args = parser.parse_args(argv)
+
+    app = TriageAPI(args.max_batch_size, args.max_wait_ms / 1000, max_batch_patients=args.max_batch_patients,
+                    max_body_bytes=args.max_body_bytes)
+    try:
+        import uvicorn
+    except ImportError:
+        print(f"Serving on http://{args.host}:{args.port} (built-in server)")
+        try:
+            asyncio.run(serve(app, args.host, args.port, args.max_body_bytes))
+        except KeyboardInterrupt:
+            pass
+    else:
+        uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+# Self-hosted static assets: the stylesheet and the welcome page image.
+#
+# Files under epidemiccare/static are loaded once per process, fingerprinted
+# with a content hash and compressed ahead of time (gzip, and brotli when the
+# brotli package is installed). Fingerprinted URLs never change content, so
+# they are served with a one-year immutable Cache-Control and a browser
+# fetches each asset once. The triage API serves them under /static/; set
+# EPIDEMICCARE_ASSET_URL to where they are reachable from the browser, e.g.
+# "/static" behind a reverse proxy. Without it the app inlines the
+# stylesheet on every rerun and hands the image to Streamlit. Plain names
+# are still served, revalidated on every use, but nothing the app emits
+# points at one: url() returns fingerprinted names and stylesheets have
+# their url(...) references to sibling assets rewritten to them.
+#
+#   python -m epidemiccare.assets build /var/www/epidemiccare
+#
+# writes the fingerprinted files with .gz and .br siblings for a web server
+# that serves pre-compressed files (nginx gzip_static / brotli_static).
+import argparse
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+ASSET_URL = os.environ.get("EPIDEMICCARE_ASSET_URL")
+
+IMMUTABLE = b"public, max-age=31536000, immutable"
+# Unfingerprinted names may change content on deploy, so they are revalidated
+REVALIDATE = b"public, no-cache"
+# Compression only pays off for text formats above this size
+COMPRESS_OVER = 256
+COMPRESSIBLE = ("text/", "image/svg+xml", "application/json")
+
+# url(name), url('name') or url("name") in a stylesheet
+_CSS_URL = re.compile(r"""url\(\s*(['"]?)([^'")\s]+)\1\s*\)""")
+
+CONTENT_TYPES = {".css": "text/css; charset=utf-8", ".svg": "image/svg+xml", ".js": "text/javascript; charset=utf-8"}
+
+
+def _brotli(data):
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli.compress(data, quality=11)
+
+
+class Asset:
+    __slots__ = ("name", "path", "content_type", "data", "etag", "fingerprinted", "encodings")
+
+    def __init__(self, name, path, data=None):
+        self.name = name
+        self.path = path
+        if data is None:
+            with open(path, "rb") as f:
+                data = f.read()
+        self.data = data
+        digest = hashlib.sha256(self.data).hexdigest()
+        stem, extension = os.path.splitext(name)
+        self.content_type = CONTENT_TYPES.get(extension) or mimetypes.guess_type(name)[0] or "application/octet-stream"
+        self.etag = f'"{digest[:16]}"'.encode()
+        self.fingerprinted = f"{stem}.{digest[:10]}{extension}"
+        # Content-Encoding -> body, best first; only kept where smaller than the original
+        self.encodings = {}
+        if len(self.data) > COMPRESS_OVER and self.content_type.startswith(COMPRESSIBLE):
+            for encoding, body in (("br", _brotli(self.data)), ("gzip", gzip.compress(self.data, 9, mtime=0))):
+                if body is not None and len(body) < len(self.data):
+                    self.encodings[encoding] = body
+
+    def text(self):
+        return self.data.decode("utf-8")
+
+
+class AssetBundle:
+    def __init__(self, directory=STATIC_DIR, base_url=ASSET_URL):
+        self.directory = directory
+        self.base_url = base_url.rstrip("/") if base_url else None
+        self.assets = {}
+        self._by_fingerprint = {}
+        self._stylesheet_tags = {}
+        for name in sorted(os.listdir(directory)):
+            path = os.path.join(directory, name)
+            if os.path.isfile(path):
+                self.assets[name] = Asset(name, path)
+        # Rewritten before fingerprinting, so a stylesheet's name changes with what it references
+        for name, asset in list(self.assets.items()):
+            if asset.content_type.startswith("text/css"):
+                text = self._fingerprint_references(asset.text())
+                if text != asset.text():
+                    self.assets[name] = Asset(name, asset.path, text.encode("utf-8"))
+        for asset in self.assets.values():
+            self._by_fingerprint[asset.fingerprinted] = asset
+
+    def __getitem__(self, name):
+        return self.assets[name]
+
+    # Point url(...) references to sibling assets at their fingerprinted
+    # names, which resolve next to the fingerprinted stylesheet
+    def _fingerprint_references(self, text):
+        def replace(match):
+            asset = self.assets.get(match.group(2))
+            if asset is None or asset.content_type.startswith("text/css"):
+                return match.group(0)
+            return f"url({match.group(1)}{asset.fingerprinted}{match.group(1)})"
+        return _CSS_URL.sub(replace, text)
+
+    # Browser URL of an asset, always its fingerprinted name, or None when
+    # assets are not served over HTTP
+    def url(self, name):
+        if self.base_url is None:
+            return None
+        return f"{self.base_url}/{self.assets[name].fingerprinted}"
+
+    # Markup that applies a stylesheet: a <link> the browser caches, or the
+    # stylesheet inlined when assets are not served over HTTP
+    def stylesheet_tag(self, name):
+        tag = self._stylesheet_tags.get(name)
+        if tag is None:
+            url = self.url(name)
+            tag = f'<link rel="stylesheet" href="{url}">' if url else f"<style>\n{self.assets[name].text()}</style>"
+            self._stylesheet_tags[name] = tag
+        return tag
+
+    # (status, headers, body) for a request for `name` under the static path
+    def response(self, name, accept_encoding=b"", if_none_match=b""):
+        asset = self._by_fingerprint.get(name)
+        cache_control = IMMUTABLE
+        if asset is None:
+            asset = self.assets.get(name)
+            cache_control = REVALIDATE
+        if asset is None:
+            return 404, [(b"content-type", b"text/plain")], b"Not found"
+
+        headers = [(b"cache-control", cache_control), (b"etag", asset.etag), (b"vary", b"accept-encoding")]
+        if if_none_match and asset.etag in if_none_match:
+            return 304, headers, b""
+        body = asset.data
+        for encoding, encoded in asset.encodings.items():
+            if encoding.encode() in accept_encoding:
+                headers.append((b"content-encoding", encoding.encode()))
+                body = encoded
+                break
+        headers.append((b"content-type", asset.content_type.encode()))
+        headers.append((b"content-length", str(len(body)).encode()))
+        return 200, headers, body
+
+    # Write fingerprinted files and their pre-compressed variants for a web server
+    def build(self, output):
+        os.makedirs(output, exist_ok=True)
+        written = []
+        for asset in self.assets.values():
+            path = os.path.join(output, asset.fingerprinted)
+            with open(path, "wb") as f:
+                f.write(asset.data)
+            written.append(path)
+            for encoding, body in asset.encodings.items():
+                suffix = ".br" if encoding == "br" else ".gz"
+                with open(path + suffix, "wb") as f:
+                    f.write(body)
+                written.append(path + suffix)
+        return written
+
+
+_default_bundle = None
+_default_lock = threading.Lock()
+
+
+# Function to get the process-wide asset bundle
+def get_assets():
+    global _default_bundle
+    if _default_bundle is None:
+        with _default_lock:
+            if _default_bundle is None:
+                _default_bundle = AssetBundle()
+    return _default_bundle
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m epidemiccare.assets",
+                                     description="Write fingerprinted, pre-compressed static assets")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build = subparsers.add_parser("build")
+    build.add_argument("output")
+    args = parser.parse_args(argv)
+
+    for path in get_assets().build(args.output):
+        print(f"{os.path.getsize(path):8d}  {path}")
+
+
+if __name__ == "__main__":
+    main()
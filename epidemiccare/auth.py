@@ -0,0 +1,243 @@
+# Credentials: salted scrypt password hashes, signed session tokens and
+# login rate limits.
+#
+# Hashing and verification run in a bounded worker pool. scrypt releases the
+# GIL, so a login spike queues for the pool instead of stalling every
+# script thread, and at most `workers` hashes (16 MiB each) are in flight.
+# A successful login issues an HMAC-signed token. Tokens are kept in an
+# LRU cache, so a rerun checks its session with a dictionary lookup rather
+# than a password verification. Token buckets per account and per client
+# address throttle guessing before any hashing is done.
+import argparse
+import base64
+import getpass
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from epidemiccare.cache import LRUCache
+from epidemiccare.metrics import increment, timed
+from epidemiccare.storage import get_storage
+
+SCRYPT_N = int(os.environ.get("EPIDEMICCARE_SCRYPT_N", str(2 ** 14)))
+SCRYPT_R = 8
+SCRYPT_P = 1
+TOKEN_TTL = float(os.environ.get("EPIDEMICCARE_TOKEN_TTL", str(12 * 3600)))
+MIN_PASSWORD_LENGTH = 8
+
+
+class AuthError(Exception):
+    pass
+
+
+class RateLimited(AuthError):
+    pass
+
+
+# The account predates stored passwords and needs one set before it can sign in
+class PasswordResetRequired(AuthError):
+    pass
+
+
+def _b64(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _unb64(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+# Encoded as scrypt$n$r$p$salt$hash so the cost can be raised later
+def hash_password(password, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P):
+    salt = os.urandom(16)
+    digest = hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * r * n * 2, dklen=32)
+    return f"scrypt${n}${r}${p}${_b64(salt)}${_b64(digest)}"
+
+
+def verify_password(encoded, password):
+    try:
+        scheme, n, r, p, salt, expected = encoded.split("$")
+        n, r, p = int(n), int(r), int(p)
+    except (AttributeError, ValueError):
+        return False
+    if scheme != "scrypt":
+        return False
+    digest = hashlib.scrypt(password.encode(), salt=_unb64(salt), n=n, r=r, p=p, maxmem=256 * r * n * 2, dklen=32)
+    return hmac.compare_digest(digest, _unb64(expected))
+
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, tokens, updated):
+        self.tokens = tokens
+        self.updated = updated
+
+
+# Token buckets keyed by account or address: `capacity` attempts at once,
+# refilled at `rate` per second
+class RateLimiter:
+    def __init__(self, rate, capacity, max_keys=100000, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.max_keys = max_keys
+        self.clock = clock
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def allow(self, key, cost=1.0):
+        now = self.clock()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= self.max_keys:
+                    self._prune(now)
+                bucket = self._buckets[key] = TokenBucket(self.capacity, now)
+            else:
+                bucket.tokens = min(self.capacity, bucket.tokens + (now - bucket.updated) * self.rate)
+                bucket.updated = now
+            if bucket.tokens < cost:
+                return False
+            bucket.tokens -= cost
+            return True
+
+    # Drop buckets that have refilled completely; they behave like new ones
+    def _prune(self, now):
+        full = [key for key, bucket in self._buckets.items()
+                if bucket.tokens + (now - bucket.updated) * self.rate >= self.capacity]
+        for key in full:
+            del self._buckets[key]
+
+
+class CredentialStore:
+    def __init__(self, storage=None, workers=None, secret=None, token_ttl=TOKEN_TTL,
+                 account_limiter=None, address_limiter=None, clock=time.time):
+        self.storage = storage if storage is not None else get_storage()
+        self._pool = ThreadPoolExecutor(workers or os.cpu_count(), thread_name_prefix="epidemiccare-auth")
+        env_secret = os.environ.get("EPIDEMICCARE_SECRET_KEY")
+        # Without a configured key, tokens only survive as long as the process
+        self.secret = secret or (env_secret.encode() if env_secret else secrets.token_bytes(32))
+        self.token_ttl = token_ttl
+        self.clock = clock
+        # 5 attempts per account, then one every 30 s; 20 per address, then one every 3 s
+        self.account_limiter = account_limiter or RateLimiter(1 / 30, 5)
+        self.address_limiter = address_limiter or RateLimiter(1 / 3, 20)
+        self._tokens = LRUCache(maxsize=100000, ttl=token_ttl)
+        # Verified against when the account does not exist, so both cases take as long
+        self._dummy_hash = hash_password(secrets.token_urlsafe(16))
+
+    def _check_limits(self, email, address):
+        if not self.account_limiter.allow(email.lower()) or (address and not self.address_limiter.allow(address)):
+            increment("auth_rate_limited")
+            raise RateLimited("Too many attempts, please wait a minute and try again")
+
+    def issue_token(self, email):
+        expires = int(self.clock() + self.token_ttl)
+        payload = f"{email}|{expires}"
+        signature = hmac.new(self.secret, payload.encode(), hashlib.sha256).digest()
+        token = f"{_b64(payload.encode())}.{_b64(signature)}"
+        self._tokens.put(token, (email, expires))
+        return token
+
+    # Email a token was issued for, or None if it is forged, expired or revoked
+    def session_user(self, token):
+        if not token:
+            return None
+        entry = self._tokens.get(token)
+        if entry is None:
+            # Issued before a restart, or pushed out of the cache: check the signature
+            try:
+                encoded, signature = token.split(".")
+                payload = _unb64(encoded)
+                expected = hmac.new(self.secret, payload, hashlib.sha256).digest()
+                if not hmac.compare_digest(expected, _unb64(signature)):
+                    return None
+                email, expires = payload.decode().rsplit("|", 1)
+                entry = (email, int(expires))
+            except (ValueError, UnicodeDecodeError):
+                return None
+            self._tokens.put(token, entry)
+        email, expires = entry
+        return email if expires > self.clock() else None
+
+    # Revocation is recorded in this process's cache; other processes honour the token until it expires
+    def revoke(self, token):
+        if token:
+            self._tokens.put(token, ("", 0))
+
+    # The account is created only if no user has the email, including one that
+    # predates stored passwords, so registering cannot take over existing data
+    @timed("auth.register")
+    def register(self, email, password, name=None, address=None):
+        if len(password) < MIN_PASSWORD_LENGTH:
+            raise AuthError(f"Password must be at least {MIN_PASSWORD_LENGTH} characters")
+        self._check_limits(email, address)
+        encoded = self._pool.submit(hash_password, password).result()
+        if not self.storage.create_account(email, name, encoded):
+            raise AuthError("An account with this email already exists")
+        increment("auth_registrations")
+        return self.issue_token(email)
+
+    @timed("auth.login")
+    def login(self, email, password, address=None):
+        self._check_limits(email, address)
+        encoded = self.storage.load_password_hash(email)
+        verified = self._pool.submit(verify_password, encoded or self._dummy_hash, password).result()
+        if encoded is None and self.storage.load_history(email) is not None:
+            increment("auth_failures")
+            raise PasswordResetRequired("This account has no password yet. Please contact support to set one")
+        if encoded is None or not verified:
+            increment("auth_failures")
+            raise AuthError("Incorrect email or password")
+        increment("auth_logins")
+        return self.issue_token(email)
+
+    # Set a new password without the old one, for an operator who has verified
+    # the patient out of band; tokens issued before are not revoked
+    def reset_password(self, email, password):
+        if len(password) < MIN_PASSWORD_LENGTH:
+            raise AuthError(f"Password must be at least {MIN_PASSWORD_LENGTH} characters")
+        if self.storage.load_history(email) is None:
+            raise AuthError(f"No account for {email}")
+        self.storage.set_password_hash(email, self._pool.submit(hash_password, password).result())
+
+
+_default_store = None
+_default_lock = threading.Lock()
+
+
+# Function to get the process-wide credential store
+def get_credentials():
+    global _default_store
+    if _default_store is None:
+        with _default_lock:
+            if _default_store is None:
+                _default_store = CredentialStore()
+    return _default_store
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m epidemiccare.auth", description="Manage patient accounts")
+    commands = parser.add_subparsers(dest="command", required=True)
+    reset = commands.add_parser("reset-password", help="set a new password for an account, e.g. one that "
+                                                      "predates stored passwords")
+    reset.add_argument("email")
+    args = parser.parse_args(argv)
+
+    password = getpass.getpass("New password: ")
+    if getpass.getpass("Repeat it: ") != password:
+        parser.exit(1, "Passwords do not match\n")
+    try:
+        get_credentials().reset_password(args.email, password)
+    except AuthError as e:
+        parser.exit(1, f"{e}\n")
+    get_storage().flush()
+    print(f"Password set for {args.email}")
+
+
+if __name__ == "__main__":
+    main()
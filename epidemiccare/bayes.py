@@ -0,0 +1,139 @@
+# Naive-Bayes diagnosis over precomputed log-likelihood tables.
+#
+# Each disease has a prior and, per symptom, a probability that a patient
+# with the disease reports it. Evidence is encoded as two indicator columns
+# per symptom (reported present, reported absent), so the log-posterior of
+# every disease is one matrix-vector product against the stacked
+# [log P(present | disease), log P(absent | disease)] table. "Not sure" and
+# unasked symptoms set neither column, which marginalizes them out exactly.
+#
+# Disease entries may set "prior" and per-symptom "likelihoods"; otherwise
+# priors are uniform and listed symptoms get `sensitivity`, others
+# `false_positive`.
+#
+# The question scheduler always uses this model. The app's diagnosis uses it
+# instead of the match-count ranking when EPIDEMICCARE_DIAGNOSIS=bayes.
+import threading
+
+import numpy as np
+
+from epidemiccare.core import RISK_GROUPS, evidence_from_answers
+from epidemiccare.index import SymptomIndex, normalize_symptom, symptom_vocabulary
+from epidemiccare.knowledge import get_knowledge_base
+from epidemiccare.matcher import SymptomMatcher
+
+
+class BayesModel:
+    def __init__(self, diseases, sensitivity=0.85, false_positive=0.05, synonyms=None):
+        self.diseases = diseases
+        self.disease_names = list(diseases)
+        self.sensitivity = sensitivity
+        self.false_positive = false_positive
+        self.index = SymptomIndex(diseases, synonyms)
+
+        self.vocabulary = symptom_vocabulary(diseases, RISK_GROUPS)
+        n_symptoms = len(self.vocabulary)
+
+        # disease x symptom membership, for the match counts shown to patients
+        self.membership = np.zeros((len(diseases), n_symptoms), dtype=np.int32)
+        for row, info in enumerate(diseases.values()):
+            for symptom in info["symptoms"]:
+                self.membership[row, self.vocabulary[normalize_symptom(symptom)]] = 1
+
+        likelihood = np.where(self.membership == 1, sensitivity, false_positive)
+        priors = np.ones(len(diseases), dtype=np.float64)
+        for row, info in enumerate(diseases.values()):
+            for symptom, probability in info.get("likelihoods", {}).items():
+                col = self.vocabulary.get(self.canonical(symptom))
+                if col is not None:
+                    likelihood[row, col] = probability
+            priors[row] = info.get("prior", 1.0)
+        likelihood = np.clip(likelihood, 1e-6, 1 - 1e-6)
+
+        self.log_prior = np.log(priors / priors.sum())
+        self.log_present = np.log(likelihood)
+        self.log_absent = np.log1p(-likelihood)
+        # disease x (present columns | absent columns)
+        self.weights = np.hstack([self.log_present, self.log_absent])
+
+        # Symptom mentions in free text
+        self.matcher = SymptomMatcher.from_index(self.index, self.vocabulary, synonyms)
+
+    def canonical(self, symptom):
+        return self.matcher.canonical(symptom)
+
+    # (present, absent) symptom names from questionnaire answers; "Not sure" is neither
+    @staticmethod
+    def evidence_from_answers(answers):
+        return evidence_from_answers(answers)
+
+    # Evidence vector over the stacked present/absent columns. Symptoms that
+    # `text` mentions or denies only count where present/absent say nothing.
+    def encode(self, present=(), absent=(), text=None):
+        vector = np.zeros(2 * len(self.vocabulary), dtype=np.float64)
+        n_symptoms = len(self.vocabulary)
+        present = [self.canonical(symptom) for symptom in present]
+        absent = [self.canonical(symptom) for symptom in absent]
+        if text:
+            answered = set(present) | set(absent)
+            affirmed, denied = self.matcher.mentions(text)
+            present += [symptom for symptom in affirmed if symptom not in answered]
+            absent += [symptom for symptom in denied if symptom not in answered]
+        for symptom in absent:
+            col = self.vocabulary.get(symptom)
+            if col is not None:
+                vector[n_symptoms + col] = 1
+        for symptom in present:
+            col = self.vocabulary.get(symptom)
+            if col is not None:
+                vector[col] = 1
+                vector[n_symptoms + col] = 0
+        return vector
+
+    # Evidence matrix for many patients, each a (present, absent) pair
+    def encode_many(self, patients):
+        patients = list(patients)
+        matrix = np.zeros((len(patients), 2 * len(self.vocabulary)), dtype=np.float64)
+        for row, (present, absent) in enumerate(patients):
+            matrix[row] = self.encode(present, absent)
+        return matrix
+
+    # Disease posteriors for one evidence vector, or for each row of a matrix
+    def posterior(self, evidence):
+        log_posterior = evidence @ self.weights.T + self.log_prior
+        log_posterior -= log_posterior.max(axis=-1, keepdims=True)
+        posterior = np.exp(log_posterior)
+        return posterior / posterior.sum(axis=-1, keepdims=True)
+
+    # Ranked diseases in the same tuple shape as SymptomIndex.matches(), with the
+    # posterior probability in percent instead of the match percentage
+    def diagnose(self, present=(), absent=(), text=None, limit=None):
+        evidence = self.encode(present, absent, text)
+        posterior = self.posterior(evidence)
+        match_counts = self.membership @ evidence[:len(self.vocabulary)].astype(np.int32)
+
+        ranked = []
+        for row in np.argsort(-posterior, kind="stable")[:limit].tolist():
+            disease = self.disease_names[row]
+            info = self.diseases[disease]
+            ranked.append((disease, int(match_counts[row]), info["description"],
+                           float(posterior[row]) * 100, info["precautions"]))
+        return ranked
+
+    def diagnose_answers(self, answers, text=None, limit=None):
+        present, absent = self.evidence_from_answers(answers)
+        return self.diagnose(present, absent, text, limit)
+
+
+_model = None
+_model_lock = threading.Lock()
+
+
+# Function to get the model for the current knowledge base, rebuilt when it changes
+def get_bayes_model():
+    global _model
+    knowledge_base = get_knowledge_base()
+    with _model_lock:
+        if _model is None or _model[0] is not knowledge_base:
+            _model = (knowledge_base, BayesModel(knowledge_base.diseases, synonyms=knowledge_base.synonyms))
+        return _model[1]
@@ -0,0 +1,148 @@
+# Compact, bounded chat log kept in session state.
+#
+# Senders are stored as one byte each next to the (interned) message texts.
+# Only the newest `window` messages stay in memory; older turns are handed
+# to an archive and dropped from the session.
+import html
+import json
+import os
+import sys
+import time
+import uuid
+from array import array
+
+from epidemiccare.paths import private_dir, state_dir
+
+SENDERS = ("doctor", "user")
+SENDER_CODES = {sender: code for code, sender in enumerate(SENDERS)}
+LABELS = ("Dr. AI", "You")
+CSS_CLASSES = ("doctor-chat", "user-chat")
+
+DEFAULT_WINDOW = int(os.environ.get("EPIDEMICCARE_CHAT_WINDOW", "40"))
+# Days an archived conversation is kept after its last message; 0 keeps them forever
+RETENTION_DAYS = float(os.environ.get("EPIDEMICCARE_CHAT_RETENTION_DAYS", "30"))
+
+
+# Appends archived turns to one JSONL file per conversation. Transcripts are
+# patient data: the directory is private (0700), files are 0600, and
+# conversations older than `retention` seconds are deleted as new turns arrive.
+class JsonlArchive:
+    def __init__(self, directory=None, retention=RETENTION_DAYS * 24 * 3600, purge_interval=3600.0):
+        if directory is None:
+            directory = os.environ.get("EPIDEMICCARE_CHAT_ARCHIVE_DIR", state_dir("chats"))
+        self.directory = directory
+        self.retention = retention
+        self.purge_interval = purge_interval
+        self._next_purge = 0.0
+
+    def _path(self, conversation_id):
+        return os.path.join(self.directory, f"{conversation_id}.jsonl")
+
+    def __call__(self, conversation_id, messages):
+        private_dir(self.directory)
+        fd = os.open(self._path(conversation_id), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+        with os.fdopen(fd, "a", encoding="utf-8") as f:
+            for sender, text in messages:
+                f.write(json.dumps({"sender": sender, "text": text}) + "\n")
+        now = time.time()
+        if self.retention and now >= self._next_purge:
+            self._next_purge = now + self.purge_interval
+            self.purge(now)
+
+    def load(self, conversation_id):
+        try:
+            with open(self._path(conversation_id), encoding="utf-8") as f:
+                return [(record["sender"], record["text"]) for record in map(json.loads, f)]
+        except FileNotFoundError:
+            return []
+
+    # Delete conversations without a new message for `retention` seconds; returns how many
+    def purge(self, now=None):
+        cutoff = (time.time() if now is None else now) - self.retention
+        removed = 0
+        try:
+            entries = os.scandir(self.directory)
+        except FileNotFoundError:
+            return 0
+        with entries:
+            for entry in entries:
+                if not entry.name.endswith(".jsonl"):
+                    continue
+                try:
+                    if entry.stat().st_mtime < cutoff:
+                        os.remove(entry.path)
+                        removed += 1
+                except FileNotFoundError:
+                    # Purged concurrently by another process
+                    pass
+        return removed
+
+
+class ChatLog:
+    __slots__ = ("conversation_id", "window", "archive", "archived", "_senders", "_texts")
+
+    def __init__(self, window=DEFAULT_WINDOW, archive=None, conversation_id=None):
+        self.conversation_id = conversation_id or uuid.uuid4().hex
+        self.window = window
+        self.archive = archive if archive is not None else JsonlArchive()
+        # Number of messages already moved out to the archive
+        self.archived = 0
+        self._senders = array("B")
+        self._texts = []
+
+    # Plain values for a session snapshot; older messages stay in the archive
+    def to_dict(self):
+        return {"conversation_id": self.conversation_id, "window": self.window, "archived": self.archived,
+                "senders": self._senders.tolist(), "texts": list(self._texts)}
+
+    @classmethod
+    def from_dict(cls, state, archive=None):
+        log = cls(state["window"], archive, state["conversation_id"])
+        log.archived = state["archived"]
+        log._senders = array("B", state["senders"])
+        log._texts = [sys.intern(text) if code == 0 else text for code, text in zip(log._senders, state["texts"])]
+        return log
+
+    # Total number of messages, archived ones included
+    def __len__(self):
+        return self.archived + len(self._texts)
+
+    # Iterates over the messages still held in memory as (sender, text)
+    def __iter__(self):
+        for code, text in zip(self._senders, self._texts):
+            yield SENDERS[code], text
+
+    def last(self):
+        if not self._texts:
+            return None
+        return SENDERS[self._senders[-1]], self._texts[-1]
+
+    def append(self, sender, text):
+        self._senders.append(SENDER_CODES[sender])
+        self._texts.append(sys.intern(text) if sender == "doctor" else text)
+        if self.window and len(self._texts) > self.window:
+            self._archive_oldest(len(self._texts) - self.window)
+
+    def _archive_oldest(self, count):
+        self.archive(self.conversation_id,
+                     [(SENDERS[code], text) for code, text in zip(self._senders[:count], self._texts[:count])])
+        del self._senders[:count]
+        del self._texts[:count]
+        self.archived += count
+
+    # Messages from absolute position `start` onwards that are still in memory
+    def since(self, start=0):
+        offset = max(start - self.archived, 0)
+        for code, text in zip(self._senders[offset:], self._texts[offset:]):
+            yield SENDERS[code], text
+
+    # One HTML block for all messages from `start`, so the transcript is a single element
+    def render_html(self, start=0):
+        parts = []
+        if start == 0 and self.archived:
+            parts.append(f'<p><i>{self.archived} earlier messages archived</i></p>')
+        for sender, text in self.since(start):
+            code = SENDER_CODES[sender]
+            parts.append(f'<div class="{CSS_CLASSES[code]}"><b>{LABELS[code]}:</b> '
+                         f'{html.escape(text, quote=False)}</div>')
+        return "".join(parts)
@@ -0,0 +1,222 @@
+# Triage logic with explicit inputs and outputs, independent of Streamlit.
+#
+# Pure Python on purpose: importing this module pulls in neither Streamlit,
+# pandas nor numpy, so the UI, batch jobs and benchmarks can all use it
+# cheaply. Batch scoring of many patients lives in epidemiccare.engine.
+import os
+import threading
+from collections import namedtuple
+
+from epidemiccare.cache import LRUCache
+from epidemiccare.index import SymptomIndex, normalize_symptom
+from epidemiccare.knowledge import get_knowledge_base
+from epidemiccare.matcher import SymptomMatcher
+from epidemiccare.metrics import gauge, timed
+
+# Symptom groups scored by assess_risk(): a group adds its points once
+# if any of its symptoms is present
+RISK_GROUPS = (
+    (("fever",), 2),
+    (("cough", "difficulty breathing"), 2),
+    (("loss of taste", "loss of smell"), 3),
+)
+
+# Lowest score for each risk level, checked from the top down
+RISK_THRESHOLDS = (
+    ("high", 5),
+    ("medium", 3),
+)
+
+TriageResult = namedtuple("TriageResult", ["risk_level", "risk_score", "diseases"])
+
+# Answer values that report a symptom present or absent; "Not sure" is neither
+# and any other text is parsed for symptom mentions
+PRESENT = ("Yes", True)
+ABSENT = ("No", False)
+UNSURE = "Not sure"
+
+# Answer keys holding free text rather than a symptom answer
+FREE_TEXT_KEYS = ("conditions",)
+
+# Disease ranking for generate_diagnosis() and triage(): "match" ranks by matched
+# symptoms; "bayes" by naive-Bayes posterior (epidemiccare.bayes, needs numpy)
+DIAGNOSIS_MODEL = os.environ.get("EPIDEMICCARE_DIAGNOSIS", "match")
+
+
+# Function to score the risk of one patient's symptoms
+def risk_for_symptoms(symptoms, risk_groups=RISK_GROUPS, risk_thresholds=RISK_THRESHOLDS,
+                      canonical=normalize_symptom):
+    present = {canonical(symptom) for symptom in symptoms}
+    risk_score = 0
+    for group, points in risk_groups:
+        if any(canonical(symptom) in present for symptom in group):
+            risk_score += points
+    for level, threshold in risk_thresholds:
+        if risk_score >= threshold:
+            return level, risk_score
+    return "low", risk_score
+
+
+# Assessments shared by every session, keyed by knowledge base and symptom bitmask
+_cache = LRUCache()
+gauge("triage_cache_hits", lambda: _cache.hits)
+gauge("triage_cache_misses", lambda: _cache.misses)
+gauge("triage_cache_size", lambda: len(_cache))
+
+
+# Single-patient triage over one knowledge base
+class Triage:
+    def __init__(self, knowledge_base, cache=None):
+        self.knowledge_base = knowledge_base
+        self.index = SymptomIndex(knowledge_base.diseases, knowledge_base.synonyms)
+        self.cache = _cache if cache is None else cache
+
+        risk_symptoms = [symptom for group, _ in RISK_GROUPS for symptom in group]
+        self.matcher = SymptomMatcher.from_index(self.index, risk_symptoms, knowledge_base.synonyms)
+
+        # Canonical symptoms each question asks about, by step, as listed in the questions file
+        self.question_symptoms = tuple(
+            tuple(dict.fromkeys(self.canonical(symptom) for symptom in symptoms))
+            for symptoms in knowledge_base.question_symptoms
+        )
+
+        # One bit per symptom that can change a result; anything else is ignored
+        vocabulary = dict.fromkeys(self.index.postings)
+        for symptom in risk_symptoms:
+            vocabulary[self.canonical(symptom)] = None
+        self.bits = {symptom: 1 << bit for bit, symptom in enumerate(vocabulary)}
+
+    def canonical(self, symptom):
+        return self.matcher.canonical(symptom)
+
+    # Canonical bitmask of a patient's symptoms, used as the cache key
+    def key(self, symptoms):
+        mask = 0
+        for symptom in symptoms:
+            mask |= self.bits.get(self.canonical(symptom), 0)
+        return mask
+
+    # Symptoms an answer key refers to: the question's symptoms for a step
+    # key like "symptom_3", or the named symptom for a key like "symptom_fever"
+    def key_symptoms(self, key):
+        name = key[len('symptom_'):]
+        if name.isdigit():
+            step = int(name)
+            return self.question_symptoms[step] if step < len(self.question_symptoms) else ()
+        return (self.canonical(name),)
+
+    # (present, absent) canonical symptoms from questionnaire answers. Explicit
+    # Yes/No answers always win over free text; of the rest, symptoms mentioned
+    # in free text are present and those it denies ("no fever") are absent.
+    def evidence(self, answers):
+        present = {}
+        absent = {}
+        mentioned = {}
+        denied = {}
+        for key, value in answers.items():
+            if key in FREE_TEXT_KEYS or (key.startswith('symptom_') and isinstance(value, str)
+                                         and value not in PRESENT and value not in ABSENT and value != UNSURE):
+                affirmed, negated = self.matcher.mentions(value)
+                mentioned.update(dict.fromkeys(affirmed))
+                denied.update(dict.fromkeys(negated))
+            elif not key.startswith('symptom_'):
+                continue
+            elif value in PRESENT:
+                present.update(dict.fromkeys(self.key_symptoms(key)))
+            elif value in ABSENT:
+                absent.update(dict.fromkeys(self.key_symptoms(key)))
+        for symptom in mentioned:
+            if symptom not in absent:
+                present.setdefault(symptom)
+        for symptom in denied:
+            if symptom not in present and symptom not in mentioned:
+                absent.setdefault(symptom)
+        return list(present), [symptom for symptom in absent if symptom not in present]
+
+    def assess(self, symptoms):
+        key = (self.knowledge_base.fingerprint, "risk", self.key(symptoms))
+        return self.cache.get_or_compute(key, lambda: risk_for_symptoms(symptoms, canonical=self.canonical))
+
+    # Ranked matches as a tuple, since cached results are shared between sessions
+    def diagnose(self, symptoms, limit=None):
+        def compute():
+            if limit is None:
+                return tuple(self.index.matches(symptoms))
+            return tuple(self.index.top_k(symptoms, limit))
+        key = (self.knowledge_base.fingerprint, "diagnosis", limit, self.key(symptoms))
+        return self.cache.get_or_compute(key, compute)
+
+    def treatment_plan(self, risk_level):
+        return self.knowledge_base.treatment_plans[risk_level]
+
+
+_triage = None
+_triage_lock = threading.Lock()
+
+
+# Function to get the triage for the current knowledge base, rebuilt when it changes
+def get_triage():
+    global _triage
+    knowledge_base = get_knowledge_base()
+    triage = _triage
+    if triage is None or triage.knowledge_base is not knowledge_base:
+        with _triage_lock:
+            if _triage is None or _triage.knowledge_base is not knowledge_base:
+                if _triage is not None:
+                    _cache.clear()
+                _triage = Triage(knowledge_base)
+            triage = _triage
+    return triage
+
+
+# Function to turn questionnaire answers into (present, absent) symptom names
+def evidence_from_answers(answers):
+    return get_triage().evidence(answers)
+
+
+# Function to turn questionnaire answers into the names of the symptoms present
+def symptoms_from_answers(answers):
+    return get_triage().evidence(answers)[0]
+
+
+# Function to report hits, misses and size of the shared assessment cache
+def cache_stats():
+    return _cache.stats()
+
+
+# Function to assess risk from questionnaire answers
+@timed("core.assess_risk")
+def assess_risk(answers):
+    return get_triage().assess(symptoms_from_answers(answers))
+
+
+# Function to rank possible diseases from questionnaire answers
+@timed("core.generate_diagnosis")
+def generate_diagnosis(answers, limit=None):
+    if DIAGNOSIS_MODEL == "bayes":
+        return _bayes_diagnosis(answers, limit)
+    return get_triage().diagnose(symptoms_from_answers(answers), limit)
+
+
+# Imported on first use so this module stays free of numpy
+def _bayes_diagnosis(answers, limit):
+    from epidemiccare.bayes import get_bayes_model
+
+    return tuple(get_bayes_model().diagnose_answers(answers, limit=limit))
+
+
+# Function to look up the treatment plan for a risk level
+@timed("core.generate_treatment_plan")
+def generate_treatment_plan(risk_level):
+    return get_triage().treatment_plan(risk_level)
+
+
+# Function to run the whole assessment for one patient
+@timed("core.triage")
+def triage(answers, limit=None):
+    symptoms = symptoms_from_answers(answers)
+    current = get_triage()
+    risk_level, risk_score = current.assess(symptoms)
+    if DIAGNOSIS_MODEL == "bayes":
+        return TriageResult(risk_level, risk_score, _bayes_diagnosis(answers, limit))
+    return TriageResult(risk_level, risk_score, current.diagnose(symptoms, limit))
@@ -0,0 +1,156 @@
+# Vectorized triage engine for batch jobs: intake files, API batches, benchmarks.
+#
+# Patients and diseases are encoded over one symptom vocabulary as 0/1
+# matrices, so scoring a whole intake queue is a couple of matrix products.
+import numpy as np
+
+from epidemiccare.core import RISK_GROUPS, RISK_THRESHOLDS, TriageResult, get_triage, risk_for_symptoms
+from epidemiccare.index import SymptomIndex, normalize_symptom, symptom_vocabulary
+from epidemiccare.matcher import SymptomMatcher
+
+
+class TriageEngine:
+    def __init__(self, diseases, risk_groups=RISK_GROUPS, risk_thresholds=RISK_THRESHOLDS, synonyms=None):
+        self.diseases = diseases
+        self.disease_names = list(diseases)
+        self.risk_groups = risk_groups
+        self.risk_thresholds = risk_thresholds
+
+        # Inverted index for single-patient diagnosis
+        self.index = SymptomIndex(diseases, synonyms)
+
+        self.vocabulary = symptom_vocabulary(diseases, risk_groups)
+        n_symptoms = len(self.vocabulary)
+        self.matcher = SymptomMatcher.from_index(self.index, self.vocabulary, synonyms)
+
+        # disease x symptom membership and the symptom count of each disease. Stored
+        # as float32 so match counts are a BLAS product; counts stay exact below 2**24.
+        self.disease_matrix = np.zeros((len(diseases), n_symptoms), dtype=np.float32)
+        for row, info in enumerate(diseases.values()):
+            for symptom in info["symptoms"]:
+                self.disease_matrix[row, self.vocabulary[normalize_symptom(symptom)]] = 1
+        self.disease_sizes = np.array([len(info["symptoms"]) for info in diseases.values()], dtype=np.float64)
+
+        # symptom x group membership and the points of each group
+        self.risk_matrix = np.zeros((n_symptoms, len(risk_groups)), dtype=np.int32)
+        for col, (group, _) in enumerate(risk_groups):
+            for symptom in group:
+                self.risk_matrix[self.vocabulary[normalize_symptom(symptom)], col] = 1
+        self.risk_weights = np.array([points for _, points in risk_groups], dtype=np.int32)
+
+    # Normalized name of a symptom, with synonyms mapped to their canonical symptom
+    def canonical(self, symptom):
+        return self.matcher.canonical(symptom)
+
+    # Encode lists of symptom names as a patient x symptom bit matrix.
+    # Symptoms outside the vocabulary cannot match anything and are dropped.
+    def encode(self, patients):
+        rows = []
+        cols = []
+        n_patients = 0
+        for row, symptoms in enumerate(patients):
+            n_patients += 1
+            for symptom in symptoms:
+                col = self.vocabulary.get(self.canonical(symptom))
+                if col is not None:
+                    rows.append(row)
+                    cols.append(col)
+        matrix = np.zeros((n_patients, len(self.vocabulary)), dtype=np.uint8)
+        matrix[rows, cols] = 1
+        return matrix
+
+    # One knowledge-base lookup for the whole batch, not one per patient
+    def encode_answers(self, answers):
+        triage = get_triage()
+        return self.encode(triage.evidence(patient)[0] for patient in answers)
+
+    # Encode a pandas DataFrame with one row per patient and symptom_* answer columns
+    def encode_frame(self, frame):
+        matrix = np.zeros((len(frame), len(self.vocabulary)), dtype=np.uint8)
+        triage = get_triage()
+        for key in frame.columns:
+            if not key.startswith('symptom_'):
+                continue
+            present = frame[key].isin(["Yes", True]).to_numpy(dtype=np.uint8)
+            for symptom in triage.key_symptoms(key):
+                col = self.vocabulary.get(self.canonical(symptom))
+                if col is not None:
+                    matrix[:, col] |= present
+        return matrix
+
+    # Risk scores and levels for every row of an encoded matrix
+    def score(self, matrix):
+        group_hits = (matrix @ self.risk_matrix) > 0
+        scores = group_hits.astype(np.int32) @ self.risk_weights
+        levels = np.full(len(scores), "low", dtype=object)
+        for level, threshold in reversed(self.risk_thresholds):
+            levels[scores >= threshold] = level
+        return levels, scores
+
+    # Number of matching symptoms for every patient x disease pair
+    def match_counts(self, matrix):
+        return (matrix.astype(np.float32) @ self.disease_matrix.T).astype(np.int32)
+
+    # Matching diseases per patient, most matched symptoms first.
+    # Ties keep catalog order, like list.sort(): the sort key folds the
+    # column into the count, so every key is unique. With a limit only the
+    # top `limit` columns are selected (argpartition) and sorted.
+    def rank(self, matrix, limit=None):
+        counts = self.match_counts(matrix)
+        percentages = counts / self.disease_sizes * 100
+        n_diseases = counts.shape[1]
+        keys = np.arange(n_diseases, dtype=np.int64) - counts.astype(np.int64) * n_diseases
+        if limit is not None and limit < n_diseases:
+            if limit <= 0:
+                return [[] for _ in range(len(counts))]
+            top = np.argpartition(keys, limit - 1, axis=1)[:, :limit]
+            order = np.take_along_axis(top, np.argsort(np.take_along_axis(keys, top, axis=1), axis=1), axis=1)
+        else:
+            order = np.argsort(keys, axis=1)
+
+        ranked = []
+        for patient_counts, patient_percentages, patient_order in zip(counts, percentages, order):
+            matches = []
+            for col in patient_order.tolist():
+                match_count = int(patient_counts[col])
+                if match_count == 0:
+                    break
+                disease = self.disease_names[col]
+                info = self.diseases[disease]
+                matches.append((disease, match_count, info["description"],
+                                float(patient_percentages[col]), info["precautions"]))
+            ranked.append(matches)
+        return ranked
+
+    def triage_matrix(self, matrix, limit=None):
+        levels, scores = self.score(matrix)
+        ranked = self.rank(matrix, limit)
+        return [
+            TriageResult(level, int(score), matches)
+            for level, score, matches in zip(levels.tolist(), scores.tolist(), ranked)
+        ]
+
+    # Risk level and score for a single patient
+    def assess(self, symptoms):
+        return risk_for_symptoms(symptoms, self.risk_groups, self.risk_thresholds, self.canonical)
+
+    # Ranked disease matches for a single patient, looked up in the inverted index
+    def diagnose(self, symptoms, limit=None):
+        if limit is None:
+            return self.index.matches(symptoms)
+        return self.index.top_k(symptoms, limit)
+
+    # Triage lists of symptom names, one list per patient
+    def triage(self, patients, limit=None):
+        return self.triage_matrix(self.encode(patients), limit)
+
+    # Triage questionnaire answer dicts like st.session_state.symptoms
+    def triage_answers(self, answers, limit=None):
+        return self.triage_matrix(self.encode_answers(answers), limit)
+
+    # Triage a DataFrame of answers and return one result row per patient
+    def triage_frame(self, frame, limit=None):
+        import pandas as pd
+
+        results = self.triage_matrix(self.encode_frame(frame), limit)
+        return pd.DataFrame(results, columns=TriageResult._fields, index=frame.index)
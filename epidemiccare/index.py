@@ -0,0 +1,90 @@
+# Inverted symptom -> disease index built once per disease catalog.
+#
+# A consultation only touches the posting lists of the patient's own
+# symptoms, so its cost does not grow with the size of the catalog.
+import heapq
+
+
+# Function to normalize a symptom name for lookups
+def normalize_symptom(name):
+    return " ".join(name.lower().replace("_", " ").split())
+
+
+# Function to assign a column index to every symptom known to the diseases or
+# the risk rules, in catalog order, for the matrix-based models
+def symptom_vocabulary(diseases, risk_groups=()):
+    vocabulary = {}
+    for info in diseases.values():
+        for symptom in info["symptoms"]:
+            vocabulary.setdefault(normalize_symptom(symptom), len(vocabulary))
+    for group, _ in risk_groups:
+        for symptom in group:
+            vocabulary.setdefault(normalize_symptom(symptom), len(vocabulary))
+    return vocabulary
+
+
+class SymptomIndex:
+    def __init__(self, diseases, synonyms=None):
+        self.diseases = diseases
+        self.disease_names = list(diseases)
+
+        # Symptom count per disease, used for the match percentage
+        self.symptom_counts = [len(info["symptoms"]) for info in diseases.values()]
+
+        # Normalized symptom -> ids of the diseases listing it
+        postings = {}
+        for disease_id, info in enumerate(diseases.values()):
+            for symptom in info["symptoms"]:
+                ids = postings.setdefault(normalize_symptom(symptom), [])
+                if not ids or ids[-1] != disease_id:
+                    ids.append(disease_id)
+        self.postings = {symptom: tuple(ids) for symptom, ids in postings.items()}
+
+        # Synonym -> canonical symptom name
+        self.canonical = {symptom: symptom for symptom in self.postings}
+        for synonym, symptom in (synonyms or {}).items():
+            symptom = normalize_symptom(symptom)
+            if symptom in self.postings:
+                self.canonical.setdefault(normalize_symptom(synonym), symptom)
+
+    def __len__(self):
+        return len(self.disease_names)
+
+    # Canonical names of the known symptoms in a patient's list
+    def canonicalize(self, symptoms):
+        found = {}
+        for symptom in symptoms:
+            symptom = self.canonical.get(normalize_symptom(symptom))
+            if symptom is not None:
+                found[symptom] = None
+        return list(found)
+
+    def lookup(self, symptom):
+        symptom = self.canonical.get(normalize_symptom(symptom))
+        return self.postings.get(symptom, ())
+
+    # Matched symptom count per disease id, for diseases with at least one match
+    def match_counts(self, symptoms):
+        counts = {}
+        for symptom in self.canonicalize(symptoms):
+            for disease_id in self.postings[symptom]:
+                counts[disease_id] = counts.get(disease_id, 0) + 1
+        return counts
+
+    def _result(self, disease_id, match_count):
+        disease = self.disease_names[disease_id]
+        info = self.diseases[disease]
+        match_percentage = (match_count / self.symptom_counts[disease_id]) * 100
+        return (disease, match_count, info["description"], match_percentage, info["precautions"])
+
+    # All matching diseases, most matched symptoms first and catalog order between ties
+    def matches(self, symptoms):
+        counts = self.match_counts(symptoms)
+        ranked = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+        return [self._result(disease_id, match_count) for disease_id, match_count in ranked]
+
+    # The k best matches, selected with a heap instead of sorting every candidate
+    def top_k(self, symptoms, k):
+        counts = self.match_counts(symptoms)
+        best = heapq.nsmallest(k, counts.items(), key=lambda item: (-item[1], item[0]))
+        return [self._result(disease_id, match_count) for disease_id, match_count in best]
@@ -0,0 +1,222 @@
+# Offline triage of questionnaire files collected in the field.
+#
+# Streams a CSV or JSONL file of answers in chunks through the triage engine
+# on a process pool and writes one result per patient, in input order, as
+# soon as each chunk is done. At most a few chunks are in flight at a time,
+# so memory stays bounded however large the input is.
+#
+#   python -m epidemiccare.intake answers.csv -o results.jsonl --workers 4
+#
+# Answer columns are the session keys used by the app (symptom_3 ...
+# symptom_9) or the question texts themselves; values of "Yes" or true, in
+# any case, count as a symptom. JSONL lines that fail to parse, or whose
+# answers the triage API would reject, are reported with their line number
+# and skipped.
+import argparse
+import csv
+import itertools
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from epidemiccare.core import FREE_TEXT_KEYS
+from epidemiccare.engine import TriageEngine
+from epidemiccare.knowledge import get_knowledge_base
+
+_engine = None
+_question_keys = None
+
+# Answer values as spreadsheets and exports spell them, mapped to the app's answers
+ANSWER_VALUES = {
+    "yes": "Yes", "y": "Yes", "true": "Yes", "1": "Yes",
+    "no": "No", "n": "No", "false": "No", "0": "No",
+    "not sure": "Not sure", "unsure": "Not sure",
+}
+
+
+def _init_worker():
+    global _engine, _question_keys
+    knowledge_base = get_knowledge_base()
+    _engine = TriageEngine(knowledge_base.diseases, synonyms=knowledge_base.synonyms)
+    # Questionnaire columns may be titled with the question itself
+    _question_keys = {question: f"symptom_{step}" for step, question in enumerate(knowledge_base.questions)}
+
+
+def _answers(row):
+    answers = {}
+    for key, value in row.items():
+        key = _question_keys.get(key, key)
+        if isinstance(key, str) and key.startswith("symptom_") and isinstance(value, str):
+            value = ANSWER_VALUES.get(value.strip().lower(), value)
+        answers[key] = value
+    return answers
+
+
+# Triage one chunk of rows and return the output records
+def triage_chunk(rows, id_column="id", top=2):
+    if _engine is None:
+        _init_worker()
+    results = _engine.triage_answers([_answers(row) for row in rows], limit=top)
+    records = []
+    for row, result in zip(rows, results):
+        records.append({
+            "id": row.get(id_column),
+            "risk_level": result.risk_level,
+            "risk_score": result.risk_score,
+            "diseases": [
+                {"name": disease, "match_count": match_count, "match_percentage": round(match_percentage, 1)}
+                for disease, match_count, _, match_percentage, _ in result.diseases
+            ],
+        })
+    return records
+
+
+# Why a row's answers cannot be triaged, or None. The same checks as the
+# triage API: free text must be a string, any other answer a string or a boolean.
+def row_error(row, id_column="id"):
+    for key, value in row.items():
+        if key == id_column:
+            continue
+        if key in FREE_TEXT_KEYS and not isinstance(value, str):
+            return f"answer {key!r} must be a string"
+        if not isinstance(value, (str, bool)):
+            return f"answer {key!r} must be a string or a boolean"
+    return None
+
+
+# Rows of a CSV or JSONL file as dicts. A JSONL line that is not a JSON object,
+# or whose answers fail row_error(), is passed to on_error(line_number, message)
+# and skipped, or raises ValueError naming the line when there is no on_error.
+# CSV values are always strings.
+def read_rows(f, fmt, on_error=None, id_column="id"):
+    if fmt == "csv":
+        yield from csv.DictReader(f)
+        return
+    for number, line in enumerate(f, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            message = f"invalid JSON: {e}"
+        else:
+            if not isinstance(row, dict):
+                message = f"expected an object, got {type(row).__name__}"
+            else:
+                message = row_error(row, id_column)
+                if message is None:
+                    yield row
+                    continue
+        if on_error is None:
+            raise ValueError(f"line {number}: {message}")
+        on_error(number, message)
+
+
+class JsonlWriter:
+    def __init__(self, f):
+        self.f = f
+
+    def write(self, records):
+        self.f.writelines(json.dumps(record) + "\n" for record in records)
+
+
+class CsvWriter:
+    def __init__(self, f):
+        self.writer = csv.writer(f)
+        self.writer.writerow(["id", "risk_level", "risk_score", "diseases"])
+
+    def write(self, records):
+        self.writer.writerows(
+            (record["id"], record["risk_level"], record["risk_score"],
+             ";".join(disease["name"] for disease in record["diseases"]))
+            for record in records
+        )
+
+
+def _format(path, fmt):
+    if fmt:
+        return fmt
+    return "csv" if path and path.endswith(".csv") else "jsonl"
+
+
+def chunked(rows, size):
+    rows = iter(rows)
+    while True:
+        chunk = list(itertools.islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+# Stream rows through triage_chunk and hand each finished chunk to write, in order
+def run(rows, write, workers=None, chunk_size=5000, id_column="id", top=2):
+    total = 0
+    if workers == 0:
+        for chunk in chunked(rows, chunk_size):
+            records = triage_chunk(chunk, id_column, top)
+            write(records)
+            total += len(records)
+        return total
+
+    workers = workers or os.cpu_count()
+    with ProcessPoolExecutor(workers, initializer=_init_worker) as pool:
+        pending = deque()
+        for chunk in chunked(rows, chunk_size):
+            pending.append(pool.submit(triage_chunk, chunk, id_column, top))
+            # Keep a couple of chunks queued per worker and no more
+            while len(pending) >= workers * 2:
+                records = pending.popleft().result()
+                write(records)
+                total += len(records)
+        while pending:
+            records = pending.popleft().result()
+            write(records)
+            total += len(records)
+    return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m epidemiccare.intake",
+                                     description="Triage questionnaire answers from a CSV or JSONL file")
+    parser.add_argument("input", help="input file, or - for stdin")
+    parser.add_argument("-o", "--output", help="output file (default: stdout)")
+    parser.add_argument("--input-format", choices=["csv", "jsonl"], help="default: from the file extension")
+    parser.add_argument("--output-format", choices=["csv", "jsonl"], help="default: from the file extension")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes, 0 to run inline (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument("--id-column", default="id")
+    parser.add_argument("--top", type=int, default=2, help="disease matches to report per patient")
+    args = parser.parse_args(argv)
+
+    input_format = _format(args.input, args.input_format)
+    output_format = _format(args.output, args.output_format)
+
+    source = sys.stdin if args.input == "-" else open(args.input, newline="", encoding="utf-8")
+    target = open(args.output, "w", newline="", encoding="utf-8") if args.output else sys.stdout
+    writer = CsvWriter(target) if output_format == "csv" else JsonlWriter(target)
+    skipped = []
+
+    def on_error(number, message):
+        skipped.append(number)
+        print(f"{args.input}:{number}: skipped, {message}", file=sys.stderr)
+
+    try:
+        start = time.perf_counter()
+        total = run(read_rows(source, input_format, on_error, args.id_column), writer.write, args.workers, args.chunk_size,
+                    args.id_column, args.top)
+        elapsed = time.perf_counter() - start
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if target is not sys.stdout:
+            target.close()
+
+    print(f"Triaged {total} patients in {elapsed:.1f}s ({total / max(elapsed, 1e-9) * 60:,.0f} per minute)"
+          + (f", skipped {len(skipped)} invalid lines" if skipped else ""), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
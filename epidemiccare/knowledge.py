@@ -0,0 +1,278 @@
+# Disease knowledge base loaded from versioned JSON/YAML files.
+#
+# Sources are parsed once per process and compiled into interned, tuple
+# based structures. The compiled form is also pickled into a snapshot
+# named after the content hash, so other processes skip the parsing, and
+# get() reloads in place whenever a source file changes on disk. Snapshots
+# are only read from a 0700 directory owned by this user, never from a
+# shared temp dir, since unpickling a planted file would run its code. A
+# broken edit during a reload is logged and the last good knowledge base
+# keeps being served.
+import hashlib
+import json
+import logging
+import os
+import pickle
+import stat
+import sys
+import tempfile
+import threading
+
+from epidemiccare.paths import private_dir, state_dir
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+
+# Source name -> top-level key holding its content
+SOURCES = {
+    "diseases": "diseases",
+    "questions": "questions",
+    "treatment_plans": "treatment_plans",
+    "precautions": "precautions",
+    "synonyms": "synonyms",
+}
+EXTENSIONS = (".json", ".yaml", ".yml")
+
+# Highest file version this code understands, per source. Version 2 of the
+# questions file lists the symptoms each question asks about.
+SUPPORTED_VERSIONS = {
+    "diseases": 1,
+    "questions": 2,
+    "treatment_plans": 1,
+    "precautions": 1,
+    "synonyms": 1,
+}
+
+# Risk levels every set of treatment plans must cover, and the fields of a plan
+RISK_LEVELS = ("low", "medium", "high")
+PLAN_FIELDS = ("medication", "rest", "diet", "monitoring", "follow_up", "duration")
+
+# Bumped whenever the compiled layout changes, so stale snapshots are ignored
+SNAPSHOT_FORMAT = 3
+
+
+class KnowledgeBaseError(ValueError):
+    pass
+
+
+class KnowledgeBase:
+    __slots__ = ("fingerprint", "versions", "diseases", "questions", "question_symptoms", "treatment_plans",
+                 "precautions", "synonyms")
+
+    def __init__(self, fingerprint, versions, diseases, questions, question_symptoms, treatment_plans,
+                 precautions, synonyms):
+        self.fingerprint = fingerprint
+        self.versions = versions
+        self.diseases = diseases
+        # Question texts by step, and the symptom names each one asks about
+        self.questions = questions
+        self.question_symptoms = question_symptoms
+        self.treatment_plans = treatment_plans
+        self.precautions = precautions
+        # Alternative symptom name -> canonical symptom name
+        self.synonyms = synonyms
+
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    def __repr__(self):
+        return f"KnowledgeBase({self.fingerprint[:12]}, {len(self.diseases)} diseases)"
+
+
+# Function to find the file backing a source, whichever format it uses
+def source_path(data_dir, name):
+    for extension in EXTENSIONS:
+        path = os.path.join(data_dir, name + extension)
+        if os.path.exists(path):
+            return path
+    raise KnowledgeBaseError(f"No {name} file in {data_dir}")
+
+
+def _parse(path, raw):
+    if path.endswith(".json"):
+        return json.loads(raw)
+    try:
+        import yaml
+    except ImportError:
+        raise KnowledgeBaseError(f"PyYAML is required to read {path}") from None
+    return yaml.safe_load(raw)
+
+
+# Recursively intern strings and freeze lists into tuples
+def _compile(value):
+    if isinstance(value, str):
+        return sys.intern(value)
+    if isinstance(value, list):
+        return tuple(_compile(item) for item in value)
+    if isinstance(value, dict):
+        return {sys.intern(key): _compile(item) for key, item in value.items()}
+    return value
+
+
+def compile_knowledge_base(fingerprint, documents):
+    versions = {}
+    content = {}
+    for name, key in SOURCES.items():
+        document = documents[name]
+        if not isinstance(document, dict) or key not in document:
+            raise KnowledgeBaseError(f"{name} file must contain a '{key}' entry")
+        version = document.get("version")
+        if not isinstance(version, int) or version > SUPPORTED_VERSIONS[name]:
+            raise KnowledgeBaseError(f"Unsupported {name} file version: {version!r}")
+        versions[name] = version
+        content[name] = _compile(document[key])
+
+    for disease, info in content["diseases"].items():
+        for field in ("symptoms", "description", "precautions"):
+            if field not in info:
+                raise KnowledgeBaseError(f"Disease {disease!r} is missing '{field}'")
+
+    for synonym, symptom in content["synonyms"].items():
+        if not isinstance(symptom, str):
+            raise KnowledgeBaseError(f"Synonym {synonym!r} must map to a symptom name")
+
+    plans = content["treatment_plans"]
+    if not isinstance(plans, dict):
+        raise KnowledgeBaseError("treatment_plans must map risk levels to plans")
+    for level in RISK_LEVELS:
+        plan = plans.get(level)
+        if not isinstance(plan, dict):
+            raise KnowledgeBaseError(f"treatment_plans is missing the {level!r} risk level")
+        for field in PLAN_FIELDS:
+            if field not in plan:
+                raise KnowledgeBaseError(f"Treatment plan {level!r} is missing '{field}'")
+
+    # Version 1 questions are strings; version 2 adds the symptoms each asks about
+    entries = content["questions"]
+    if not isinstance(entries, tuple) or not entries:
+        raise KnowledgeBaseError("questions must be a non-empty list")
+    for step, entry in enumerate(entries):
+        if versions["questions"] < 2:
+            if not isinstance(entry, str):
+                raise KnowledgeBaseError(f"Question {step} must be a string")
+        elif (not isinstance(entry, dict) or not isinstance(entry.get("text"), str)
+              or not isinstance(entry.get("symptoms"), tuple)
+              or not all(isinstance(symptom, str) for symptom in entry["symptoms"])):
+            raise KnowledgeBaseError(f"Question {step} must have a 'text' string and a 'symptoms' list of strings")
+
+    # Version 1 questions ask about no symptoms
+    questions = tuple(entry if isinstance(entry, str) else entry["text"] for entry in entries)
+    question_symptoms = tuple(() if isinstance(entry, str) else entry["symptoms"] for entry in entries)
+
+    return KnowledgeBase(fingerprint, versions, content["diseases"], questions, question_symptoms,
+                         content["treatment_plans"], content["precautions"], content["synonyms"])
+
+
+class KnowledgeBaseLoader:
+    def __init__(self, data_dir=DATA_DIR, cache_dir=None):
+        self.data_dir = data_dir
+        if cache_dir is None:
+            cache_dir = os.environ.get("EPIDEMICCARE_CACHE_DIR", state_dir("knowledge"))
+        self.cache_dir = cache_dir
+        self.knowledge_base = None
+        self._signature = None
+        self._lock = threading.Lock()
+
+    # (path, mtime, size) of every source file, cheap enough to check on each call
+    def _stat(self):
+        signature = []
+        for name in SOURCES:
+            path = source_path(self.data_dir, name)
+            info = os.stat(path)
+            signature.append((path, info.st_mtime_ns, info.st_size))
+        return tuple(signature)
+
+    def _snapshot_path(self, fingerprint):
+        return os.path.join(self.cache_dir, f"kb-{SNAPSHOT_FORMAT}-{fingerprint}.pickle")
+
+    def _read_snapshot(self, fingerprint):
+        try:
+            private_dir(self.cache_dir)
+            with open(self._snapshot_path(fingerprint), "rb") as f:
+                info = os.fstat(f.fileno())
+                # Only unpickle what this user wrote and nobody else can modify
+                if (hasattr(os, "getuid") and info.st_uid != os.getuid()) or stat.S_IMODE(info.st_mode) & 0o022:
+                    return None
+                knowledge_base = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            return None
+        if not isinstance(knowledge_base, KnowledgeBase) or knowledge_base.fingerprint != fingerprint:
+            return None
+        return knowledge_base
+
+    def _write_snapshot(self, knowledge_base):
+        path = self._snapshot_path(knowledge_base.fingerprint)
+        try:
+            private_dir(self.cache_dir)
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(knowledge_base, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except OSError:
+            # The snapshot only saves parsing time; a read-only disk is fine
+            pass
+
+    def _load(self, signature):
+        raw = {}
+        digest = hashlib.sha256()
+        for name, (path, _, _) in zip(SOURCES, signature):
+            with open(path, "rb") as f:
+                raw[name] = f.read()
+            digest.update(os.path.basename(path).encode())
+            digest.update(raw[name])
+        fingerprint = digest.hexdigest()
+
+        # Touched but unchanged files keep the current knowledge base
+        if self.knowledge_base is not None and self.knowledge_base.fingerprint == fingerprint:
+            return self.knowledge_base
+
+        knowledge_base = self._read_snapshot(fingerprint)
+        if knowledge_base is None:
+            documents = {name: _parse(path, raw[name]) for name, (path, _, _) in zip(SOURCES, signature)}
+            knowledge_base = compile_knowledge_base(fingerprint, documents)
+            self._write_snapshot(knowledge_base)
+        return knowledge_base
+
+    # Current knowledge base, reloaded if any source file changed since the last call.
+    # Once one has loaded, a source that fails to read or validate is logged and
+    # the previous knowledge base is kept until the files change again.
+    def get(self):
+        try:
+            signature = self._stat()
+        except (KnowledgeBaseError, OSError):
+            # A source file is missing, e.g. mid-rename by an editor
+            if self.knowledge_base is None:
+                raise
+            return self.knowledge_base
+        if signature == self._signature:
+            return self.knowledge_base
+        with self._lock:
+            if signature != self._signature:
+                try:
+                    self.knowledge_base = self._load(signature)
+                except Exception as e:
+                    # Malformed JSON/YAML or content that fails validation mid-edit
+                    if self.knowledge_base is None:
+                        raise
+                    logger.error("Reloading the knowledge base failed, keeping %s: %s",
+                                 self.knowledge_base.fingerprint[:12], e)
+                self._signature = signature
+        return self.knowledge_base
+
+    # Forget the loaded state so the next get() re-reads the sources
+    def invalidate(self):
+        with self._lock:
+            self._signature = None
+
+
+_default_loader = KnowledgeBaseLoader(os.environ.get("EPIDEMICCARE_DATA_DIR", DATA_DIR))
+
+
+# Function to get the process-wide knowledge base
+def get_knowledge_base():
+    return _default_loader.get()
@@ -0,0 +1,172 @@
+# Symptom extraction from free text with an Aho–Corasick automaton.
+#
+# Every symptom name and synonym is compiled once into one automaton, so a
+# text is scanned in a single pass whatever the size of the vocabulary.
+# Matches must start and end on word boundaries; overlapping matches keep
+# the leftmost, then longest ("high fever" rather than "fever").
+#
+# mentions() also tells affirmed from denied symptoms, NegEx style: a
+# mention is negated by a cue such as "no", "not", "without" or "don't"
+# among the few words before it, or "fine", "normal" or "gone" right after
+# it, within the same clause. A negation carries over a list joined by
+# "or" or "nor" ("no fever or cough"), but not past a comma, so "no fever,
+# cough for 3 days" still reports the cough.
+import re
+
+from epidemiccare.index import normalize_symptom
+
+NEGATION_BEFORE = frozenset(("no", "not", "without", "never", "nor", "neither", "denies", "deny", "denied"))
+NEGATION_AFTER = frozenset(("fine", "normal", "ok", "okay", "gone", "free", "resolved"))
+# Words that close the scope of a negation, besides punctuation
+SCOPE_BREAKS = frozenset(("but", "however", "although", "though", "except", "yet", "still"))
+LIST_JOINS = frozenset(("or", "nor"))
+# Punctuation that ends a clause
+CLAUSE_ENDS = frozenset(".,;:!?()")
+# Words searched for a cue before and after a mention
+WINDOW_BEFORE = 5
+WINDOW_AFTER = 2
+
+_TOKENS = re.compile(r"[a-z0-9']+|[^\sa-z0-9']")
+
+
+def _is_cue(token):
+    return token in NEGATION_BEFORE or token.endswith("n't")
+
+
+def _is_break(token):
+    return token in SCOPE_BREAKS or token in CLAUSE_ENDS
+
+
+class SymptomMatcher:
+    def __init__(self, phrases):
+        # Normalized phrase -> canonical symptom, and canonical symptom -> id
+        self.names = {}
+        self.symptom_ids = {}
+        # state -> {char: state}, failure link and (length, symptom id) outputs
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+
+        for phrase, symptom in phrases.items():
+            phrase = normalize_symptom(phrase)
+            if not phrase:
+                continue
+            symptom = normalize_symptom(symptom)
+            self.names[phrase] = symptom
+            symptom_id = self.symptom_ids.setdefault(symptom, len(self.symptom_ids))
+            state = 0
+            for char in phrase:
+                following = self._goto[state].get(char)
+                if following is None:
+                    following = len(self._goto)
+                    self._goto[state][char] = following
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(())
+                state = following
+            self._out[state] = ((len(phrase), symptom_id),)
+
+        # Breadth-first failure links; outputs inherit those of their fallback
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for char, following in self._goto[state].items():
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[following] = target if target != following else 0
+                self._out[following] += self._out[self._fail[following]]
+                queue.append(following)
+
+        self.symptoms = tuple(self.symptom_ids)
+
+    # Canonical name of a symptom or synonym; unknown names are only normalized
+    def canonical(self, name):
+        name = normalize_symptom(name)
+        return self.names.get(name, name)
+
+    # Matcher over a symptom index's names and synonyms plus extra symptoms
+    # (such as those only the risk rules know) and their synonyms
+    @classmethod
+    def from_index(cls, index, extra=(), synonyms=None):
+        phrases = dict(index.canonical)
+        for symptom in extra:
+            symptom = normalize_symptom(symptom)
+            phrases.setdefault(symptom, symptom)
+        known = set(phrases.values())
+        for synonym, symptom in (synonyms or {}).items():
+            symptom = normalize_symptom(symptom)
+            if symptom in known:
+                phrases.setdefault(normalize_symptom(synonym), symptom)
+        return cls(phrases)
+
+    # (start, end, symptom id) for every word-bounded match, overlaps resolved
+    def spans(self, text):
+        text = normalize_symptom(text or "")
+        goto = self._goto
+        fail = self._fail
+        out = self._out
+        found = []
+        state = 0
+        for end, char in enumerate(text, 1):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for length, symptom_id in out[state]:
+                start = end - length
+                if (start == 0 or not text[start - 1].isalnum()) and (end == len(text) or not text[end].isalnum()):
+                    found.append((start, end, symptom_id))
+
+        found.sort(key=lambda span: (span[0], span[0] - span[1]))
+        spans = []
+        covered = 0
+        for start, end, symptom_id in found:
+            if start >= covered:
+                spans.append((start, end, symptom_id))
+                covered = end
+        return spans
+
+    # Canonical symptom ids mentioned in text, in order of first mention
+    def find_ids(self, text):
+        return list(dict.fromkeys(symptom_id for _, _, symptom_id in self.spans(text)))
+
+    # Canonical symptom names mentioned in text, in order of first mention,
+    # whether affirmed or denied
+    def find(self, text):
+        return [self.symptoms[symptom_id] for symptom_id in self.find_ids(text)]
+
+    # (affirmed, denied) canonical symptom names in text, in order of first
+    # mention; a symptom both affirmed and denied counts as affirmed
+    def mentions(self, text):
+        text = normalize_symptom(text or "")
+        affirmed = {}
+        denied = {}
+        previous_end = None
+        previous_negated = False
+        spans = self.spans(text)
+        for i, (start, end, symptom_id) in enumerate(spans):
+            if previous_end is None:
+                before = _TOKENS.findall(text[max(0, start - 80):start])
+            else:
+                before = _TOKENS.findall(text[previous_end:start])
+            negated = False
+            for token in reversed(before[-WINDOW_BEFORE:]):
+                if _is_cue(token):
+                    negated = True
+                    break
+                if _is_break(token):
+                    break
+            if not negated and previous_negated and all(token in LIST_JOINS for token in before):
+                negated = True
+            if not negated:
+                following = spans[i + 1][0] if i + 1 < len(spans) else len(text)
+                for token in _TOKENS.findall(text[end:min(following, end + 40)])[:WINDOW_AFTER]:
+                    if token in NEGATION_AFTER:
+                        negated = True
+                        break
+                    if _is_break(token):
+                        break
+            (denied if negated else affirmed)[self.symptoms[symptom_id]] = None
+            previous_end = end
+            previous_negated = negated
+        return list(affirmed), [symptom for symptom in denied if symptom not in affirmed]
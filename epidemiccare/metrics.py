@@ -0,0 +1,295 @@
+# Process-wide timers, counters and gauges, with optional cProfile sampling.
+#
+# @timed(name) and `with timer(name)` record call counts, total and maximum
+# time and a latency histogram. When EPIDEMICCARE_METRICS=0 they hand back
+# the undecorated function and a no-op context, so disabled metrics cost
+# nothing. snapshot() returns everything as a dict and render_prometheus()
+# in the Prometheus text format; with EPIDEMICCARE_METRICS_FILE set, a
+# background thread rewrites that file (.json or .prom) every
+# EPIDEMICCARE_METRICS_INTERVAL seconds for a textfile collector.
+#
+# EPIDEMICCARE_PROFILE_RATE picks that share of sessions and writes a
+# cProfile dump of each of their reruns to EPIDEMICCARE_PROFILE_DIR,
+# keeping only the newest EPIDEMICCARE_PROFILE_KEEP dumps.
+import bisect
+import cProfile
+import functools
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+import zlib
+from time import perf_counter
+
+from epidemiccare.paths import private_dir, state_dir
+
+ENABLED = os.environ.get("EPIDEMICCARE_METRICS", "1") != "0"
+METRICS_FILE = os.environ.get("EPIDEMICCARE_METRICS_FILE")
+METRICS_INTERVAL = float(os.environ.get("EPIDEMICCARE_METRICS_INTERVAL", "15"))
+PROFILE_RATE = float(os.environ.get("EPIDEMICCARE_PROFILE_RATE", "0"))
+PROFILE_DIR = os.environ.get("EPIDEMICCARE_PROFILE_DIR", state_dir("profiles"))
+PROFILE_KEEP = int(os.environ.get("EPIDEMICCARE_PROFILE_KEEP", "1000"))
+
+# Histogram bucket upper bounds in seconds
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+# Nearest-rank percentile of an ascending list: the smallest value with at least
+# `fraction` of the samples at or below it, so p99 of 50 samples is the maximum.
+# The API's /metrics and the benchmarks both report percentiles this way.
+def percentile(values, fraction):
+    if not values:
+        raise ValueError("percentile of no samples")
+    return values[min(max(math.ceil(len(values) * fraction), 1), len(values)) - 1]
+
+
+class Timer:
+    __slots__ = ("count", "total", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        # One count per bucket plus +Inf, not cumulative
+        self.buckets = [0] * (len(BUCKETS) + 1)
+
+    def observe(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+
+
+class _TimerContext:
+    __slots__ = ("timer", "lock", "start")
+
+    def __init__(self, timer, lock):
+        self.timer = timer
+        self.lock = lock
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = perf_counter() - self.start
+        with self.lock:
+            self.timer.observe(elapsed)
+        return False
+
+
+class _NullContext:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_CONTEXT = _NullContext()
+
+
+def _metric_name(name):
+    return "epidemiccare_" + "".join(char if char.isalnum() else "_" for char in name)
+
+
+class Metrics:
+    def __init__(self, enabled=ENABLED):
+        self.enabled = enabled
+        self._timers = {}
+        self._counters = {}
+        self._gauges = {}
+        self._lock = threading.Lock()
+        self._dump_thread = None
+
+    def _timer(self, name):
+        with self._lock:
+            timer = self._timers.get(name)
+            if timer is None:
+                timer = self._timers[name] = Timer()
+            return timer
+
+    def observe(self, name, seconds):
+        timer = self._timer(name)
+        with self._lock:
+            timer.observe(seconds)
+
+    def increment(self, name, amount=1):
+        if self.enabled:
+            with self._lock:
+                self._counters[name] = self._counters.get(name, 0) + amount
+
+    # Register a function read whenever metrics are exported, e.g. a cache size
+    def gauge(self, name, read):
+        with self._lock:
+            self._gauges[name] = read
+
+    def timer(self, name):
+        return _TimerContext(self._timer(name), self._lock) if self.enabled else _NULL_CONTEXT
+
+    # The timer is looked up once here, so a call only pays for two clock reads and one update
+    def timed(self, name):
+        def decorate(func):
+            if not self.enabled:
+                return func
+            timer = self._timer(name)
+            lock = self._lock
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                start = perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    elapsed = perf_counter() - start
+                    with lock:
+                        timer.observe(elapsed)
+            return wrapper
+        return decorate
+
+    def _read_gauges(self):
+        with self._lock:
+            gauges = list(self._gauges.items())
+        values = {}
+        for name, read in gauges:
+            try:
+                values[name] = float(read())
+            except Exception:
+                # A broken gauge must not take the export down with it
+                continue
+        return values
+
+    def snapshot(self):
+        with self._lock:
+            timers = {
+                name: {
+                    "count": timer.count,
+                    "total_ms": round(timer.total * 1000, 3),
+                    "mean_ms": round(timer.total / timer.count * 1000, 3) if timer.count else None,
+                    "max_ms": round(timer.max * 1000, 3),
+                }
+                for name, timer in self._timers.items()
+            }
+            counters = dict(self._counters)
+        return {"timers": timers, "counters": counters, "gauges": self._read_gauges()}
+
+    def render_prometheus(self):
+        with self._lock:
+            timers = [(name, timer.count, timer.total, list(timer.buckets)) for name, timer in self._timers.items()]
+            counters = list(self._counters.items())
+        lines = []
+        for name, count, total, buckets in sorted(timers):
+            metric = _metric_name(name) + "_seconds"
+            lines.append(f"# TYPE {metric} histogram")
+            cumulative = 0
+            for bound, bucket in zip(BUCKETS + (float("inf"),), buckets):
+                cumulative += bucket
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{metric}_bucket{{le="{le}"}} {cumulative}')
+            lines.append(f"{metric}_sum {total:.6f}")
+            lines.append(f"{metric}_count {count}")
+        for name, value in sorted(counters):
+            metric = _metric_name(name) + "_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value}")
+        for name, value in sorted(self._read_gauges().items()):
+            metric = _metric_name(name)
+            lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    # Write metrics to a .json or Prometheus text file, replacing it atomically
+    def dump(self, path):
+        text = json.dumps(self.snapshot(), indent=2) if path.endswith(".json") else self.render_prometheus()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+    def _dump_forever(self, path, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                self.dump(path)
+            except OSError:
+                pass
+
+    def start_dump(self, path, interval=METRICS_INTERVAL):
+        with self._lock:
+            if self._dump_thread is None:
+                self._dump_thread = threading.Thread(target=self._dump_forever, args=(path, interval),
+                                                     name="epidemiccare-metrics", daemon=True)
+                self._dump_thread.start()
+
+
+metrics = Metrics()
+if METRICS_FILE and metrics.enabled:
+    metrics.start_dump(METRICS_FILE)
+
+timed = metrics.timed
+timer = metrics.timer
+increment = metrics.increment
+gauge = metrics.gauge
+
+
+# Whether a session is one of the EPIDEMICCARE_PROFILE_RATE share that is profiled
+def profiled(session_id, rate=None):
+    rate = PROFILE_RATE if rate is None else rate
+    return rate > 0 and zlib.crc32(session_id.encode()) / 2 ** 32 < rate
+
+
+# Function to delete all but the newest `keep` .prof files in a directory
+def prune_profiles(directory, keep=PROFILE_KEEP):
+    try:
+        entries = [entry for entry in os.scandir(directory) if entry.name.endswith(".prof")]
+    except OSError:
+        return 0
+    if len(entries) <= keep:
+        return 0
+    removed = 0
+    entries.sort(key=lambda entry: entry.stat().st_mtime_ns, reverse=True)
+    for entry in entries[max(keep, 0):]:
+        try:
+            os.unlink(entry.path)
+            removed += 1
+        except OSError:
+            # Already pruned by another process
+            pass
+    return removed
+
+
+# Profiles the enclosed rerun with cProfile if the session is sampled
+class RerunProfiler:
+    def __init__(self, session_id, rate=None, directory=PROFILE_DIR, keep=PROFILE_KEEP):
+        self.session_id = session_id
+        self.directory = directory
+        self.keep = keep
+        self.profiler = cProfile.Profile() if profiled(session_id, rate) else None
+
+    def __enter__(self):
+        if self.profiler is not None:
+            try:
+                self.profiler.enable()
+            except ValueError:
+                # Another thread's profiler is active (one at a time on Python 3.12+)
+                self.profiler = None
+        return self
+
+    def __exit__(self, *exc):
+        if self.profiler is not None:
+            self.profiler.disable()
+            try:
+                private_dir(self.directory)
+                self.profiler.dump_stats(os.path.join(self.directory, f"{self.session_id}-{time.time_ns()}.prof"))
+            except OSError:
+                # Profiling is best effort and must not fail the rerun
+                return False
+            prune_profiles(self.directory, self.keep)
+        return False
@@ -0,0 +1,291 @@
+# Streaming outbreak detection over consultations and check-ins.
+#
+# Every reported symptom updates a few time series of counts per bucket
+# (a day by default): one for the symptom overall, and one per geohash cell
+# of the 3x3 block around where it was reported, so a cluster straddling a
+# cell edge is still counted in one region. Each series keeps an EWMA of
+# its mean and variance and a one-sided CUSUM of standardized counts,
+# updated in O(1) when an event arrives; runs of buckets without events
+# are folded in, in closed form, when the next one does. The bucket in progress is
+# scored as it fills, so a surge is reported before the day is over.
+# Series are kept in LRU order and capped at `max_series`, so memory stays
+# bounded however many events are replayed.
+#
+# Symptom names go through the triage matcher's canonical form, so a
+# check-in's "Headache" and a consultation's free-text "headache" share a
+# series. Alerts go to a sink: any callable taking a list of Alert.
+# LogAlertSink keeps the latest ones in memory. The detector and its sink
+# are per process: each server process learns from its own traffic, warmed
+# from the stored consultations and check-ins at start-up. Reports without a
+# location, and every report when EPIDEMICCARE_SITE_LOCATION ("lat,lon") is
+# not set, only feed the overall series.
+import heapq
+import math
+import os
+import threading
+import time
+from collections import OrderedDict, deque, namedtuple
+
+from epidemiccare.core import get_triage
+from epidemiccare.metrics import gauge, increment
+from epidemiccare.storage import get_storage
+
+# `kind` is "surge" for a symptom overall or "hotspot" for a region, named by
+# the geohash of its centre cell
+Alert = namedtuple("Alert", ["kind", "symptom", "region", "time", "count", "expected", "score"])
+
+BUCKET = float(os.environ.get("EPIDEMICCARE_OUTBREAK_BUCKET", str(24 * 3600)))
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+# (latitude, longitude) from "lat,lon" in degrees, or None for an empty value
+def _parse_location(text, name="EPIDEMICCARE_SITE_LOCATION"):
+    if not text or not text.strip():
+        return None
+    try:
+        latitude, longitude = (float(part) for part in text.split(","))
+    except ValueError:
+        raise ValueError(f"{name} must be 'latitude,longitude' in degrees, e.g. '12.97,77.59', "
+                         f"not {text!r}") from None
+    if not (-90.0 <= latitude <= 90.0 and -180.0 <= longitude <= 180.0):
+        raise ValueError(f"{name} is out of range: latitude must be within ±90 and longitude "
+                         f"within ±180, not {text!r}")
+    return latitude, longitude
+
+
+SITE_LOCATION = _parse_location(os.environ.get("EPIDEMICCARE_SITE_LOCATION"))
+
+
+# Geohash grid cell of a location as integer (x, y); precision 5 is about 4.9 km square
+def grid_cell(latitude, longitude, precision=5):
+    bits = precision * 5
+    lon_bits = (bits + 1) // 2
+    lat_bits = bits // 2
+    x = int((longitude + 180.0) / 360.0 * (1 << lon_bits))
+    y = int((latitude + 90.0) / 180.0 * (1 << lat_bits))
+    return min(max(x, 0), (1 << lon_bits) - 1), min(max(y, 0), (1 << lat_bits) - 1)
+
+
+# Geohash string of a grid cell; bits interleave longitude first
+def cell_geohash(cell, precision=5):
+    x, y = cell
+    bits = precision * 5
+    lon_bit = (bits + 1) // 2
+    lat_bit = bits // 2
+    code = 0
+    for i in range(bits):
+        if i % 2 == 0:
+            lon_bit -= 1
+            code = (code << 1) | ((x >> lon_bit) & 1)
+        else:
+            lat_bit -= 1
+            code = (code << 1) | ((y >> lat_bit) & 1)
+    return "".join(_BASE32[(code >> shift) & 31] for shift in range(bits - 5, -1, -5))
+
+
+class Series:
+    __slots__ = ("bucket", "count", "closed", "mean", "var", "cusum", "alerted")
+
+    def __init__(self, bucket):
+        self.bucket = bucket
+        self.count = 0
+        # Buckets closed so far; the EWMA starts out as a plain running mean
+        self.closed = 0
+        self.mean = 0.0
+        self.var = 0.0
+        self.cusum = 0.0
+        self.alerted = None
+
+    # Counts are at least Poisson-noisy, and never below one report
+    def sd(self):
+        return math.sqrt(max(self.var, self.mean, 1.0))
+
+    def _close(self, count, alpha, slack):
+        self.cusum = max(0.0, self.cusum + (count - self.mean) / self.sd() - slack)
+        weight = max(alpha, 1.0 / (self.closed + 1))
+        diff = count - self.mean
+        self.mean += weight * diff
+        self.var = (1 - weight) * (self.var + weight * diff * diff)
+        self.closed += 1
+
+    # Close the bucket in progress and the empty ones before `bucket`. While
+    # `learning`, baselines are still forming and the CUSUM stays at zero.
+    def advance(self, bucket, alpha, slack, learning=False):
+        gap = bucket - self.bucket
+        if gap <= 0:
+            return
+        self._close(self.count, alpha, slack)
+        if learning or self.alerted == self.bucket:
+            # Start over after an alarm, so one surge is reported once
+            self.cusum = 0.0
+        empty = gap - 1
+        # Step through empty buckets while the CUSUM drains or the mean is still a running mean ...
+        while empty and (self.cusum > 0.0 or self.closed * alpha < 1.0):
+            self._close(0, alpha, slack)
+            empty -= 1
+        # ... then decay the rest at once: k zeros scale the mean by d = (1 - alpha)^k
+        # and the variance to d * (var + mean^2 * (1 - d))
+        if empty:
+            decay = (1 - alpha) ** empty
+            self.var = decay * (self.var + self.mean * self.mean * (1 - decay))
+            self.mean *= decay
+            self.closed += empty
+        self.bucket = bucket
+        self.count = 0
+
+    # CUSUM including the bucket in progress
+    def score(self, slack):
+        return max(0.0, self.cusum + (self.count - self.mean) / self.sd() - slack)
+
+
+# Local stand-in for a paging, SMS or public-health reporting gateway
+class LogAlertSink:
+    def __init__(self, maxlen=1000):
+        self.alerts = deque(maxlen=maxlen)
+        self.batches = 0
+
+    def __call__(self, alerts):
+        self.alerts.extend(alerts)
+        self.batches += 1
+
+
+class OutbreakDetector:
+    def __init__(self, sink=None, bucket=BUCKET, alpha=0.1, slack=1.0, threshold=6.0, min_count=6, warmup=7,
+                 precision=5, max_series=200000, canonical=None, clock=time.time):
+        self.sink = sink if sink is not None else LogAlertSink()
+        # Symptom name -> series name; the triage matcher's canonical form by default
+        self.canonical = canonical if canonical is not None else get_triage().canonical
+        self.bucket = bucket
+        self.alpha = alpha
+        self.slack = slack
+        self.threshold = threshold
+        self.min_count = min_count
+        # Buckets seen before alerting at all, while every baseline is still zero
+        self.warmup = warmup
+        self._first_bucket = None
+        self.precision = precision
+        self.max_series = max_series
+        self.clock = clock
+        self._columns = 1 << ((precision * 5 + 1) // 2)
+        self._rows = 1 << (precision * 5 // 2)
+        # (symptom, None) overall, (symptom, cell) per region; least recently updated first
+        self._series = OrderedDict()
+        self._lock = threading.Lock()
+        self.events = 0
+        self.alerts = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._series)
+
+    def _update(self, key, bucket):
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = Series(bucket)
+            if len(self._series) > self.max_series:
+                self._series.popitem(last=False)
+                self.evictions += 1
+        else:
+            self._series.move_to_end(key)
+            series.advance(bucket, self.alpha, self.slack, bucket - self._first_bucket <= self.warmup)
+        series.count += 1
+        return series
+
+    def _check(self, series, bucket):
+        if series.alerted == bucket or series.count < self.min_count or bucket - self._first_bucket < self.warmup:
+            return None
+        score = series.score(self.slack)
+        if score < self.threshold:
+            return None
+        series.alerted = bucket
+        return score
+
+    # Record one report of `symptoms` at `when` (a timestamp) and `location`
+    # ((lat, lon) or None); returns the alerts it raised. A `replay` of stored
+    # reports only trains the baselines: nothing is scored, counted or sent.
+    def add(self, symptoms, when=None, location=None, replay=False):
+        when = self.clock() if when is None else when
+        bucket = int(when // self.bucket)
+        raised = []
+        with self._lock:
+            self.events += 1
+            if self._first_bucket is None:
+                self._first_bucket = bucket
+            centre = grid_cell(*location, self.precision) if location is not None else None
+            for symptom in {self.canonical(symptom) for symptom in symptoms}:
+                series = self._update((symptom, None), bucket)
+                score = None if replay else self._check(series, bucket)
+                if score is not None:
+                    raised.append(Alert("surge", symptom, None, when, series.count, series.mean, score))
+                if centre is None:
+                    continue
+                x, y = centre
+                # The event counts towards every region whose 3x3 block contains its cell
+                for dx in (-1, 0, 1):
+                    for dy in (-1, 0, 1):
+                        if not 0 <= y + dy < self._rows:
+                            continue
+                        # Longitude wraps around at the antimeridian
+                        cell = ((x + dx) % self._columns, y + dy)
+                        series = self._update((symptom, cell), bucket)
+                        score = None if replay else self._check(series, bucket)
+                        if score is not None and not self._neighbour_alerted(symptom, cell, bucket):
+                            raised.append(Alert("hotspot", symptom, cell_geohash(cell, self.precision), when,
+                                                series.count, series.mean, score))
+            self.alerts += len(raised)
+        increment("outbreak_events")
+        if raised:
+            increment("outbreak_alerts", len(raised))
+            self.sink(raised)
+        return raised
+
+    # Overlapping regions see the same cluster; only the first to cross the threshold reports it
+    def _neighbour_alerted(self, symptom, cell, bucket):
+        x, y = cell
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                if dx or dy:
+                    series = self._series.get((symptom, ((x + dx) % self._columns, y + dy)))
+                    if series is not None and series.alerted == bucket:
+                        return True
+        return False
+
+    def stats(self):
+        with self._lock:
+            return {
+                "events": self.events,
+                "alerts": self.alerts,
+                "series": len(self._series),
+                "max_series": self.max_series,
+                "evictions": self.evictions,
+            }
+
+    # Warm the baselines from stored consultations and check-ins, the same
+    # reports the app feeds in live. Both come off storage in date order and
+    # are merged as they stream, then replayed without alerting. Stored
+    # reports carry no location, so only the overall series learn.
+    @classmethod
+    def from_storage(cls, storage, **kwargs):
+        detector = cls(**kwargs)
+        triage = get_triage()
+        checkins = ((day, symptoms) for day, symptoms, _ in storage.iter_checkins())
+        consultations = ((day, triage.evidence(answers)[0]) for day, answers in storage.iter_consultation_answers())
+        for day, symptoms in heapq.merge(checkins, consultations, key=lambda report: report[0]):
+            when = time.mktime(day.timetuple()) + 12 * 3600
+            detector.add(symptoms, when, replay=True)
+        return detector
+
+
+_default_detector = None
+_default_lock = threading.Lock()
+gauge("outbreak_series", lambda: len(_default_detector) if _default_detector is not None else 0)
+
+
+# Function to get the process-wide outbreak detector, warmed from storage on first use
+def get_outbreak_detector():
+    global _default_detector
+    if _default_detector is None:
+        with _default_lock:
+            if _default_detector is None:
+                _default_detector = OutbreakDetector.from_storage(get_storage())
+    return _default_detector
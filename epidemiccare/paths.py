@@ -0,0 +1,26 @@
+# Private per-user directories for caches and local state.
+#
+# The system temp dir is shared and world-writable, so files the app reads
+# back (knowledge base snapshots) or that hold patient data (chat archives,
+# sessions) live under $XDG_CACHE_HOME/epidemiccare, default
+# ~/.cache/epidemiccare, in directories only this user can enter.
+import os
+import stat
+
+
+# Function to get a path under the per-user state directory
+def state_dir(*parts):
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "epidemiccare", *parts)
+
+
+# Function to create `path` as a 0700 directory and check that this user owns it.
+# Raises PermissionError for a symlink or a directory owned by someone else.
+def private_dir(path):
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode) or (hasattr(os, "getuid") and info.st_uid != os.getuid()):
+        raise PermissionError(f"{path} is not a directory owned by this user")
+    if stat.S_IMODE(info.st_mode) & 0o077:
+        os.chmod(path, 0o700)
+    return path
@@ -0,0 +1,139 @@
+# Columnar daily progress log for one patient.
+#
+# Check-ins are kept as parallel typed arrays indexed by day ordinal, with a
+# day -> row map for "already checked in today" and running sums for the
+# adherence and trend figures, so a rerun never rescans the history. The
+# chart frame is rebuilt only after a check-in changes the log.
+import datetime
+from array import array
+
+# Symptoms offered in the daily check-in, stored as one bit each
+CHECKIN_SYMPTOMS = ("Fever", "Cough", "Headache", "Fatigue", "Body aches", "Shortness of breath")
+SYMPTOM_BITS = {symptom: 1 << bit for bit, symptom in enumerate(CHECKIN_SYMPTOMS)}
+
+
+class ProgressLog:
+    __slots__ = ("start_day", "days", "ratings", "taken", "symptoms", "_rows", "_taken_count",
+                 "_sums", "_version", "_frame")
+
+    def __init__(self, start_date):
+        self.start_day = start_date.toordinal()
+        self.days = array("l")
+        self.ratings = array("B")
+        self.taken = array("B")
+        self.symptoms = array("B")
+        # day ordinal -> row
+        self._rows = {}
+        self._taken_count = 0
+        # n, sum x, sum y, sum xx, sum xy over (days since start, rating)
+        self._sums = [0, 0, 0, 0, 0]
+        self._version = 0
+        self._frame = None
+
+    @classmethod
+    def from_checkins(cls, start_date, checkins):
+        log = cls(start_date)
+        for entry in checkins:
+            log.add(entry["date"], entry["rating"], entry["symptoms"], entry["taken"])
+        return log
+
+    # The chart frame is a cache and is rebuilt after unpickling
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.__slots__ if name != "_frame"}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+        self._frame = None
+
+    # Plain values for a session snapshot; from_dict() recomputes the running sums
+    def to_dict(self):
+        return {"start_day": self.start_day, "days": self.days.tolist(), "ratings": self.ratings.tolist(),
+                "taken": self.taken.tolist(), "symptoms": self.symptoms.tolist()}
+
+    @classmethod
+    def from_dict(cls, state):
+        log = cls(datetime.date.fromordinal(state["start_day"]))
+        log.days = array("l", state["days"])
+        log.ratings = array("B", state["ratings"])
+        log.taken = array("B", state["taken"])
+        log.symptoms = array("B", state["symptoms"])
+        for row, day in enumerate(log.days):
+            log._rows[day] = row
+            log._account(row, 1)
+        log._version = 1
+        return log
+
+    def __len__(self):
+        return len(self.days)
+
+    @property
+    def start_date(self):
+        return datetime.date.fromordinal(self.start_day)
+
+    def has_checkin(self, day):
+        return day.toordinal() in self._rows
+
+    def _account(self, row, sign):
+        x = self.days[row] - self.start_day
+        y = self.ratings[row]
+        sums = self._sums
+        sums[0] += sign
+        sums[1] += sign * x
+        sums[2] += sign * y
+        sums[3] += sign * x * x
+        sums[4] += sign * x * y
+        self._taken_count += sign * self.taken[row]
+
+    # Record a day's check-in; a second check-in on the same day replaces the first
+    def add(self, day, rating, symptoms, medication_taken):
+        mask = 0
+        for symptom in symptoms:
+            mask |= SYMPTOM_BITS.get(symptom, 0)
+        ordinal = day.toordinal()
+        row = self._rows.get(ordinal)
+        if row is None:
+            row = self._rows[ordinal] = len(self.days)
+            self.days.append(ordinal)
+            self.ratings.append(rating)
+            self.taken.append(int(medication_taken))
+            self.symptoms.append(mask)
+        else:
+            self._account(row, -1)
+            self.ratings[row] = rating
+            self.taken[row] = int(medication_taken)
+            self.symptoms[row] = mask
+        self._account(row, 1)
+        self._version += 1
+
+    def symptoms_on(self, day):
+        row = self._rows.get(day.toordinal())
+        if row is None:
+            return []
+        return [symptom for symptom in CHECKIN_SYMPTOMS if self.symptoms[row] & SYMPTOM_BITS[symptom]]
+
+    # (days the medication was taken, days logged)
+    def adherence(self):
+        return self._taken_count, len(self.days)
+
+    def mean_rating(self):
+        n = self._sums[0]
+        return self._sums[2] / n if n else None
+
+    # Least-squares change in rating per day, None until two days are logged
+    def trend(self):
+        n, sx, sy, sxx, sxy = self._sums
+        denominator = n * sxx - sx * sx
+        if n < 2 or denominator == 0:
+            return None
+        return (n * sxy - sx * sy) / denominator
+
+    # Ratings as a date-indexed pandas DataFrame for st.line_chart
+    def chart_frame(self):
+        if self._frame is None or self._frame[0] != self._version:
+            import pandas as pd
+
+            index = pd.DatetimeIndex([datetime.date.fromordinal(day) for day in self.days], name="date")
+            frame = pd.DataFrame({"rating": self.ratings.tolist()}, index=index).sort_index()
+            self._frame = (self._version, frame)
+        return self._frame[1]
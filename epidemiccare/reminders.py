@@ -0,0 +1,286 @@
+# Treatment-plan reminders kept in a hashed timing wheel.
+#
+# Each patient's daily reminders are derived from their treatment plan and
+# armed at the next local occurrence in the patient's timezone. The wheel
+# makes arming O(1) and each tick touches a single slot, so millions of
+# pending reminders cost nothing until they are due. Due reminders are
+# handed to a notifier in batches and re-armed for the next day until the
+# plan's duration runs out. Entries left behind by a cancelled or replaced
+# schedule are swept out of the wheel once they outnumber the live ones.
+import datetime
+import os
+import re
+import threading
+import time
+from collections import deque, namedtuple
+from zoneinfo import ZoneInfo
+
+from epidemiccare.metrics import gauge
+
+DEFAULT_TIMEZONE = os.environ.get("EPIDEMICCARE_TIMEZONE", "UTC")
+
+Reminder = namedtuple("Reminder", ["key", "time", "task"])
+# `due` is a UTC timestamp and `timezone` the patient's, for local display
+Notification = namedtuple("Notification", ["user", "reminder", "due", "timezone"])
+
+# Waking hours that interval-based monitoring is spread over
+DAY_START = 8
+DAY_END = 22
+
+_AS_NEEDED = re.compile(r"\b(as needed|if required)\b", re.IGNORECASE)
+_EVERY_HOURS = re.compile(r"\bevery (\d+) hours?\b", re.IGNORECASE)
+_TIMES_DAILY = {"once daily": (9,), "twice daily": (8, 20), "three times daily": (8, 14, 20)}
+_DURATION_DAYS = re.compile(r"(\d+)(?:\s*-\s*(\d+))?\s*days?\b", re.IGNORECASE)
+
+# Stale wheel entries tolerated before a sweep, on top of one per live entry
+STALE_SLACK = 1024
+
+
+def _reminder(hour, task):
+    at = datetime.time(hour)
+    return Reminder(f"{at:%H:%M} {task}", at, task)
+
+
+# Daily reminders for a treatment plan, in time order
+def plan_reminders(plan):
+    if not plan:
+        return []
+    reminders = []
+
+    scheduled = [medication for medication in plan.get("medication", ()) if not _AS_NEEDED.search(medication)]
+    if scheduled:
+        medications = ", ".join(scheduled)
+        reminders.append(_reminder(8, f"Take morning medication ({medications})"))
+        reminders.append(_reminder(20, f"Take evening medication ({medications})"))
+
+    monitoring = plan.get("monitoring", "")
+    task = monitoring.split(",")[0].strip()
+    task = re.sub(r"\s+(every \d+ hours?|once daily|twice daily|three times daily)$", "", task,
+                  flags=re.IGNORECASE)
+    every = _EVERY_HOURS.search(monitoring)
+    if every and int(every.group(1)) > 0:
+        hours = range(DAY_START, DAY_END + 1, int(every.group(1)))
+    else:
+        hours = next((hours for phrase, hours in _TIMES_DAILY.items() if phrase in monitoring.lower()), ())
+    reminders.extend(_reminder(hour, task) for hour in hours)
+
+    if "fluid" in plan.get("diet", "").lower():
+        reminders.append(_reminder(12, "Drink plenty of water"))
+    reminders.append(_reminder(20, "Record symptoms"))
+    return sorted(reminders, key=lambda reminder: reminder.time)
+
+
+# Days a treatment plan runs for, the longer end of a range like "7-10 days";
+# None when the plan gives no duration
+def plan_days(plan):
+    match = _DURATION_DAYS.search((plan or {}).get("duration", ""))
+    if match is None:
+        return None
+    return int(match.group(2) or match.group(1))
+
+
+# UTC timestamp of local midnight after the last day of a plan started on `started`
+def plan_end(plan, started, timezone=DEFAULT_TIMEZONE):
+    days = plan_days(plan)
+    if days is None:
+        return None
+    if isinstance(timezone, str):
+        timezone = ZoneInfo(timezone)
+    end = datetime.datetime.combine(started + datetime.timedelta(days=days), datetime.time(), tzinfo=timezone)
+    return end.timestamp()
+
+
+# Next time, as a UTC timestamp, that a reminder is due strictly after `after`
+def next_occurrence(reminder, timezone, after):
+    local = datetime.datetime.fromtimestamp(after, timezone)
+    due = datetime.datetime.combine(local.date(), reminder.time, tzinfo=timezone)
+    if due.timestamp() <= after:
+        due = datetime.datetime.combine(local.date() + datetime.timedelta(days=1), reminder.time, tzinfo=timezone)
+    return due.timestamp()
+
+
+class TimingWheel:
+    def __init__(self, tick=60.0, slots=1440, start=None):
+        self.tick = tick
+        self._slots = [[] for _ in range(slots)]
+        self._current = int((time.time() if start is None else start) // tick)
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    # Arm an item for a timestamp; anything already due fires on the next advance
+    def schedule(self, when, item):
+        due = max(int(when // self.tick), self._current + 1)
+        self._slots[due % len(self._slots)].append((due, item))
+        self._count += 1
+
+    # Items due up to `now`, visiting each slot at most once however far the clock moved
+    def advance(self, now):
+        end = int(now // self.tick)
+        due = []
+        for tick in range(self._current + 1, min(end, self._current + len(self._slots)) + 1):
+            slot = self._slots[tick % len(self._slots)]
+            if not slot:
+                continue
+            keep = [entry for entry in slot if entry[0] > end]
+            if len(keep) != len(slot):
+                due.extend(item for due_tick, item in slot if due_tick <= end)
+                self._slots[tick % len(self._slots)] = keep
+        self._current = max(self._current, end)
+        self._count -= len(due)
+        return due
+
+    # Drop every armed item for which `predicate(item)` is true; returns how many
+    def discard(self, predicate):
+        removed = 0
+        for index, slot in enumerate(self._slots):
+            if slot:
+                keep = [entry for entry in slot if not predicate(entry[1])]
+                removed += len(slot) - len(keep)
+                self._slots[index] = keep
+        self._count -= removed
+        return removed
+
+
+# Local stand-in for a push/SMS/e-mail gateway: keeps the latest notifications
+class LogNotifier:
+    def __init__(self, maxlen=10000):
+        self.sent = deque(maxlen=maxlen)
+        self.batches = 0
+
+    def __call__(self, notifications):
+        self.sent.extend(notifications)
+        self.batches += 1
+
+
+class _Schedule:
+    __slots__ = ("generation", "timezone", "reminders", "until", "armed")
+
+    def __init__(self, generation, timezone, reminders, until):
+        self.generation = generation
+        self.timezone = timezone
+        self.reminders = reminders
+        # UTC timestamp the reminders stop at, None for no end
+        self.until = until
+        # Entries of this generation in the wheel
+        self.armed = 0
+
+
+class ReminderScheduler:
+    def __init__(self, notifier=None, tick=60.0, batch_size=500, clock=time.time):
+        self.notifier = notifier if notifier is not None else LogNotifier()
+        self.tick = tick
+        self.batch_size = batch_size
+        self.clock = clock
+        self.wheel = TimingWheel(tick, start=clock())
+        # user -> _Schedule; wheel entries from a cancelled or older generation
+        # are dropped when they come due or when the wheel is swept
+        self._schedules = {}
+        self._generation = 0
+        self._stale = 0
+        self._lock = threading.Lock()
+        self._thread = None
+        self.dispatched = 0
+
+    # Reminders still to be dispatched, not counting stale entries
+    def __len__(self):
+        return len(self.wheel) - self._stale
+
+    # Replace a user's reminders and arm each at its next local occurrence.
+    # Nothing is armed at or after `until`, a UTC timestamp such as plan_end().
+    def set_schedule(self, user, reminders, timezone=DEFAULT_TIMEZONE, until=None):
+        if isinstance(timezone, str):
+            timezone = ZoneInfo(timezone)
+        now = self.clock()
+        with self._lock:
+            self._retire(user)
+            self._generation += 1
+            schedule = _Schedule(self._generation, timezone, tuple(reminders), until)
+            for reminder in reminders:
+                due = next_occurrence(reminder, timezone, now)
+                if until is None or due < until:
+                    self.wheel.schedule(due, (user, schedule.generation, reminder, due))
+                    schedule.armed += 1
+            if schedule.armed:
+                self._schedules[user] = schedule
+            self._sweep()
+
+    # Stop a user's reminders, e.g. when they sign out
+    def cancel(self, user):
+        with self._lock:
+            self._retire(user)
+            self._sweep()
+
+    def schedule_for(self, user):
+        with self._lock:
+            schedule = self._schedules.get(user)
+        return schedule.reminders if schedule else ()
+
+    def _retire(self, user):
+        schedule = self._schedules.pop(user, None)
+        if schedule is not None:
+            self._stale += schedule.armed
+
+    def _is_stale(self, item):
+        schedule = self._schedules.get(item[0])
+        return schedule is None or schedule.generation != item[1]
+
+    # Sweep stale entries out of the wheel once they outnumber the live ones,
+    # so the cost is amortized over the cancellations that made them
+    def _sweep(self):
+        if self._stale > len(self.wheel) - self._stale + STALE_SLACK:
+            self.wheel.discard(self._is_stale)
+            self._stale = 0
+
+    # Dispatch every reminder due by `now` in notifier batches and re-arm it for
+    # the next day; a schedule whose last reminder has gone out is dropped
+    def run_pending(self, now=None):
+        now = self.clock() if now is None else now
+        notifications = []
+        with self._lock:
+            for user, generation, reminder, due in self.wheel.advance(now):
+                schedule = self._schedules.get(user)
+                if schedule is None or schedule.generation != generation:
+                    self._stale -= 1
+                    continue
+                notifications.append(Notification(user, reminder, due, schedule.timezone))
+                following = next_occurrence(reminder, schedule.timezone, max(due, now))
+                if schedule.until is None or following < schedule.until:
+                    self.wheel.schedule(following, (user, generation, reminder, following))
+                else:
+                    schedule.armed -= 1
+                    if not schedule.armed:
+                        del self._schedules[user]
+        for start in range(0, len(notifications), self.batch_size):
+            self.notifier(notifications[start:start + self.batch_size])
+        self.dispatched += len(notifications)
+        return len(notifications)
+
+    def _run(self):
+        while True:
+            time.sleep(self.tick - self.clock() % self.tick)
+            self.run_pending()
+
+    # Dispatch from a daemon thread once per tick
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="epidemiccare-reminders", daemon=True)
+                self._thread.start()
+
+
+_default_scheduler = None
+_default_lock = threading.Lock()
+gauge("reminders_pending", lambda: len(_default_scheduler) if _default_scheduler is not None else 0)
+
+
+# Function to get the process-wide reminder scheduler, dispatching in the background
+def get_reminder_scheduler():
+    global _default_scheduler
+    if _default_scheduler is None:
+        with _default_lock:
+            if _default_scheduler is None:
+                _default_scheduler = ReminderScheduler()
+                _default_scheduler.start()
+    return _default_scheduler
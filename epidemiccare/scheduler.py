@@ -0,0 +1,152 @@
+# Adaptive ordering of the consultation questions.
+#
+# After the introductory questions, the next question is the one with the
+# largest expected information gain over the naive-Bayes disease posterior.
+# The consultation jumps to the closing step once the risk level can no
+# longer change and no remaining question is worth a round trip.
+#
+# Each question lists the knowledge-base symptoms it asks about in the
+# questions file, e.g. cough and difficulty breathing for "Are you
+# experiencing any cough or difficulty breathing?"; a "Yes" means at least
+# one of them is present.
+import threading
+
+import numpy as np
+
+from epidemiccare.bayes import get_bayes_model
+from epidemiccare.core import ABSENT, PRESENT, RISK_GROUPS, RISK_THRESHOLDS
+from epidemiccare.knowledge import get_knowledge_base
+
+
+def _entropy(p):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return -np.where(p > 0, p * np.log2(p), 0.0).sum(axis=-1)
+
+
+class QuestionScheduler:
+    def __init__(self, questions, question_symptoms, model, risk_groups=RISK_GROUPS,
+                 risk_thresholds=RISK_THRESHOLDS, min_gain=0.1):
+        self.questions = questions
+        self.model = model
+        self.risk_groups = risk_groups
+        self.risk_thresholds = risk_thresholds
+        self.min_gain = min_gain
+        self.final_step = len(questions) - 1
+
+        # Symptoms each question asks about; the closing message asks about none
+        self.question_symptoms = [[model.canonical(symptom) for symptom in symptoms]
+                                  for symptoms in question_symptoms[:self.final_step]] + [[]]
+        self.symptom_steps = [step for step, symptoms in enumerate(self.question_symptoms) if symptoms]
+        self.intro = self.symptom_steps[0] if self.symptom_steps else self.final_step
+        self.extra_steps = [step for step in range(self.intro, self.final_step) if not self.question_symptoms[step]]
+        self._rows = {step: row for row, step in enumerate(self.symptom_steps)}
+
+        # question x disease probability of a "Yes": any of its symptoms present
+        p_no = np.ones((len(self.symptom_steps), len(model.disease_names)))
+        for row, step in enumerate(self.symptom_steps):
+            for symptom in self.question_symptoms[step]:
+                # A symptom no disease lists cannot tell the diseases apart
+                if symptom in model.vocabulary:
+                    p_no[row] *= np.exp(model.log_absent[:, model.vocabulary[symptom]])
+        self.p_yes = 1 - p_no
+        self.log_yes = np.log(np.clip(self.p_yes, 1e-12, 1))
+        self.log_no = np.log(np.clip(p_no, 1e-12, 1))
+
+        # Canonical symptoms of each risk group, for evidence found in free text
+        self.group_symptoms = [frozenset(model.canonical(symptom) for symptom in group) for group, _ in risk_groups]
+
+        # Risk groups a "Yes" to each question scores
+        self.step_groups = {}
+        for step in self.symptom_steps:
+            symptoms = set(self.question_symptoms[step])
+            self.step_groups[step] = frozenset(
+                group_id for group_id, (group, _) in enumerate(risk_groups)
+                if any(model.canonical(symptom) in symptoms for symptom in group)
+            )
+
+    def _level(self, score):
+        for level, threshold in self.risk_thresholds:
+            if score >= threshold:
+                return level
+        return "low"
+
+    # Disease posterior given the answers so far, keyed by step
+    def posterior(self, answers):
+        log_posterior = self.model.log_prior.copy()
+        for step, value in answers.items():
+            row = self._rows.get(step)
+            if row is None:
+                continue
+            if value in PRESENT:
+                log_posterior += self.log_yes[row]
+            elif value in ABSENT:
+                log_posterior += self.log_no[row]
+        posterior = np.exp(log_posterior - log_posterior.max())
+        return posterior / posterior.sum()
+
+    # Expected reduction in posterior entropy, in bits, from asking each step
+    def information_gain(self, posterior, steps):
+        rows = [self._rows[step] for step in steps]
+        p_yes = self.p_yes[rows]
+        joint_yes = p_yes * posterior
+        joint_no = (1 - p_yes) * posterior
+        yes = joint_yes.sum(axis=1)
+        no = joint_no.sum(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            after_yes = _entropy(np.nan_to_num(joint_yes / yes[:, None]))
+            after_no = _entropy(np.nan_to_num(joint_no / no[:, None]))
+        return _entropy(posterior) - (yes * after_yes + no * after_no)
+
+    # (lowest, highest) risk level still reachable from these answers.
+    # `present` holds the symptoms the free-text answers report (the present
+    # half of Triage.evidence()), which score like a "Yes".
+    def risk_bounds(self, answers, present=()):
+        present = {self.model.canonical(symptom) for symptom in present}
+        hit = {group_id for group_id, symptoms in enumerate(self.group_symptoms) if symptoms & present}
+        reachable = set()
+        for step in self.symptom_steps:
+            if step not in answers:
+                reachable |= self.step_groups[step]
+            elif answers[step] in PRESENT:
+                hit |= self.step_groups[step]
+        points = [points for _, points in self.risk_groups]
+        low = sum(points[group_id] for group_id in hit)
+        high = sum(points[group_id] for group_id in hit | reachable)
+        return self._level(low), self._level(high)
+
+    def risk_decided(self, answers, present=()):
+        low, high = self.risk_bounds(answers, present)
+        return low == high
+
+    # Step to ask after `current`, given the answers so far keyed by step and
+    # the symptoms present in free text. Returns final_step when the consultation can close.
+    def next_step(self, current, answers, present=()):
+        if current + 1 < self.intro:
+            return current + 1
+        unasked = [step for step in self.symptom_steps if step not in answers]
+        if unasked:
+            gains = self.information_gain(self.posterior(answers), unasked)
+            best = int(np.argmax(gains))
+            if gains[best] >= self.min_gain or not self.risk_decided(answers, present):
+                return unasked[best]
+            return self.final_step
+        for step in self.extra_steps:
+            if step not in answers:
+                return step
+        return self.final_step
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+# Function to get the scheduler for the current knowledge base, rebuilt when it changes
+def get_scheduler():
+    global _scheduler
+    knowledge_base = get_knowledge_base()
+    with _scheduler_lock:
+        if _scheduler is None or _scheduler[0] is not knowledge_base:
+            scheduler = QuestionScheduler(knowledge_base.questions, knowledge_base.question_symptoms,
+                                          get_bayes_model())
+            _scheduler = (knowledge_base, scheduler)
+        return _scheduler[1]
@@ -0,0 +1,513 @@
+# Server-side patient sessions, persisted to a shared backend so any
+# replica can resume them.
+#
+# The Streamlit session state only holds a session id; the consultation
+# itself lives in a slotted PatientSession kept here. Sessions changed in a
+# rerun are marked dirty with save() and written behind: a flusher thread
+# saves every dirty session as one versioned snapshot per flush interval,
+# in one batch. Snapshots record who the session belongs to but never a
+# sign-in token, so knowing a session id is not enough to act as its user.
+# Sessions idle for longer than `idle_timeout` are dropped from memory once
+# saved, and are loaded back from the backend on their next access, on this
+# replica or any other. The backend is named by EPIDEMICCARE_SESSION_URL:
+# "sqlite:///sessions.db" (the default, under EPIDEMICCARE_SESSION_DIR),
+# "memory://" or "redis://host:6379/0" for any Redis-compatible server.
+import atexit
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+import zlib
+
+from epidemiccare.chat import ChatLog
+from epidemiccare.core import get_triage
+from epidemiccare.metrics import gauge, increment, timer
+from epidemiccare.paths import private_dir, state_dir
+from epidemiccare.progress import ProgressLog
+
+DEFAULT_IDLE_TIMEOUT = float(os.environ.get("EPIDEMICCARE_SESSION_IDLE_TIMEOUT", "900"))
+DEFAULT_EXPIRY = float(os.environ.get("EPIDEMICCARE_SESSION_EXPIRY", str(7 * 24 * 3600)))
+DEFAULT_FLUSH_INTERVAL = float(os.environ.get("EPIDEMICCARE_SESSION_FLUSH_INTERVAL", "1"))
+
+# Bump when the snapshot layout changes, and teach from_snapshot() the old one.
+# Version 1 also stored the auth token, which is ignored when reading it.
+SNAPSHOT_VERSION = 2
+READABLE_VERSIONS = (1, 2)
+SNAPSHOT_MAGIC = b"ES"
+# Smaller snapshots are stored uncompressed: zlib's setup costs more than it saves on them
+COMPRESS_OVER = 2048
+
+
+class SessionError(Exception):
+    pass
+
+
+class PatientSession:
+    __slots__ = ("session_id", "symptoms", "chat_history", "chat_rendered", "current_step", "risk_level",
+                 "progress", "user", "last_seen")
+
+    def __init__(self, session_id=None):
+        self.session_id = session_id or uuid.uuid4().hex
+        self.symptoms = {}
+        self.chat_history = ChatLog(conversation_id=self.session_id)
+        self.chat_rendered = 0
+        self.current_step = 0
+        # Risk level of the finished assessment, None until then
+        self.risk_level = None
+        # ProgressLog once tracking has started
+        self.progress = None
+        # The signed-in user the session belongs to; only that user may resume it
+        self.user = None
+        self.last_seen = time.monotonic()
+
+    # Answer keys and the fixed answer options are interned, so every session shares one copy
+    def record_answer(self, key, value):
+        if isinstance(value, str) and len(value) <= 8:
+            value = sys.intern(value)
+        self.symptoms[sys.intern(key)] = value
+
+    # Clears the answers and the chat for a fresh consultation; the progress log and
+    # the current plan stay until the new assessment replaces them
+    def new_consultation(self):
+        self.symptoms = {}
+        self.chat_history = ChatLog(self.chat_history.window)
+        self.chat_rendered = 0
+        self.current_step = 0
+
+    # The knowledge base's plan for the risk level, shared by every session rather than copied
+    @property
+    def treatment_plan(self):
+        if self.risk_level is None:
+            return {}
+        return get_triage().treatment_plan(self.risk_level)
+
+    # Versioned JSON of the session, compressed if large: magic, version,
+    # compression flag, body. Containers are copied first, as the script
+    # thread may be changing them while this runs.
+    def snapshot(self):
+        state = {
+            "session_id": self.session_id,
+            "symptoms": dict(self.symptoms),
+            "chat_history": self.chat_history.to_dict(),
+            "chat_rendered": self.chat_rendered,
+            "current_step": self.current_step,
+            "risk_level": self.risk_level,
+            "progress": self.progress.to_dict() if self.progress is not None else None,
+            "user": dict(self.user) if self.user else None,
+        }
+        body = json.dumps(state, separators=(",", ":")).encode()
+        if len(body) > COMPRESS_OVER:
+            return SNAPSHOT_MAGIC + bytes((SNAPSHOT_VERSION, 1)) + zlib.compress(body, 1)
+        return SNAPSHOT_MAGIC + bytes((SNAPSHOT_VERSION, 0)) + body
+
+    @classmethod
+    def from_snapshot(cls, data):
+        if data[:2] != SNAPSHOT_MAGIC or len(data) < 4:
+            raise SessionError("Not a session snapshot")
+        if data[2] not in READABLE_VERSIONS:
+            raise SessionError(f"Unsupported session snapshot version {data[2]}")
+        try:
+            state = json.loads(zlib.decompress(data[4:]) if data[3] else data[4:])
+        except (zlib.error, ValueError) as error:
+            raise SessionError(f"Corrupt session snapshot: {error}") from None
+        # Every slot is set below, so the fresh chat log __init__ would build is skipped
+        session = cls.__new__(cls)
+        session.session_id = state["session_id"]
+        session.symptoms = {}
+        for key, value in state["symptoms"].items():
+            session.record_answer(key, value)
+        session.chat_history = ChatLog.from_dict(state["chat_history"])
+        session.chat_rendered = state["chat_rendered"]
+        session.current_step = state["current_step"]
+        session.risk_level = state["risk_level"]
+        progress = state["progress"]
+        session.progress = ProgressLog.from_dict(progress) if progress is not None else None
+        session.user = state["user"]
+        session.last_seen = time.monotonic()
+        return session
+
+
+# Approximate bytes held by an object graph; each object is counted once
+def deep_sizeof(obj, seen=None):
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        # Copied first, as live sessions may change while they are measured
+        size += sum(deep_sizeof(key, seen) + deep_sizeof(value, seen) for key, value in list(obj.items()))
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, seen) for item in list(obj))
+    else:
+        for cls in type(obj).__mro__:
+            for name in cls.__dict__.get("__slots__", ()):
+                if hasattr(obj, name):
+                    size += deep_sizeof(getattr(obj, name), seen)
+        if hasattr(obj, "__dict__"):
+            size += deep_sizeof(vars(obj), seen)
+    return size
+
+
+class SessionBackend:
+    # Snapshot bytes for a session id, or None
+    def load(self, session_id):
+        raise NotImplementedError
+
+    # Store {session id: snapshot bytes} in one round trip
+    def save_many(self, snapshots):
+        raise NotImplementedError
+
+    def delete(self, session_id):
+        raise NotImplementedError
+
+    # Delete snapshots not saved since a wall-clock time; returns how many
+    def purge(self, before):
+        raise NotImplementedError
+
+    def count(self):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class MemorySessionBackend(SessionBackend):
+    def __init__(self):
+        self.snapshots = {}
+        self._lock = threading.Lock()
+
+    def load(self, session_id):
+        with self._lock:
+            entry = self.snapshots.get(session_id)
+        return entry[1] if entry else None
+
+    def save_many(self, snapshots):
+        now = time.time()
+        with self._lock:
+            for session_id, data in snapshots.items():
+                self.snapshots[session_id] = (now, data)
+
+    def delete(self, session_id):
+        with self._lock:
+            self.snapshots.pop(session_id, None)
+
+    def purge(self, before):
+        with self._lock:
+            expired = [session_id for session_id, (saved, _) in self.snapshots.items() if saved < before]
+            for session_id in expired:
+                del self.snapshots[session_id]
+        return len(expired)
+
+    def count(self):
+        return len(self.snapshots)
+
+
+SESSION_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    saved_at REAL NOT NULL,
+    data BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_saved_at ON sessions (saved_at);
+"""
+UPSERT_SESSION = """
+INSERT INTO sessions (id, saved_at, data) VALUES (?, ?, ?)
+ON CONFLICT (id) DO UPDATE SET saved_at = excluded.saved_at, data = excluded.data
+"""
+
+
+# A local stand-in for a shared store: replicas on one host can share the file
+class SQLiteSessionBackend(SessionBackend):
+    def __init__(self, path):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SESSION_SCHEMA)
+        self._lock = threading.Lock()
+
+    def load(self, session_id):
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        return bytes(row[0]) if row else None
+
+    def save_many(self, snapshots):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(UPSERT_SESSION, [(session_id, now, data) for session_id, data in snapshots.items()])
+
+    def delete(self, session_id):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def purge(self, before):
+        with self._lock, self._conn:
+            return self._conn.execute("DELETE FROM sessions WHERE saved_at < ?", (before,)).rowcount
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# Any server speaking the Redis protocol (Redis, Valkey, KeyDB, Dragonfly).
+# Expiry is left to key TTLs, refreshed on every save.
+class RedisSessionBackend(SessionBackend):
+    def __init__(self, url, expiry=DEFAULT_EXPIRY, prefix="epidemiccare:session:"):
+        try:
+            import redis
+        except ImportError:
+            raise SessionError(f"The redis package is required for {url}") from None
+        self.client = redis.Redis.from_url(url)
+        self.expiry = int(expiry)
+        self.prefix = prefix
+
+    def load(self, session_id):
+        return self.client.get(self.prefix + session_id)
+
+    def save_many(self, snapshots):
+        pipeline = self.client.pipeline(transaction=False)
+        for session_id, data in snapshots.items():
+            pipeline.set(self.prefix + session_id, data, ex=self.expiry)
+        pipeline.execute()
+
+    def delete(self, session_id):
+        self.client.delete(self.prefix + session_id)
+
+    def purge(self, before):
+        return 0
+
+    def count(self):
+        return sum(1 for _ in self.client.scan_iter(match=self.prefix + "*", count=1000))
+
+    def close(self):
+        self.client.close()
+
+
+# Function to open the session backend named by a URL
+def open_session_backend(url=None, expiry=DEFAULT_EXPIRY):
+    url = url or os.environ.get("EPIDEMICCARE_SESSION_URL")
+    if not url:
+        directory = private_dir(os.environ.get("EPIDEMICCARE_SESSION_DIR", state_dir("sessions")))
+        url = "sqlite:///" + os.path.join(directory, "sessions.db")
+    if url.startswith("memory://"):
+        return MemorySessionBackend()
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisSessionBackend(url, expiry)
+    return SQLiteSessionBackend(url[len("sqlite:///"):] if url.startswith("sqlite:///") else url)
+
+
+class SessionStore:
+    def __init__(self, backend=None, idle_timeout=DEFAULT_IDLE_TIMEOUT, expiry=DEFAULT_EXPIRY,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL, sweep_interval=60.0, clock=time.monotonic):
+        self.backend = backend if backend is not None else open_session_backend(expiry=expiry)
+        self.idle_timeout = idle_timeout
+        self.expiry = expiry
+        self.flush_interval = flush_interval
+        self.sweep_interval = sweep_interval
+        self.clock = clock
+        self._sessions = {}
+        # Ids of sessions used since they were last saved
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._last_sweep = clock()
+        self._flush_thread = None
+        self.loads = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.rejected = 0
+        self.snapshots = 0
+        self.snapshot_bytes = 0
+        self.flushes = 0
+        self.flush_seconds = 0.0
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def create(self):
+        session = PatientSession()
+        session.last_seen = self.clock()
+        with self._lock:
+            self._sessions[session.session_id] = session
+            self._dirty.add(session.session_id)
+        increment("sessions_created")
+        return session
+
+    # The session with this id, loaded from the backend if it is not in
+    # memory, or a fresh one under the same id if it has expired. Changes to
+    # it are only written once save() marks it.
+    def get(self, session_id):
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._load(session_id)
+                if session is None:
+                    session = PatientSession(session_id)
+                    self._dirty.add(session_id)
+                self._sessions[session_id] = session
+            session.last_seen = self.clock()
+        return session
+
+    # The saved session with this id for a new browser connection, or None.
+    # A copy in memory may be older than what another replica has saved
+    # since, so it is reloaded unless this replica has unsaved changes to it.
+    def resume(self, session_id):
+        with self._lock:
+            session = self._sessions.get(session_id) if session_id in self._dirty else None
+            if session is None:
+                session = self._load(session_id)
+                if session is None:
+                    return None
+                self._sessions[session_id] = session
+            session.last_seen = self.clock()
+        return session
+
+    # Move a session to a fresh id, e.g. when its user signs in, so an id
+    # seen before then (in a shared link or browser history) stops working
+    def rotate(self, session_id):
+        session = self.get(session_id)
+        with self._lock:
+            self._sessions.pop(session_id, None)
+            self._dirty.discard(session_id)
+            session.session_id = uuid.uuid4().hex
+            self._sessions[session.session_id] = session
+            self._dirty.add(session.session_id)
+        self.backend.delete(session_id)
+        increment("sessions_rotated")
+        return session
+
+    def _load(self, session_id):
+        try:
+            data = self.backend.load(session_id)
+            if data is None:
+                return None
+            session = PatientSession.from_snapshot(data)
+        except SessionError:
+            # Written by an incompatible release or damaged; the patient starts over
+            self.rejected += 1
+            increment("session_snapshots_rejected")
+            return None
+        self.loads += 1
+        increment("session_loads")
+        return session
+
+    # Mark a session for the next flush without looking it up
+    def save(self, session):
+        with self._lock:
+            self._dirty.add(session.session_id)
+
+    # Save every dirty session in one backend batch
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                dirty, self._dirty = self._dirty, set()
+                sessions = [self._sessions[session_id] for session_id in dirty if session_id in self._sessions]
+            if not sessions:
+                return
+            start = time.perf_counter()
+            with timer("session.flush"):
+                snapshots = {session.session_id: session.snapshot() for session in sessions}
+                try:
+                    self.backend.save_many(snapshots)
+                except Exception:
+                    # Keep them dirty so the next flush retries
+                    with self._lock:
+                        self._dirty.update(snapshots)
+                    raise
+            self.flushes += 1
+            self.flush_seconds += time.perf_counter() - start
+            self.snapshots += len(snapshots)
+            self.snapshot_bytes += sum(len(data) for data in snapshots.values())
+            increment("session_snapshots", len(snapshots))
+
+    def _flush_forever(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+                self.sweep()
+            except Exception:
+                # The backend may be briefly unreachable; dirty sessions wait for the next round
+                increment("session_flush_errors")
+
+    # Start the background flusher; without it, call flush() and sweep() yourself
+    def start(self):
+        with self._lock:
+            if self._flush_thread is None:
+                self._flush_thread = threading.Thread(target=self._flush_forever, name="epidemiccare-sessions",
+                                                      daemon=True)
+                self._flush_thread.start()
+
+    # Forget a session, in memory and in the backend, e.g. on logout
+    def discard(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+            self._dirty.discard(session_id)
+        self.backend.delete(session_id)
+
+    # Drop saved sessions idle past the timeout from memory and delete
+    # expired snapshots; runs at most once per sweep_interval unless forced
+    def sweep(self, force=False):
+        now = self.clock()
+        with self._lock:
+            if not force and now - self._last_sweep < self.sweep_interval:
+                return
+            self._last_sweep = now
+        self.flush()
+        with self._lock:
+            idle = [session_id for session_id, session in self._sessions.items()
+                    if now - session.last_seen >= self.idle_timeout and session_id not in self._dirty]
+            for session_id in idle:
+                del self._sessions[session_id]
+        self.evictions += len(idle)
+        # Snapshots carry wall-clock save times
+        self.expirations += self.backend.purge(time.time() - self.expiry)
+
+    def stats(self):
+        with self._lock:
+            sessions = list(self._sessions.values())
+            pending = len(self._dirty)
+        sizes = [deep_sizeof(session) for session in sessions]
+        return {
+            "sessions": len(sessions),
+            "saved": self.backend.count(),
+            "pending": pending,
+            "bytes": sum(sizes),
+            "bytes_per_session": sum(sizes) / len(sizes) if sizes else 0.0,
+            "max_session_bytes": max(sizes, default=0),
+            "snapshot_bytes": self.snapshot_bytes / self.snapshots if self.snapshots else 0.0,
+            "flush_ms": self.flush_seconds / self.flushes * 1000 if self.flushes else 0.0,
+            "snapshots": self.snapshots,
+            "loads": self.loads,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "rejected": self.rejected,
+        }
+
+
+_default_store = None
+_default_lock = threading.Lock()
+gauge("sessions_in_memory", lambda: len(_default_store) if _default_store is not None else 0)
+
+
+# Function to get the process-wide session store, flushing in the background
+def get_session_store():
+    global _default_store
+    if _default_store is None:
+        with _default_lock:
+            if _default_store is None:
+                _default_store = SessionStore()
+                _default_store.start()
+                atexit.register(_default_store.flush)
+    return _default_store
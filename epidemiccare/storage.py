@@ -0,0 +1,466 @@
+# Persistent storage for users, consultations and daily check-ins.
+#
+# SQLiteStorage is the production backend; MemoryStorage is a local stand-in
+# with the same interface for tests and demos. open_storage() picks one from
+# a URL such as "sqlite:///epidemiccare.db" or "memory://".
+import atexit
+import datetime
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_URL = os.environ.get("EPIDEMICCARE_DB", "sqlite:///epidemiccare.db")
+
+
+class Storage:
+    def save_user(self, email, name=None):
+        raise NotImplementedError
+
+    def save_consultation(self, email, answers, risk_level, risk_score, treatment_plan):
+        raise NotImplementedError
+
+    # Check-ins may be buffered until flush()
+    def record_checkin(self, email, day, rating, symptoms, medication_taken):
+        raise NotImplementedError
+
+    def flush(self):
+        pass
+
+    # Mark one of a day's reminders done or not done
+    def set_reminder_done(self, email, day, reminder, done=True):
+        raise NotImplementedError
+
+    # Keys of the reminders marked done on a day
+    def load_reminders_done(self, email, day):
+        raise NotImplementedError
+
+    # Store the encoded password hash for a user, creating the user if needed
+    def set_password_hash(self, email, password_hash):
+        raise NotImplementedError
+
+    # Create a user with a password hash in one transaction. Returns False and
+    # changes nothing when the email already has a user, with or without a password.
+    def create_account(self, email, name, password_hash):
+        raise NotImplementedError
+
+    # The user's encoded password hash, or None if none is set
+    def load_password_hash(self, email):
+        raise NotImplementedError
+
+    # Everything known about a patient:
+    # {"name", "consultation": {...} or None, "checkins": [{...}, ...]}
+    def load_history(self, email):
+        raise NotImplementedError
+
+    # (day, symptoms, medication_taken) for every check-in of every patient,
+    # or only those on or after the date `since`, in date order
+    def iter_checkins(self, since=None):
+        raise NotImplementedError
+
+    # (day, risk_level) for every consultation, or those on or after `since`, in date order
+    def iter_consultations(self, since=None):
+        raise NotImplementedError
+
+    # (day, answers) for every consultation, or those on or after `since`, in date order
+    def iter_consultation_answers(self, since=None):
+        raise NotImplementedError
+
+    def close(self):
+        self.flush()
+
+
+class MemoryStorage(Storage):
+    def __init__(self):
+        self.users = {}
+        self.consultations = {}
+        self.checkins = {}
+        self.reminders_done = {}
+        self.password_hashes = {}
+        self._lock = threading.Lock()
+
+    def save_user(self, email, name=None):
+        with self._lock:
+            if name or email not in self.users:
+                self.users[email] = name or self.users.get(email)
+
+    def save_consultation(self, email, answers, risk_level, risk_score, treatment_plan):
+        with self._lock:
+            self.users.setdefault(email, None)
+            self.consultations[email] = {
+                "date": datetime.date.today(),
+                "answers": dict(answers),
+                "risk_level": risk_level,
+                "risk_score": risk_score,
+                "treatment_plan": dict(treatment_plan),
+            }
+
+    def record_checkin(self, email, day, rating, symptoms, medication_taken):
+        with self._lock:
+            self.users.setdefault(email, None)
+            self.checkins.setdefault(email, {})[day] = {
+                "date": day,
+                "rating": rating,
+                "symptoms": list(symptoms),
+                "taken": medication_taken,
+            }
+
+    def set_reminder_done(self, email, day, reminder, done=True):
+        with self._lock:
+            self.users.setdefault(email, None)
+            keys = self.reminders_done.setdefault((email, day), set())
+            if done:
+                keys.add(reminder)
+            else:
+                keys.discard(reminder)
+
+    def load_reminders_done(self, email, day):
+        with self._lock:
+            return set(self.reminders_done.get((email, day), ()))
+
+    def set_password_hash(self, email, password_hash):
+        with self._lock:
+            self.users.setdefault(email, None)
+            self.password_hashes[email] = password_hash
+
+    def create_account(self, email, name, password_hash):
+        with self._lock:
+            if email in self.users:
+                return False
+            self.users[email] = name
+            self.password_hashes[email] = password_hash
+            return True
+
+    def load_password_hash(self, email):
+        with self._lock:
+            return self.password_hashes.get(email)
+
+    def load_history(self, email):
+        with self._lock:
+            if email not in self.users:
+                return None
+            checkins = self.checkins.get(email, {})
+            return {
+                "name": self.users[email],
+                "consultation": self.consultations.get(email),
+                "checkins": [checkins[day] for day in sorted(checkins)],
+            }
+
+    def iter_checkins(self, since=None):
+        with self._lock:
+            entries = [entry for checkins in self.checkins.values() for entry in checkins.values()]
+        entries.sort(key=lambda entry: entry["date"])
+        for entry in entries:
+            if since is None or entry["date"] >= since:
+                yield entry["date"], entry["symptoms"], entry["taken"]
+
+    def iter_consultations(self, since=None):
+        with self._lock:
+            consultations = sorted(self.consultations.values(), key=lambda consultation: consultation["date"])
+        for consultation in consultations:
+            if since is None or consultation["date"] >= since:
+                yield consultation["date"], consultation["risk_level"]
+
+    def iter_consultation_answers(self, since=None):
+        with self._lock:
+            consultations = sorted(self.consultations.values(), key=lambda consultation: consultation["date"])
+        for consultation in consultations:
+            if since is None or consultation["date"] >= since:
+                yield consultation["date"], consultation["answers"]
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY,
+    email TEXT NOT NULL UNIQUE,
+    name TEXT,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS consultations (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users(id),
+    day TEXT NOT NULL,
+    answers TEXT NOT NULL,
+    risk_level TEXT NOT NULL,
+    risk_score INTEGER NOT NULL,
+    treatment_plan TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS consultations_user_day ON consultations (user_id, day);
+CREATE INDEX IF NOT EXISTS consultations_day ON consultations (day);
+CREATE TABLE IF NOT EXISTS checkins (
+    user_id INTEGER NOT NULL REFERENCES users(id),
+    day TEXT NOT NULL,
+    rating INTEGER NOT NULL,
+    symptoms TEXT NOT NULL,
+    medication_taken INTEGER NOT NULL,
+    PRIMARY KEY (user_id, day)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS checkins_day ON checkins (day);
+CREATE TABLE IF NOT EXISTS reminders_done (
+    user_id INTEGER NOT NULL REFERENCES users(id),
+    day TEXT NOT NULL,
+    reminder TEXT NOT NULL,
+    PRIMARY KEY (user_id, day, reminder)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS credentials (
+    user_id INTEGER PRIMARY KEY REFERENCES users(id),
+    password_hash TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+"""
+
+# Statements are module constants so every pooled connection reuses its prepared copy
+UPSERT_USER = """
+INSERT INTO users (email, name, created_at) VALUES (?, ?, ?)
+ON CONFLICT (email) DO UPDATE SET name = COALESCE(excluded.name, users.name)
+"""
+INSERT_CONSULTATION = """
+INSERT INTO consultations (user_id, day, answers, risk_level, risk_score, treatment_plan)
+VALUES ((SELECT id FROM users WHERE email = ?), ?, ?, ?, ?, ?)
+"""
+UPSERT_CHECKIN = """
+INSERT INTO checkins (user_id, day, rating, symptoms, medication_taken)
+VALUES ((SELECT id FROM users WHERE email = ?), ?, ?, ?, ?)
+ON CONFLICT (user_id, day) DO UPDATE SET
+    rating = excluded.rating, symptoms = excluded.symptoms, medication_taken = excluded.medication_taken
+"""
+INSERT_REMINDER_DONE = """
+INSERT INTO reminders_done (user_id, day, reminder)
+VALUES ((SELECT id FROM users WHERE email = ?), ?, ?)
+ON CONFLICT DO NOTHING
+"""
+DELETE_REMINDER_DONE = """
+DELETE FROM reminders_done
+WHERE user_id = (SELECT id FROM users WHERE email = ?) AND day = ? AND reminder = ?
+"""
+SELECT_REMINDERS_DONE = """
+SELECT reminder FROM reminders_done
+WHERE user_id = (SELECT id FROM users WHERE email = ?) AND day = ?
+"""
+INSERT_NEW_USER = """
+INSERT INTO users (email, name, created_at) VALUES (?, ?, ?) ON CONFLICT (email) DO NOTHING
+"""
+INSERT_PASSWORD_HASH = """
+INSERT INTO credentials (user_id, password_hash, updated_at) VALUES (?, ?, ?)
+"""
+UPSERT_PASSWORD_HASH = """
+INSERT INTO credentials (user_id, password_hash, updated_at)
+VALUES ((SELECT id FROM users WHERE email = ?), ?, ?)
+ON CONFLICT (user_id) DO UPDATE SET password_hash = excluded.password_hash, updated_at = excluded.updated_at
+"""
+SELECT_PASSWORD_HASH = """
+SELECT password_hash FROM credentials WHERE user_id = (SELECT id FROM users WHERE email = ?)
+"""
+# The user row, their latest consultation and all their check-ins in one round trip
+SELECT_HISTORY = """
+WITH patient AS (SELECT id, name FROM users WHERE email = ?1)
+SELECT 'user', NULL, patient.name, NULL, NULL, NULL FROM patient
+UNION ALL
+SELECT 'consultation', c.day, c.answers, c.risk_level, c.risk_score, c.treatment_plan
+FROM consultations c
+WHERE c.id = (SELECT MAX(id) FROM consultations WHERE user_id = (SELECT id FROM patient))
+UNION ALL
+SELECT 'checkin', k.day, k.symptoms, NULL, k.rating, k.medication_taken
+FROM checkins k
+WHERE k.user_id = (SELECT id FROM patient)
+ORDER BY 1, 2
+"""
+
+
+class SQLiteStorage(Storage):
+    def __init__(self, path, pool_size=8, batch_size=100, flush_interval=5.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pool = queue.LifoQueue()
+        self._pending = []
+        self._pending_lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        # Flushes a partial batch flush_interval seconds after its first check-in
+        self._timer = None
+
+        for _ in range(pool_size):
+            self._pool.put(self._connect())
+        with self._connection() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30, cached_statements=64)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        return conn
+
+    # Borrow a pooled connection for one transaction
+    @contextmanager
+    def _connection(self):
+        conn = self._pool.get()
+        try:
+            with conn:
+                yield conn
+        finally:
+            self._pool.put(conn)
+
+    def save_user(self, email, name=None):
+        with self._connection() as conn:
+            conn.execute(UPSERT_USER, (email, name, datetime.datetime.now().isoformat()))
+
+    def save_consultation(self, email, answers, risk_level, risk_score, treatment_plan):
+        self.save_user(email)
+        with self._connection() as conn:
+            conn.execute(INSERT_CONSULTATION, (email, datetime.date.today().isoformat(), json.dumps(answers),
+                                               risk_level, risk_score, json.dumps(treatment_plan)))
+
+    def record_checkin(self, email, day, rating, symptoms, medication_taken):
+        with self._pending_lock:
+            self._pending.append((email, day.isoformat(), rating, json.dumps(list(symptoms)), int(medication_taken)))
+            due = (len(self._pending) >= self.batch_size
+                   or time.monotonic() - self._last_flush >= self.flush_interval)
+            if not due and self._timer is None:
+                self._timer = threading.Timer(self.flush_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if due:
+            self.flush()
+
+    # Write buffered check-ins in one transaction; they are kept for the next
+    # flush if the write fails
+    def flush(self):
+        with self._pending_lock:
+            pending, self._pending = self._pending, []
+            self._last_flush = time.monotonic()
+            timer, self._timer = self._timer, None
+        if timer is not None:
+            timer.cancel()
+        if not pending:
+            return
+        try:
+            with self._connection() as conn:
+                conn.executemany(
+                    "INSERT INTO users (email, created_at) VALUES (?, ?) ON CONFLICT (email) DO NOTHING",
+                    {(row[0], datetime.datetime.now().isoformat()) for row in pending},
+                )
+                conn.executemany(UPSERT_CHECKIN, pending)
+        except sqlite3.Error:
+            with self._pending_lock:
+                self._pending[:0] = pending
+            raise
+
+    def set_reminder_done(self, email, day, reminder, done=True):
+        if done:
+            self.save_user(email)
+        with self._connection() as conn:
+            conn.execute(INSERT_REMINDER_DONE if done else DELETE_REMINDER_DONE, (email, day.isoformat(), reminder))
+
+    def load_reminders_done(self, email, day):
+        with self._connection() as conn:
+            rows = conn.execute(SELECT_REMINDERS_DONE, (email, day.isoformat())).fetchall()
+        return {reminder for reminder, in rows}
+
+    def set_password_hash(self, email, password_hash):
+        self.save_user(email)
+        with self._connection() as conn:
+            conn.execute(UPSERT_PASSWORD_HASH, (email, password_hash, datetime.datetime.now().isoformat()))
+
+    def create_account(self, email, name, password_hash):
+        now = datetime.datetime.now().isoformat()
+        with self._connection() as conn:
+            cursor = conn.execute(INSERT_NEW_USER, (email, name, now))
+            if cursor.rowcount == 0:
+                return False
+            conn.execute(INSERT_PASSWORD_HASH, (cursor.lastrowid, password_hash, now))
+        return True
+
+    def load_password_hash(self, email):
+        with self._connection() as conn:
+            row = conn.execute(SELECT_PASSWORD_HASH, (email,)).fetchone()
+        return row[0] if row else None
+
+    def load_history(self, email):
+        self.flush()
+        with self._connection() as conn:
+            rows = conn.execute(SELECT_HISTORY, (email,)).fetchall()
+
+        history = None
+        consultation = None
+        checkins = []
+        for kind, day, text, risk_level, number, extra in rows:
+            if kind == "user":
+                history = {"name": text}
+            elif kind == "consultation":
+                consultation = {
+                    "date": datetime.date.fromisoformat(day),
+                    "answers": json.loads(text),
+                    "risk_level": risk_level,
+                    "risk_score": number,
+                    "treatment_plan": json.loads(extra),
+                }
+            else:
+                checkins.append({
+                    "date": datetime.date.fromisoformat(day),
+                    "rating": number,
+                    "symptoms": json.loads(text),
+                    "taken": bool(extra),
+                })
+        if history is None:
+            return None
+        history["consultation"] = consultation
+        history["checkins"] = checkins
+        return history
+
+    # The iterators stream rows off the day index, holding a pooled connection
+    # until they are exhausted or closed
+    def iter_checkins(self, since=None):
+        self.flush()
+        with self._connection() as conn:
+            rows = conn.execute("SELECT day, symptoms, medication_taken FROM checkins WHERE day >= ? ORDER BY day",
+                                (since.isoformat() if since else "",))
+            for day, symptoms, medication_taken in rows:
+                yield datetime.date.fromisoformat(day), json.loads(symptoms), bool(medication_taken)
+
+    def iter_consultations(self, since=None):
+        with self._connection() as conn:
+            rows = conn.execute("SELECT day, risk_level FROM consultations WHERE day >= ? ORDER BY day",
+                                (since.isoformat() if since else "",))
+            for day, risk_level in rows:
+                yield datetime.date.fromisoformat(day), risk_level
+
+    def iter_consultation_answers(self, since=None):
+        with self._connection() as conn:
+            rows = conn.execute("SELECT day, answers FROM consultations WHERE day >= ? ORDER BY day",
+                                (since.isoformat() if since else "",))
+            for day, answers in rows:
+                yield datetime.date.fromisoformat(day), json.loads(answers)
+
+    def close(self):
+        self.flush()
+        while not self._pool.empty():
+            self._pool.get_nowait().close()
+
+
+# Function to open the storage backend named by a URL
+def open_storage(url=None):
+    url = url or DEFAULT_URL
+    if url.startswith("memory://"):
+        return MemoryStorage()
+    path = url[len("sqlite:///"):] if url.startswith("sqlite:///") else url
+    storage = SQLiteStorage(path)
+    atexit.register(storage.flush)
+    return storage
+
+
+_default_storage = None
+_default_lock = threading.Lock()
+
+
+# Function to get the process-wide storage backend named by $EPIDEMICCARE_DB
+def get_storage():
+    global _default_storage
+    if _default_storage is None:
+        with _default_lock:
+            if _default_storage is None:
+                _default_storage = open_storage()
+    return _default_storage
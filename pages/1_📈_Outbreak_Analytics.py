@@ -0,0 +1,63 @@
+import datetime
+
+import streamlit as st
+
+from epidemiccare.analytics import get_daily_aggregates
+from epidemiccare.outbreak import get_outbreak_detector
+
+# Page configuration
+st.set_page_config(
+    page_title="Outbreak Analytics - EpidemicCare AI",
+    page_icon="📈",
+    layout="wide"
+)
+
+st.markdown("""
+<div style="background-color: #0074D9; padding: 1.5rem; border-radius: 1rem; color: white; margin-bottom: 1.5rem;">
+    <h2 style="color: white;">📈 Outbreak Analytics</h2>
+    <p style="color: white;">Daily symptom prevalence, risk levels and medication adherence across all patients</p>
+</div>
+""", unsafe_allow_html=True)
+
+aggregates = get_daily_aggregates()
+
+if not len(aggregates):
+    st.info("No consultations or check-ins have been recorded yet")
+    st.stop()
+
+totals = aggregates.totals()
+col1, col2, col3, col4 = st.columns(4)
+col1.metric("Days", totals["days"])
+col2.metric("Consultations", totals["consultations"])
+col3.metric("Check-ins", totals["checkins"])
+if totals["checkins"]:
+    col4.metric("Medication adherence", f"{totals['medication_taken'] / totals['checkins'] * 100:.0f}%")
+
+st.markdown("### Symptom prevalence per day")
+st.caption("Share of the day's check-ins reporting each symptom")
+st.line_chart(aggregates.prevalence_frame())
+
+st.markdown("### Risk level distribution")
+st.bar_chart(aggregates.risk_frame())
+
+st.markdown("### Medication adherence")
+st.line_chart(aggregates.adherence_frame()["adherence"])
+
+st.markdown("### Outbreak alerts")
+st.caption("Symptom surges overall and geographic hotspots, newest first")
+alerts = getattr(get_outbreak_detector().sink, "alerts", ())
+if alerts:
+    st.dataframe([
+        {
+            "time": datetime.datetime.fromtimestamp(alert.time).strftime("%Y-%m-%d %H:%M"),
+            "kind": alert.kind,
+            "symptom": alert.symptom,
+            "region": alert.region or "all",
+            "reports": alert.count,
+            "expected": round(alert.expected, 1),
+            "score": round(alert.score, 1),
+        }
+        for alert in reversed(alerts)
+    ], use_container_width=True)
+else:
+    st.info("No outbreak alerts")
@@ -1,7 +1,24 @@
 import streamlit as st
-import pandas as pd
+import contextlib
 import datetime
-import time
+import functools
+import threading
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from streamlit.errors import StreamlitAPIException
+
+from epidemiccare import core
+from epidemiccare.analytics import get_daily_aggregates
+from epidemiccare.assets import get_assets
+from epidemiccare.auth import AuthError, get_credentials
+from epidemiccare.knowledge import get_knowledge_base
+from epidemiccare.metrics import RerunProfiler, increment, timed, timer
+from epidemiccare.outbreak import SITE_LOCATION, get_outbreak_detector
+from epidemiccare.progress import CHECKIN_SYMPTOMS, ProgressLog
+from epidemiccare.reminders import DEFAULT_TIMEZONE, get_reminder_scheduler, plan_end, plan_reminders
+from epidemiccare.scheduler import get_scheduler
+from epidemiccare.session import get_session_store
+from epidemiccare.storage import get_storage
 
 # Page configuration
 st.set_page_config(
@@ -11,155 +28,148 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
-# Custom CSS for styling
-st.markdown("""
-    <style>
-    .main {
-        background: linear-gradient(135deg, #0074D9 0%, #2E86AB 100%);
-        padding: 2rem;
-        border-radius: 1rem;
-        color: white;
-    }
-    .blue-bg {
-        background-color: #0074D9;
-        padding: 1.5rem;
-        border-radius: 1rem;
-        color: white;
-        margin-bottom: 1.5rem;
-    }
-    .doctor-chat {
-        background-color: #E8F4F8;
-        padding: 1.5rem;
-        border-radius: 15px;
-        margin-bottom: 1rem;
-        border-left: 5px solid #2E86AB;
-        font-size: 1.1rem;
-    }
-    .user-chat {
-        background-color: #F0F7EE;
-        padding: 1.5rem;
-        border-radius: 15px;
-        margin-bottom: 1rem;
-        border-left: 5px solid #3DAB6D;
-        font-size: 1.1rem;
-    }
-    .stButton>button {
-        background-color: #0074D9;
-        color: white;
-        border: none;
-        padding: 0.7rem 1.5rem;
-        border-radius: 8px;
-        font-size: 1rem;
-        transition: all 0.3s;
-    }
-    .stButton>button:hover {
-        background-color: #005BB7;
-        color: white;
-    }
-    .card {
-        background-color: white;
-        padding: 1.5rem;
-        border-radius: 15px;
-        box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
-        margin-bottom: 1.5rem;
-    }
-    .progress-bar {
-        height: 1.5rem;
-        background-color: #E0E0E0;
-        border-radius: 10px;
-        margin-bottom: 1rem;
-    }
-    .progress-fill {
-        height: 100%;
-        background-color: #0074D9;
-        border-radius: 10px;
-        text-align: center;
-        color: white;
-        line-height: 1.5rem;
-    }
-    .reminder-card {
-        background-color: #FFF4E5;
-        padding: 1rem;
-        border-radius: 10px;
-        border-left: 4px solid #FFA500;
-        margin-bottom: 1rem;
-    }
-    .feature-card {
-        background-color: white;
-        padding: 1.5rem;
-        border-radius: 15px;
-        box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
-        margin-bottom: 1.5rem;
-        text-align: center;
-        transition: transform 0.3s;
-    }
-    .feature-card:hover {
-        transform: translateY(-5px);
-    }
-    .symptom-item {
-        padding: 0.5rem;
-        border-radius: 5px;
-        margin-bottom: 0.5rem;
-        background-color: #F0F8FF;
-    }
-    </style>
-    """, unsafe_allow_html=True)
+# Stylesheet from epidemiccare/static: a link to the cached, pre-compressed file when
+# EPIDEMICCARE_ASSET_URL is set, otherwise inlined
+st.markdown(get_assets().stylesheet_tag("app.css"), unsafe_allow_html=True)
 
 # Initialize session state
 if 'authenticated' not in st.session_state:
     st.session_state.authenticated = False
 if 'user_data' not in st.session_state:
     st.session_state.user_data = {}
-if 'symptoms' not in st.session_state:
-    st.session_state.symptoms = {}
-if 'chat_history' not in st.session_state:
-    st.session_state.chat_history = []
-if 'current_step' not in st.session_state:
-    st.session_state.current_step = 0
-if 'treatment_plan' not in st.session_state:
-    st.session_state.treatment_plan = {}
-if 'progress_data' not in st.session_state:
-    st.session_state.progress_data = {}
 if 'show_welcome' not in st.session_state:
     st.session_state.show_welcome = True
+if 'flash_messages' not in st.session_state:
+    st.session_state.flash_messages = []
+
+# A new connection resumes the session named in the URL, so reconnecting to any replica,
+# e.g. after a restart, picks the consultation up where it was. The id alone never signs
+# anyone in: the token stays in this browser session, and a resumed session that belongs
+# to a user waits for that user to sign in again.
+query_params = getattr(st, "query_params", None)
+if 'session_id' not in st.session_state:
+    resumed = query_params.get("session") if query_params is not None else None
+    session = (get_session_store().resume(resumed) if resumed else None) or get_session_store().create()
+    st.session_state.session_id = session.session_id
+    if query_params is not None:
+        query_params["session"] = session.session_id
+    if session.user:
+        st.session_state.show_welcome = False
+
+# A signed-in session stays signed in only while its token is valid; a cached lookup, not a password check
+if st.session_state.authenticated and \
+        get_credentials().session_user(st.session_state.get("auth_token")) != st.session_state.user_data.get("email"):
+    st.session_state.authenticated = False
+    st.session_state.pop("auth_token", None)
+
+# Function to get this browser session's consultation from the server-side store.
+# Looked up on every call, since an idle session may have been spilled to disk.
+def current_session():
+    return get_session_store().get(st.session_state.session_id)
+
+# Function to get the client's address for login rate limits, where Streamlit reports it
+def client_address():
+    context = getattr(st, "context", None)
+    address = getattr(context, "ip_address", None)
+    if address:
+        return address
+    headers = getattr(context, "headers", None) or {}
+    forwarded = headers.get("X-Forwarded-For")
+    return forwarded.split(",")[0].strip() if forwarded else None
+
+# Function to get the browser's timezone where Streamlit reports it
+def user_timezone():
+    context = getattr(st, "context", None)
+    name = getattr(context, "timezone", None) or DEFAULT_TIMEZONE
+    try:
+        return ZoneInfo(name)
+    except (ValueError, ZoneInfoNotFoundError):
+        return ZoneInfo(DEFAULT_TIMEZONE)
+
+# st.experimental_rerun was renamed to st.rerun in newer Streamlit releases
+rerun = getattr(st, "rerun", None) or st.experimental_rerun
+
+# Fragments rerun on their own when their widgets change; releases without them rerun the whole page
+_fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda func: func)
+
+# Set while the whole script runs, so a fragment can tell a rerun of its own from being drawn in one
+_full_run = threading.local()
 
-# Disease database
-diseases = {
-    "Influenza": {
-        "symptoms": ["fever", "cough", "sore throat", "body aches", "fatigue"],
-        "description": "A viral infection that attacks your respiratory system.",
-        "precautions": ["Rest", "Hydration", "Over-the-counter fever reducers"]
-    },
-    "COVID-19": {
-        "symptoms": ["fever", "cough", "shortness of breath", "loss of taste", "loss of smell", "fatigue"],
-        "description": "A contagious disease caused by the SARS-CoV-2 virus.",
-        "precautions": ["Isolation", "Rest", "Medical consultation", "Symptom monitoring"]
-    },
-    "Dengue Fever": {
-        "symptoms": ["high fever", "severe headache", "pain behind eyes", "joint pain", "rash"],
-        "description": "A mosquito-borne tropical disease caused by the dengue virus.",
-        "precautions": ["Hydration", "Rest", "Medical supervision", "Mosquito protection"]
-    },
-    "Common Cold": {
-        "symptoms": ["runny nose", "sneezing", "congestion", "mild cough", "sore throat"],
-        "description": "A viral infection of your nose and throat.",
-        "precautions": ["Rest", "Hydration", "Over-the-counter cold medicine"]
-    }
-}
-
-# Doctor questions
-questions = [
-    "Hello! I'm Dr. AI, your medical assistant. What's your name?",
-    "Nice to meet you! How old are you?",
-    "Do you have any pre-existing medical conditions?",
-    "Let's talk about your symptoms. Have you had a fever in the last 48 hours?",
-    "Are you experiencing any cough or difficulty breathing?",
-    "Do you have any body aches or joint pain?",
-    "Have you noticed any loss of taste or smell?",
-    "Are you experiencing fatigue or unusual tiredness?",
-    "Any other symptoms you'd like to mention?",
-    "Thank you. I'm now analyzing your symptoms..."
-]
+# Function to mark the enclosed code as a run of the whole script
+@contextlib.contextmanager
+def full_run():
+    _full_run.active = True
+    try:
+        yield
+    finally:
+        _full_run.active = False
+
+# Function to declare a fragment whose own reruns are counted, timed and profiled
+# like full reruns, as app.fragment_reruns and app.fragment_rerun
+def fragment(func):
+    @functools.wraps(func)
+    def run(*args, **kwargs):
+        if getattr(_full_run, "active", False):
+            return func(*args, **kwargs)
+        increment("app.fragment_reruns")
+        with timer("app.fragment_rerun"), RerunProfiler(st.session_state.session_id):
+            return func(*args, **kwargs)
+    return _fragment(run)
+
+# Function to rerun only the current fragment, or the whole app where that isn't supported
+def rerun_fragment():
+    try:
+        rerun(scope="fragment")
+    except (TypeError, StreamlitAPIException):
+        rerun()
+
+# Function to queue a message for the next run, so handlers can rerun straight away
+def flash(message, kind="success"):
+    st.session_state.flash_messages.append((kind, message))
+
+# Function to show and clear queued messages
+def show_flash_messages():
+    messages = st.session_state.flash_messages
+    st.session_state.flash_messages = []
+    for kind, message in messages:
+        if hasattr(st, "toast"):
+            st.toast(message, icon="✅" if kind == "success" else "⚠️")
+        else:
+            getattr(st, kind)(message)
+
+# Rendered static content shared by every session, keyed by the knowledge base fingerprint.
+# Expander title and rendered body for each disease:
+@st.cache_data(show_spinner=False)
+def render_diseases_info(fingerprint, _knowledge_base):
+    rendered = []
+    for disease, info in _knowledge_base.diseases.items():
+        symptoms = "".join(f'<div class="symptom-item">• {symptom.title()}</div>' for symptom in info["symptoms"])
+        precautions = "\n\n".join(f'• {precaution}' for precaution in info["precautions"])
+        body = f'{info["description"]}\n\n**Common Symptoms:**\n\n{symptoms}\n\n**Precautions:**\n\n{precautions}'
+        rendered.append((disease, body))
+    return rendered
+
+@st.cache_data(show_spinner=False)
+def render_precautions(fingerprint, _knowledge_base):
+    return "\n".join(f"{i}. {precaution}" for i, precaution in enumerate(_knowledge_base.precautions, 1))
+
+# Drop everything cached from an older knowledge base
+@st.cache_resource(show_spinner=False)
+def cache_generation():
+    return {"fingerprint": None}
+
+def refresh_caches(knowledge_base):
+    generation = cache_generation()
+    if generation["fingerprint"] != knowledge_base.fingerprint:
+        render_diseases_info.clear()
+        render_precautions.clear()
+        generation["fingerprint"] = knowledge_base.fingerprint
+
+# Disease knowledge base, reloaded when its files change
+knowledge_base = get_knowledge_base()
+refresh_caches(knowledge_base)
+diseases = knowledge_base.diseases
+questions = knowledge_base.questions
 
 # Function to display welcome page
 def show_welcome():
@@ -180,8 +190,14 @@ def show_welcome():
         </div>
         """, unsafe_allow_html=True)
         
-        st.image("https://images.unsplash.com/photo-1576091160399-112ba8d25d1f?ixlib=rb-1.2.1&auto=format&fit=crop&w=800&q=80", 
-                 use_column_width=True, caption="AI-Powered Healthcare")
+        # Shipped with the app, so the page does not wait on a third-party CDN
+        hero_url = get_assets().url("hero.svg")
+        if hero_url:
+            st.markdown(f'<img src="{hero_url}" alt="AI-Powered Healthcare" width="800" height="450" '
+                        f'style="width: 100%; height: auto;">', unsafe_allow_html=True)
+            st.caption("AI-Powered Healthcare")
+        else:
+            st.image(get_assets()["hero.svg"].path, width="stretch", caption="AI-Powered Healthcare")
         
         st.markdown("""
         <div style="text-align: center; margin: 2rem 0;">
@@ -195,7 +211,7 @@ def show_welcome():
         
         if st.button("Get Started", key="welcome_btn", use_container_width=True):
             st.session_state.show_welcome = False
-            st.experimental_rerun()
+            rerun()
 
 # Function to display authentication UI
 def show_auth_ui():
@@ -216,11 +232,14 @@ def show_auth_ui():
             password = st.text_input("Password", type="password", key="login_password")
             if st.button("Login", key="login_btn", use_container_width=True):
                 if email and password:
-                    st.session_state.authenticated = True
-                    st.session_state.user_data = {"email": email}
-                    st.success("Login successful!")
-                    time.sleep(1)
-                    st.experimental_rerun()
+                    try:
+                        token = get_credentials().login(email, password, client_address())
+                    except AuthError as error:
+                        st.error(str(error))
+                    else:
+                        sign_in(email, token)
+                        flash("Login successful!")
+                        rerun()
                 else:
                     st.error("Please enter both email and password")
         
@@ -233,109 +252,96 @@ def show_auth_ui():
             if st.button("Create Account", key="reg_btn", use_container_width=True):
                 if new_name and new_email and new_password:
                     if new_password == confirm_password:
-                        st.session_state.authenticated = True
-                        st.session_state.user_data = {
-                            "name": new_name,
-                            "email": new_email
-                        }
-                        st.success("Account created successfully!")
-                        time.sleep(1)
-                        st.experimental_rerun()
+                        try:
+                            token = get_credentials().register(new_email, new_password, new_name, client_address())
+                        except AuthError as error:
+                            st.error(str(error))
+                        else:
+                            sign_in(new_email, token, new_name)
+                            flash("Account created successfully!")
+                            rerun()
                     else:
                         st.error("Passwords do not match")
                 else:
                     st.error("Please fill all fields")
 
-# Function to display chat message
+# Function to point this browser session, and its URL, at a session id
+def use_session(session):
+    st.session_state.session_id = session.session_id
+    if query_params is not None:
+        query_params["session"] = session.session_id
+
+# Function to mark the browser session signed in with a freshly issued token. The
+# session moves to a new id, so one planted in a link is not the one signed in, and
+# a session resumed from someone else's link is left to its owner. The patient's
+# own consultation still in progress is resumed rather than overwritten by history.
+def sign_in(email, token, name=None):
+    store = get_session_store()
+    session = current_session()
+    owner = session.user.get("email") if session.user else None
+    in_progress = owner == email and session.current_step < len(questions)
+    if owner and owner != email:
+        use_session(store.create())
+    else:
+        use_session(store.rotate(session.session_id))
+    st.session_state.authenticated = True
+    st.session_state.auth_token = token
+    if in_progress:
+        st.session_state.user_data = dict(session.user)
+        if name:
+            st.session_state.user_data["name"] = name
+    else:
+        st.session_state.user_data = {"email": email, "name": name} if name else {"email": email}
+        restore_history(email)
+    session = current_session()
+    session.user = dict(st.session_state.user_data)
+    store.save(session)
+
+# Function to restore a returning patient's progress log and treatment plan. The
+# latest consultation is kept as history; the patient starts a new one.
+def restore_history(email):
+    history = get_storage().load_history(email)
+    if history is None:
+        return
+    
+    if history["name"]:
+        st.session_state.user_data["name"] = history["name"]
+    
+    consultation = history["consultation"]
+    if consultation:
+        st.session_state.last_consultation = consultation
+        checkins = history["checkins"]
+        session = current_session()
+        session.risk_level = consultation["risk_level"]
+        session.progress = ProgressLog.from_checkins(consultation["date"], checkins)
+        get_session_store().save(session)
+        schedule_reminders(consultation["date"])
+
+# Function to display the chat so far as one element; show_consultation_step() draws anything newer
+@timed("app.display_chat")
 def display_chat():
-    for sender, message in st.session_state.chat_history:
-        if sender == "doctor":
-            st.markdown(f'<div class="doctor-chat"><b>Dr. AI:</b> {message}</div>', unsafe_allow_html=True)
-        else:
-            st.markdown(f'<div class="user-chat"><b>You:</b> {message}</div>', unsafe_allow_html=True)
+    session = current_session()
+    chat_html = session.chat_history.render_html()
+    if chat_html:
+        st.markdown(chat_html, unsafe_allow_html=True)
+    if session.chat_rendered != len(session.chat_history):
+        session.chat_rendered = len(session.chat_history)
+        get_session_store().save(session)
 
 # Function to assess risk
 def assess_risk():
-    symptoms_list = []
-    for key, value in st.session_state.symptoms.items():
-        if key.startswith('symptom_') and value in ["Yes", True]:
-            symptom_name = key.replace('symptom_', '').replace('_', ' ')
-            symptoms_list.append(symptom_name)
-    
-    risk_score = 0
-    
-    # Check for key symptoms
-    if "fever" in symptoms_list:
-        risk_score += 2
-    if "cough" in symptoms_list or "difficulty breathing" in symptoms_list:
-        risk_score += 2
-    if "loss of taste" in symptoms_list or "loss of smell" in symptoms_list:
-        risk_score += 3
-    
-    # Determine risk level
-    if risk_score >= 5:
-        return "high", risk_score
-    elif risk_score >= 3:
-        return "medium", risk_score
-    else:
-        return "low", risk_score
+    return core.assess_risk(current_session().symptoms)
 
 # Function to generate diagnosis
-def generate_diagnosis():
-    user_symptoms = []
-    for key, value in st.session_state.symptoms.items():
-        if key.startswith('symptom_') and value in ["Yes", True]:
-            symptom_name = key.replace('symptom_', '').replace('_', ' ')
-            user_symptoms.append(symptom_name)
-    
-    possible_diseases = []
-    for disease, info in diseases.items():
-        match_count = 0
-        for symptom in user_symptoms:
-            if symptom in info["symptoms"]:
-                match_count += 1
-        
-        if match_count > 0:
-            match_percentage = (match_count / len(info["symptoms"])) * 100
-            possible_diseases.append((disease, match_count, info["description"], match_percentage, info["precautions"]))
-    
-    # Sort by match count (descending)
-    possible_diseases.sort(key=lambda x: x[1], reverse=True)
-    
-    return possible_diseases
+def generate_diagnosis(limit=None):
+    return core.generate_diagnosis(current_session().symptoms, limit)
 
 # Function to generate treatment plan
 def generate_treatment_plan(risk_level):
-    plans = {
-        "high": {
-            "medication": ["Antiviral medication", "Paracetamol for fever", "Cough syrup"],
-            "rest": "Complete bed rest for at least 5 days",
-            "diet": "Plenty of fluids, light meals, vitamin C rich foods",
-            "monitoring": "Check temperature every 4 hours, monitor oxygen levels",
-            "follow_up": "Teleconsultation in 24 hours, in-person if symptoms worsen",
-            "duration": "7-10 days"
-        },
-        "medium": {
-            "medication": ["Paracetamol as needed", "Decongestants if required"],
-            "rest": "Adequate rest, avoid strenuous activities",
-            "diet": "Increased fluid intake, balanced diet",
-            "monitoring": "Check temperature twice daily",
-            "follow_up": "Teleconsultation in 48 hours",
-            "duration": "5-7 days"
-        },
-        "low": {
-            "medication": ["Over-the-counter symptom relief as needed"],
-            "rest": "Normal activities with adequate sleep",
-            "diet": "Normal healthy diet with extra fluids",
-            "monitoring": "Watch for new or worsening symptoms",
-            "follow_up": "Consult if symptoms persist beyond 5 days",
-            "duration": "3-5 days"
-        }
-    }
-    
-    return plans[risk_level]
+    return core.generate_treatment_plan(risk_level)
 
 # Function to show epidemic diseases info
+@timed("app.show_diseases_info")
 def show_diseases_info():
     st.markdown("""
     <div class="blue-bg">
@@ -343,18 +349,12 @@ def show_diseases_info():
     </div>
     """, unsafe_allow_html=True)
     
-    for disease, info in diseases.items():
+    for disease, body in render_diseases_info(knowledge_base.fingerprint, knowledge_base):
         with st.expander(f"{disease}"):
-            st.write(info["description"])
-            st.markdown("**Common Symptoms:**")
-            for symptom in info["symptoms"]:
-                st.markdown(f'<div class="symptom-item">• {symptom.title()}</div>', unsafe_allow_html=True)
-            
-            st.markdown("**Precautions:**")
-            for precaution in info["precautions"]:
-                st.markdown(f'• {precaution}')
+            st.markdown(body, unsafe_allow_html=True)
 
 # Function to show precautions
+@timed("app.show_precautions")
 def show_precautions():
     st.markdown("""
     <div class="blue-bg">
@@ -362,81 +362,65 @@ def show_precautions():
     </div>
     """, unsafe_allow_html=True)
     
-    precautions = [
-        "Wash hands frequently with soap and water for at least 20 seconds",
-        "Use alcohol-based hand sanitizer when soap is not available",
-        "Avoid touching your face, especially eyes, nose, and mouth",
-        "Practice social distancing (at least 6 feet from others)",
-        "Wear a mask in public settings",
-        "Cover your mouth and nose with a tissue when coughing or sneezing",
-        "Clean and disinfect frequently touched objects and surfaces",
-        "Stay home when you are sick",
-        "Get vaccinated when available",
-        "Maintain a healthy lifestyle with proper nutrition and exercise"
-    ]
-    
-    for i, precaution in enumerate(precautions, 1):
-        st.markdown(f"{i}. {precautions[i-1]}")
+    st.markdown(render_precautions(knowledge_base.fingerprint, knowledge_base))
 
 # Function to show progress tracking
+@fragment
+@timed("app.show_progress_tracking")
 def show_progress_tracking():
+    show_flash_messages()
+    session = current_session()
+    
     st.markdown("""
     <div class="blue-bg">
         <h3 style="color: white;">📊 Your Health Progress</h3>
     </div>
     """, unsafe_allow_html=True)
     
-    if not st.session_state.progress_data:
+    progress = session.progress
+    if progress is None:
         st.info("Complete your consultation to start tracking progress")
         return
     
     today = datetime.date.today()
     
-    if today not in [entry['date'] for entry in st.session_state.progress_data.get('daily_rating', [])]:
+    if not progress.has_checkin(today):
         st.subheader("How are you feeling today?")
         rating = st.slider("Rate your symptoms (1-10)", 1, 10, 5, key="daily_rating")
-        symptoms = st.multiselect("Current symptoms", 
-                                 ["Fever", "Cough", "Headache", "Fatigue", "Body aches", "Shortness of breath"])
+        symptoms = st.multiselect("Current symptoms", CHECKIN_SYMPTOMS)
         meds_taken = st.checkbox("I took my medication as prescribed")
         
         if st.button("Save Today's Progress", key="save_progress"):
-            if 'daily_rating' not in st.session_state.progress_data:
-                st.session_state.progress_data['daily_rating'] = []
-            
-            st.session_state.progress_data['daily_rating'].append({
-                'date': today,
-                'rating': rating
-            })
-            
-            st.session_state.progress_data['symptoms_track'].append({
-                'date': today,
-                'symptoms': symptoms
-            })
+            progress.add(today, rating, symptoms, meds_taken)
+            get_session_store().save(session)
             
-            st.session_state.progress_data['medication_taken'].append({
-                'date': today,
-                'taken': meds_taken
-            })
+            if st.session_state.user_data.get("email"):
+                get_storage().record_checkin(st.session_state.user_data["email"], today, rating, symptoms, meds_taken)
+            get_daily_aggregates().add_checkin(today, symptoms, meds_taken)
+            get_outbreak_detector().add(symptoms, location=SITE_LOCATION)
             
-            st.success("Progress saved!")
-            time.sleep(1)
-            st.experimental_rerun()
+            flash("Progress saved!")
+            rerun_fragment()
     else:
         st.success("You've already completed today's check-in!")
     
     # Show progress history
-    if st.session_state.progress_data.get('daily_rating'):
+    if len(progress):
         st.markdown("**Your Progress History**")
-        progress_df = pd.DataFrame(st.session_state.progress_data['daily_rating'])
-        st.line_chart(progress_df.set_index('date')['rating'])
+        st.line_chart(progress.chart_frame()['rating'])
+        
+        trend = progress.trend()
+        if trend is not None:
+            st.caption(f"Average rating {progress.mean_rating():.1f}, changing by {trend:+.2f} per day")
     
     # Medication adherence
-    if st.session_state.progress_data.get('medication_taken'):
-        adherence = sum(1 for entry in st.session_state.progress_data['medication_taken'] if entry['taken'])
-        total = len(st.session_state.progress_data['medication_taken'])
+    adherence, total = progress.adherence()
+    if total:
         st.markdown(f"**Medication Adherence: {adherence}/{total} days ({adherence/total*100:.0f}%)**")
 
 # Function to show reminders
+@fragment
+@timed("app.show_reminders")
 def show_reminders():
     st.markdown("""
     <div class="blue-bg">
@@ -444,25 +428,48 @@ def show_reminders():
     </div>
     """, unsafe_allow_html=True)
     
-    reminders = [
-        {"time": "08:00 AM", "task": "Take morning medication", "completed": False},
-        {"time": "12:00 PM", "task": "Drink plenty of water", "completed": False},
-        {"time": "02:00 PM", "task": "Check temperature", "completed": False},
-        {"time": "06:00 PM", "task": "Take evening medication", "completed": False},
-        {"time": "08:00 PM", "task": "Record symptoms", "completed": False}
-    ]
+    reminders = plan_reminders(current_session().treatment_plan)
+    if not reminders:
+        st.info("Complete your consultation to get reminders from your treatment plan")
+        return
+    
+    email = st.session_state.user_data.get("email")
+    today = datetime.datetime.now(user_timezone()).date()
+    done = get_storage().load_reminders_done(email, today) if email else set()
     
     for reminder in reminders:
         col1, col2, col3 = st.columns([1, 3, 1])
         with col1:
-            st.write(f"**{reminder['time']}**")
+            st.write(f"**{reminder.time:%I:%M %p}**")
         with col2:
-            st.write(reminder['task'])
+            st.write(reminder.task)
         with col3:
-            if st.checkbox("Done", key=f"reminder_{reminder['time']}"):
-                reminder['completed'] = True
+            completed = st.checkbox("Done", value=reminder.key in done, key=f"reminder_{today}_{reminder.key}")
+            if email and completed != (reminder.key in done):
+                get_storage().set_reminder_done(email, today, reminder.key, completed)
+
+# Function to arm the signed-in patient's reminders for their treatment plan,
+# started on `started` (default today) and ending with the plan's duration
+@timed("app.schedule_reminders")
+def schedule_reminders(started=None):
+    email = st.session_state.user_data.get("email")
+    if email:
+        plan = current_session().treatment_plan
+        timezone = user_timezone()
+        until = plan_end(plan, started or datetime.date.today(), timezone)
+        get_reminder_scheduler().set_schedule(email, plan_reminders(plan), timezone, until)
+
+# Function to pick the next question from the answers so far; skips questions
+# that cannot change the outcome and jumps to the last one once it is decided
+def next_step():
+    session = current_session()
+    answers = {int(key[len('symptom_'):]): value for key, value in session.symptoms.items()
+               if key.startswith('symptom_')}
+    present = core.symptoms_from_answers(session.symptoms)
+    return get_scheduler().next_step(session.current_step, answers, present)
 
 # Function to show AI doctor interface
+@timed("app.show_ai_doctor")
 def show_ai_doctor():
     st.markdown("""
     <div class="blue-bg">
@@ -475,108 +482,12 @@ def show_ai_doctor():
     
     with col1:
         st.markdown("### Consultation Chat")
+        last_consultation = st.session_state.get("last_consultation")
+        if last_consultation and current_session().current_step < len(questions):
+            st.caption(f"Your last consultation, on {last_consultation['date']}, "
+                       f"assessed {last_consultation['risk_level']} risk.")
         display_chat()
-        
-        if st.session_state.current_step < len(questions):
-            current_question = questions[st.session_state.current_step]
-            
-            if not st.session_state.chat_history or st.session_state.chat_history[-1][1] != current_question:
-                st.session_state.chat_history.append(("doctor", current_question))
-            
-            if st.session_state.current_step == 0:
-                name = st.text_input("Your answer:", key="input_0", label_visibility="collapsed")
-                if st.button("Submit", key="button_0"):
-                    if name:
-                        st.session_state.symptoms['name'] = name
-                        st.session_state.chat_history.append(("user", name))
-                        st.session_state.current_step += 1
-                        st.experimental_rerun()
-            
-            elif st.session_state.current_step == 1:
-                age = st.number_input("Your answer:", min_value=0, max_value=120, key="input_1", label_visibility="collapsed")
-                if st.button("Submit", key="button_1"):
-                    st.session_state.symptoms['age'] = age
-                    st.session_state.chat_history.append(("user", str(age)))
-                    st.session_state.current_step += 1
-                    st.experimental_rerun()
-            
-            elif st.session_state.current_step == 2:
-                conditions = st.text_input("Your answer:", key="input_2", label_visibility="collapsed")
-                if st.button("Submit", key="button_2"):
-                    st.session_state.symptoms['conditions'] = conditions
-                    st.session_state.chat_history.append(("user", conditions if conditions else "None"))
-                    st.session_state.current_step += 1
-                    st.experimental_rerun()
-            
-            else:
-                options = ["Yes", "No", "Not sure"]
-                response = st.radio("Your answer:", options, key=f"input_{st.session_state.current_step}", label_visibility="collapsed")
-                if st.button("Submit", key=f"button_{st.session_state.current_step}"):
-                    st.session_state.symptoms[f'symptom_{st.session_state.current_step}'] = response
-                    st.session_state.chat_history.append(("user", response))
-                    
-                    if st.session_state.current_step == len(questions) - 1:
-                        # Generate assessment
-                        risk_level, risk_score = assess_risk()
-                        possible_diseases = generate_diagnosis()
-                        st.session_state.treatment_plan = generate_treatment_plan(risk_level)
-                        
-                        # Initialize progress tracking
-                        st.session_state.progress_data = {
-                            "start_date": datetime.date.today(),
-                            "symptoms_track": [],
-                            "medication_taken": [],
-                            "daily_rating": []
-                        }
-                    else:
-                        st.session_state.current_step += 1
-                    
-                    st.experimental_rerun()
-        
-        else:
-            # Show assessment results
-            risk_level, risk_score = assess_risk()
-            possible_diseases = generate_diagnosis()
-            
-            st.markdown("### Assessment Results")
-            
-            if risk_level == "high":
-                st.error(f"Risk Level: HIGH ({risk_score}/7 points)")
-                st.warning("Based on your symptoms, you may be at high risk. Please consult a healthcare professional immediately.")
-            elif risk_level == "medium":
-                st.warning(f"Risk Level: MEDIUM ({risk_score}/7 points)")
-                st.info("Your symptoms suggest moderate risk. Monitor your condition and consider consulting a doctor if symptoms persist.")
-            else:
-                st.success(f"Risk Level: LOW ({risk_score}/7 points)")
-                st.info("Your symptoms suggest low risk. Continue to practice good hygiene and monitor your health.")
-            
-            if possible_diseases:
-                st.markdown("### Possible Conditions")
-                for disease, match_count, description, match_percentage, precautions in possible_diseases[:2]:
-                    st.markdown(f"**{disease}** ({match_percentage:.0f}% match)")
-                    st.caption(description)
-            
-            st.markdown("### Your Treatment Plan")
-            plan = st.session_state.treatment_plan
-            
-            st.markdown("**Medication:**")
-            for med in plan["medication"]:
-                st.markdown(f"- {med}")
-            
-            st.markdown(f"**Rest:** {plan['rest']}")
-            st.markdown(f"**Diet:** {plan['diet']}")
-            st.markdown(f"**Monitoring:** {plan['monitoring']}")
-            st.markdown(f"**Follow-up:** {plan['follow_up']}")
-            st.markdown(f"**Expected Duration:** {plan['duration']}")
-            
-            if st.button("Start Tracking My Progress"):
-                st.session_state.progress_data = {
-                    "start_date": datetime.date.today(),
-                    "symptoms_track": [],
-                    "medication_taken": [],
-                    "daily_rating": []
-                }
-                st.experimental_rerun()
+        show_consultation_step()
     
     with col2:
         # Disease information
@@ -591,26 +502,163 @@ def show_ai_doctor():
         # Reminders
         show_reminders()
 
-# Main app logic
-if st.session_state.show_welcome:
-    show_welcome()
-elif not st.session_state.authenticated:
-    show_auth_ui()
-else:
-    # Header with user info and logout
-    col1, col2, col3 = st.columns([2, 3, 1])
+# Function to show the newest chat messages and the answer input.
+# Answering reruns only this fragment, so the rest of the chat and the
+# right-hand column are not redrawn.
+@fragment
+@timed("app.show_consultation_step")
+def show_consultation_step():
+    session = current_session()
+    if session.current_step < len(questions):
+        current_question = questions[session.current_step]
+        
+        last_message = session.chat_history.last()
+        if last_message is None or last_message[1] != current_question:
+            session.chat_history.append("doctor", current_question)
+            get_session_store().save(session)
+        
+        st.markdown(session.chat_history.render_html(session.chat_rendered), unsafe_allow_html=True)
+        
+        if session.current_step == 0:
+            name = st.text_input("Your answer:", key="input_0", label_visibility="collapsed")
+            if st.button("Submit", key="button_0"):
+                if name:
+                    session.record_answer('name', name)
+                    session.chat_history.append("user", name)
+                    session.current_step += 1
+                    get_session_store().save(session)
+                    rerun_fragment()
+        
+        elif session.current_step == 1:
+            age = st.number_input("Your answer:", min_value=0, max_value=120, key="input_1", label_visibility="collapsed")
+            if st.button("Submit", key="button_1"):
+                session.record_answer('age', age)
+                session.chat_history.append("user", str(age))
+                session.current_step += 1
+                get_session_store().save(session)
+                rerun_fragment()
+        
+        elif session.current_step == 2:
+            conditions = st.text_input("Your answer:", key="input_2", label_visibility="collapsed")
+            if st.button("Submit", key="button_2"):
+                session.record_answer('conditions', conditions)
+                session.chat_history.append("user", conditions if conditions else "None")
+                session.current_step = next_step()
+                get_session_store().save(session)
+                rerun_fragment()
+        
+        else:
+            options = ["Yes", "No", "Not sure"]
+            response = st.radio("Your answer:", options, key=f"input_{session.current_step}", label_visibility="collapsed")
+            if st.button("Submit", key=f"button_{session.current_step}"):
+                session.record_answer(f'symptom_{session.current_step}', response)
+                session.chat_history.append("user", response)
+                
+                if session.current_step == len(questions) - 1:
+                    # Generate assessment
+                    risk_level, risk_score = assess_risk()
+                    possible_diseases = generate_diagnosis()
+                    session.risk_level = risk_level
+                    st.session_state.last_consultation = {"date": datetime.date.today(), "risk_level": risk_level}
+                    
+                    if st.session_state.user_data.get("email"):
+                        get_storage().save_consultation(st.session_state.user_data["email"], session.symptoms,
+                                                        risk_level, risk_score, session.treatment_plan)
+                    get_daily_aggregates().add_consultation(datetime.date.today(), risk_level)
+                    get_outbreak_detector().add(core.symptoms_from_answers(session.symptoms), location=SITE_LOCATION)
+                    schedule_reminders()
+                    
+                    # Initialize progress tracking
+                    session.progress = ProgressLog(datetime.date.today())
+                    
+                    # The results and the progress panel need a full rerun
+                    session.current_step += 1
+                    get_session_store().save(session)
+                    rerun()
+                else:
+                    session.current_step = next_step()
+                    get_session_store().save(session)
+                    rerun_fragment()
     
-    with col1:
-        st.markdown(f"### Welcome, {st.session_state.user_data.get('name', 'User')}!")
+    else:
+        # Show assessment results
+        risk_level, risk_score = assess_risk()
+        possible_diseases = generate_diagnosis(limit=2)
+        
+        st.markdown("### Assessment Results")
+        
+        if risk_level == "high":
+            st.error(f"Risk Level: HIGH ({risk_score}/7 points)")
+            st.warning("Based on your symptoms, you may be at high risk. Please consult a healthcare professional immediately.")
+        elif risk_level == "medium":
+            st.warning(f"Risk Level: MEDIUM ({risk_score}/7 points)")
+            st.info("Your symptoms suggest moderate risk. Monitor your condition and consider consulting a doctor if symptoms persist.")
+        else:
+            st.success(f"Risk Level: LOW ({risk_score}/7 points)")
+            st.info("Your symptoms suggest low risk. Continue to practice good hygiene and monitor your health.")
+        
+        if possible_diseases:
+            st.markdown("### Possible Conditions")
+            for disease, match_count, description, match_percentage, precautions in possible_diseases:
+                st.markdown(f"**{disease}** ({match_percentage:.0f}% match)")
+                st.caption(description)
+        
+        st.markdown("### Your Treatment Plan")
+        plan = session.treatment_plan
+        
+        st.markdown("**Medication:**")
+        for med in plan["medication"]:
+            st.markdown(f"- {med}")
+        
+        st.markdown(f"**Rest:** {plan['rest']}")
+        st.markdown(f"**Diet:** {plan['diet']}")
+        st.markdown(f"**Monitoring:** {plan['monitoring']}")
+        st.markdown(f"**Follow-up:** {plan['follow_up']}")
+        st.markdown(f"**Expected Duration:** {plan['duration']}")
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("Start Tracking My Progress"):
+                session.progress = ProgressLog(datetime.date.today())
+                get_session_store().save(session)
+                rerun()
+        with col2:
+            if st.button("New consultation", key="new_consultation"):
+                session.new_consultation()
+                get_session_store().save(session)
+                rerun()
+
+# Main app logic, timed as one rerun and profiled for sampled sessions
+increment("app.reruns")
+with full_run(), timer("app.rerun"), RerunProfiler(st.session_state.session_id):
+    show_flash_messages()
+
+    if st.session_state.show_welcome:
+        show_welcome()
+    elif not st.session_state.authenticated:
+        show_auth_ui()
+    else:
+        # Header with user info and logout
+        col1, col2, col3 = st.columns([2, 3, 1])
     
-    with col3:
-        if st.button("Logout"):
-            for key in list(st.session_state.keys()):
-                del st.session_state[key]
-            st.experimental_rerun()
+        with col1:
+            st.markdown(f"### Welcome, {st.session_state.user_data.get('name', 'User')}!")
+    
+        with col3:
+            if st.button("Logout"):
+                if st.session_state.user_data.get("email"):
+                    get_reminder_scheduler().cancel(st.session_state.user_data["email"])
+                get_credentials().revoke(st.session_state.get("auth_token"))
+                # The next run starts a fresh session under a new id
+                get_session_store().discard(st.session_state.session_id)
+                if query_params is not None:
+                    query_params.pop("session", None)
+                for key in list(st.session_state.keys()):
+                    del st.session_state[key]
+                rerun()
     
-    # Main content
-    show_ai_doctor()
+        # Main content
+        show_ai_doctor()
 
 # Footer with disclaimer
 st.markdown("---")
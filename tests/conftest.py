@@ -0,0 +1,9 @@
+# Shared set-up for the test suite: cheap password hashing, and a private
+# cache directory so knowledge-base snapshots never land in ~/.cache.
+import os
+import tempfile
+
+os.environ.setdefault("EPIDEMICCARE_SCRYPT_N", "1024")
+os.environ.setdefault("XDG_CACHE_HOME", tempfile.mkdtemp(prefix="epidemiccare-tests-"))
+os.environ.setdefault("EPIDEMICCARE_DB", "memory://")
+os.environ.setdefault("EPIDEMICCARE_SESSION_URL", "memory://")
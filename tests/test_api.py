@@ -0,0 +1,49 @@
+import asyncio
+import json
+
+from epidemiccare.api import LatencyStats, TriageAPI
+from epidemiccare.metrics import percentile
+
+
+def test_percentile_is_nearest_rank():
+    values = list(range(1, 51))
+    assert percentile(values, 0.5) == 25
+    assert percentile(values, 0.99) == 50
+    assert percentile([7], 0.01) == 7
+
+
+def test_latency_stats_use_nearest_rank():
+    stats = LatencyStats()
+    for milliseconds in range(1, 51):
+        stats.record(milliseconds / 1000)
+    assert stats.snapshot()["latency_ms"] == {"p50": 25.0, "p99": 50.0}
+    assert LatencyStats().snapshot()["latency_ms"] == {"p50": None, "p99": None}
+
+
+def call(app, path, chunks):
+    messages = [{"type": "http.request", "body": chunk, "more_body": i < len(chunks) - 1}
+                for i, chunk in enumerate(chunks)]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": "POST", "path": path, "headers": []}
+    asyncio.run(app(scope, receive, send))
+    return sent[0]["status"], json.loads(sent[1]["body"])
+
+
+def test_oversized_body_is_rejected():
+    app = TriageAPI(max_body_bytes=64)
+    status, payload = call(app, "/treatment-plan", [b'{"risk_level": "', b"x" * 100, b'"}'])
+    assert status == 413
+    assert "64 bytes" in payload["error"]
+
+
+def test_treatment_plan():
+    status, payload = call(TriageAPI(), "/treatment-plan", [b'{"risk_level": "high"}'])
+    assert status == 200
+    assert payload["risk_level"] == "high"
@@ -0,0 +1,93 @@
+import pytest
+
+from epidemiccare.auth import (AuthError, CredentialStore, PasswordResetRequired, RateLimited, RateLimiter,
+                               hash_password, verify_password)
+from epidemiccare.storage import MemoryStorage
+
+PASSWORD = "correct horse"
+
+
+@pytest.fixture
+def clock():
+    return [1000.0]
+
+
+@pytest.fixture
+def credentials(clock):
+    store = CredentialStore(MemoryStorage(), workers=2, secret=b"test-secret", token_ttl=3600,
+                            clock=lambda: clock[0])
+    yield store
+    store._pool.shutdown()
+
+
+def test_hash_round_trip():
+    encoded = hash_password(PASSWORD)
+    assert verify_password(encoded, PASSWORD)
+    assert not verify_password(encoded, "wrong password")
+
+
+def test_register_then_login(credentials):
+    token = credentials.register("a@example.com", PASSWORD, "Ann")
+    assert credentials.session_user(token) == "a@example.com"
+    assert credentials.session_user(credentials.login("a@example.com", PASSWORD)) == "a@example.com"
+
+
+def test_register_rejects_short_password(credentials):
+    with pytest.raises(AuthError):
+        credentials.register("a@example.com", "short")
+
+
+def test_register_rejects_existing_account(credentials):
+    credentials.register("a@example.com", PASSWORD)
+    with pytest.raises(AuthError):
+        credentials.register("a@example.com", "another password")
+    credentials.login("a@example.com", PASSWORD)
+
+
+def test_login_rejects_wrong_password_and_unknown_account(credentials):
+    credentials.register("a@example.com", PASSWORD)
+    with pytest.raises(AuthError):
+        credentials.login("a@example.com", "wrong password")
+    with pytest.raises(AuthError):
+        credentials.login("b@example.com", PASSWORD)
+
+
+def test_account_without_password_needs_reset(credentials):
+    credentials.storage.save_user("legacy@example.com", "Lee")
+    with pytest.raises(PasswordResetRequired):
+        credentials.login("legacy@example.com", PASSWORD)
+    credentials.reset_password("legacy@example.com", PASSWORD)
+    assert credentials.session_user(credentials.login("legacy@example.com", PASSWORD)) == "legacy@example.com"
+
+
+def test_token_expires_and_revokes(credentials, clock):
+    token = credentials.register("a@example.com", PASSWORD)
+    clock[0] += 3601
+    assert credentials.session_user(token) is None
+    token = credentials.login("a@example.com", PASSWORD)
+    credentials.revoke(token)
+    assert credentials.session_user(token) is None
+
+
+def test_forged_token_is_rejected(credentials):
+    token = credentials.register("a@example.com", PASSWORD)
+    payload, signature = token.split(".")
+    assert credentials.session_user(payload + "." + signature[::-1]) is None
+    assert credentials.session_user("not a token") is None
+
+
+def test_rate_limiter_refills(clock):
+    limiter = RateLimiter(rate=1.0, capacity=2, clock=lambda: clock[0])
+    assert limiter.allow("key") and limiter.allow("key")
+    assert not limiter.allow("key")
+    clock[0] += 1
+    assert limiter.allow("key")
+
+
+def test_login_is_rate_limited_per_account(credentials):
+    credentials.register("a@example.com", PASSWORD)
+    for _ in range(4):
+        with pytest.raises(AuthError):
+            credentials.login("a@example.com", "wrong password")
+    with pytest.raises(RateLimited):
+        credentials.login("a@example.com", PASSWORD)
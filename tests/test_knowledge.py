@@ -0,0 +1,60 @@
+import json
+import os
+import shutil
+
+import pytest
+
+from epidemiccare.knowledge import DATA_DIR, KnowledgeBaseError, KnowledgeBaseLoader
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    directory = tmp_path / "data"
+    shutil.copytree(DATA_DIR, directory)
+    return directory
+
+
+def edit(path, change):
+    document = json.loads(path.read_text())
+    change(document)
+    path.write_text(json.dumps(document))
+    # A later mtime, so the loader notices the edit however coarse the clock
+    info = os.stat(path)
+    os.utime(path, ns=(info.st_atime_ns, info.st_mtime_ns + 10 ** 9))
+
+
+def loader(data_dir, tmp_path):
+    return KnowledgeBaseLoader(str(data_dir), cache_dir=str(tmp_path / "cache"))
+
+
+def test_questions_list_their_symptoms(data_dir, tmp_path):
+    knowledge_base = loader(data_dir, tmp_path).get()
+    assert len(knowledge_base.questions) == len(knowledge_base.question_symptoms)
+    assert knowledge_base.question_symptoms[4] == ("cough", "difficulty breathing")
+
+
+def test_version_1_questions_are_plain_strings(data_dir, tmp_path):
+    def downgrade(document):
+        document["version"] = 1
+        document["questions"] = [question["text"] for question in document["questions"]]
+
+    edit(data_dir / "questions.json", downgrade)
+    knowledge_base = loader(data_dir, tmp_path).get()
+    assert knowledge_base.questions[0].startswith("Hello")
+    assert set(knowledge_base.question_symptoms) == {()}
+
+
+@pytest.mark.parametrize("source, change", [
+    ("treatment_plans.json", lambda document: document["treatment_plans"].pop("high")),
+    ("treatment_plans.json", lambda document: document["treatment_plans"]["low"].pop("duration")),
+    ("questions.json", lambda document: document.update(questions="What's your name?")),
+    ("questions.json", lambda document: document["questions"][3].update(symptoms="fever")),
+    ("questions.json", lambda document: document["questions"].append(42)),
+])
+def test_bad_edit_is_rejected_and_previous_version_kept(data_dir, tmp_path, source, change):
+    knowledge = loader(data_dir, tmp_path)
+    before = knowledge.get()
+    edit(data_dir / source, change)
+    assert knowledge.get() is before
+    with pytest.raises(KnowledgeBaseError):
+        loader(data_dir, tmp_path / "fresh").get()
@@ -0,0 +1,67 @@
+from epidemiccare.core import get_triage
+from epidemiccare.matcher import SymptomMatcher
+
+
+def matcher():
+    return SymptomMatcher({"fever": "fever", "cough": "cough", "high fever": "fever", "tired": "fatigue",
+                           "fatigue": "fatigue", "headache": "headache"})
+
+
+def test_find_prefers_longest_leftmost_match():
+    assert matcher().find("A high fever and a cough") == ["fever", "cough"]
+
+
+def test_find_needs_word_boundaries():
+    assert matcher().find("coughing feverishly") == []
+
+
+def test_canonical_maps_synonyms():
+    assert matcher().canonical("Tired") == "fatigue"
+    assert matcher().canonical("Rash") == "rash"
+
+
+def test_negation_before_mention():
+    assert matcher().mentions("no fever, cough for 3 days") == (["cough"], ["fever"])
+
+
+def test_negation_carries_over_or_list():
+    assert matcher().mentions("I don't have fever or cough") == ([], ["fever", "cough"])
+
+
+def test_negation_stops_at_scope_break():
+    assert matcher().mentions("no fever but a cough") == (["cough"], ["fever"])
+
+
+def test_negation_after_mention():
+    assert matcher().mentions("headache is gone, still tired") == (["fatigue"], ["headache"])
+
+
+def test_affirmed_wins_over_denied():
+    assert matcher().mentions("no fever yesterday. fever today") == (["fever"], [])
+
+
+def test_evidence_merges_free_text():
+    present, absent = get_triage().evidence({"symptom_3": "Yes", "conditions": "asthma, no cough"})
+    assert present == ["fever"]
+    assert absent == ["cough"]
+
+
+def test_explicit_answer_wins_over_free_text():
+    present, absent = get_triage().evidence({"symptom_4": "Yes", "symptom_8": "no cough"})
+    assert "cough" in present
+    assert "cough" not in absent
+
+
+def test_questions_only_count_listed_symptoms():
+    triage = get_triage()
+    present, _ = triage.evidence({"symptom_8": "I have a cough and smell smoke"})
+    assert present == ["cough"]
+    assert triage.key_symptoms("symptom_6") == ("loss of taste", "loss of smell")
+    assert triage.key_symptoms("symptom_fever") == ("fever",)
+
+
+def test_assess_scores_risk_groups():
+    triage = get_triage()
+    assert triage.assess(["fever", "cough", "loss of smell"]) == ("high", 7)
+    assert triage.assess(["fever", "cough"]) == ("medium", 4)
+    assert triage.assess(["fatigue"]) == ("low", 0)
@@ -0,0 +1,71 @@
+import datetime
+
+from epidemiccare.outbreak import LogAlertSink, OutbreakDetector, cell_geohash, grid_cell
+from epidemiccare.storage import MemoryStorage
+
+DAY = 24 * 3600.0
+START = 1772323200.0
+
+
+def feed(detector, daily_counts, symptom="cough", location=None):
+    raised = []
+    for day, count in enumerate(daily_counts):
+        for report in range(count):
+            raised += detector.add([symptom], START + day * DAY + report, location)
+    return raised
+
+
+def test_steady_counts_raise_no_alert():
+    detector = OutbreakDetector(clock=lambda: START)
+    assert feed(detector, [5, 6, 4, 5, 6, 5, 4, 6, 5, 5, 6, 4, 5, 6]) == []
+
+
+def test_cusum_flags_a_surge_once():
+    sink = LogAlertSink()
+    detector = OutbreakDetector(sink=sink, clock=lambda: START)
+    raised = feed(detector, [5, 6, 4, 5, 6, 5, 4, 6, 5, 5, 40])
+    assert [(alert.kind, alert.symptom) for alert in raised] == [("surge", "cough")]
+    assert raised[0].count < 40, "the surge is reported while the day fills up"
+    assert list(sink.alerts) == raised
+
+
+def test_no_alert_during_warmup():
+    detector = OutbreakDetector(clock=lambda: START)
+    assert feed(detector, [1, 40]) == []
+
+
+def test_hotspot_is_reported_by_one_region():
+    detector = OutbreakDetector(clock=lambda: START)
+    location = (12.97, 77.59)
+    raised = feed(detector, [5, 6, 4, 5, 6, 5, 4, 6, 5, 5, 40], location=location)
+    hotspots = [alert for alert in raised if alert.kind == "hotspot"]
+    assert len(hotspots) == 1
+    x, y = grid_cell(*location)
+    block = {cell_geohash((x + dx, y + dy)) for dx in (-1, 0, 1) for dy in (-1, 0, 1)}
+    assert hotspots[0].region in block
+
+
+def test_geohash_matches_reference():
+    # Reference value from the geohash algorithm for 57.64911, 10.40744
+    assert cell_geohash(grid_cell(57.64911, 10.40744)) == "u4pru"
+
+
+def test_checkins_and_consultations_share_series():
+    detector = OutbreakDetector(clock=lambda: START)
+    detector.add(["Headache", " COUGH "], START)
+    detector.add(["headache", "cough"], START)
+    assert len(detector) == 2
+
+
+def test_warmup_from_storage_trains_without_alerting():
+    storage = MemoryStorage()
+    first = datetime.date(2026, 3, 1)
+    for day in range(12):
+        for patient in range(40 if day == 11 else 5):
+            storage.record_checkin(f"p{patient}@example.com", first + datetime.timedelta(days=day), 5, ["Cough"], True)
+    storage.save_consultation("c@example.com", {"symptom_4": "Yes"}, "medium", 2, {})
+    detector = OutbreakDetector.from_storage(storage, clock=lambda: START)
+    assert detector.events == 5 * 11 + 40 + 1
+    assert detector.alerts == 0
+    assert all(series.alerted is None for series in detector._series.values())
+    assert len(detector) == 2
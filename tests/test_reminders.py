@@ -0,0 +1,81 @@
+import datetime
+
+from epidemiccare.reminders import (LogNotifier, ReminderScheduler, TimingWheel, _reminder, plan_days,
+                                    plan_end, plan_reminders)
+
+# 2026-03-01 00:00 UTC
+MIDNIGHT = 1772323200.0
+HOUR = 3600.0
+DAY = 24 * HOUR
+
+
+def test_wheel_fires_items_when_due():
+    wheel = TimingWheel(tick=60, slots=8, start=0)
+    wheel.schedule(120, "a")
+    wheel.schedule(600, "b")
+    assert wheel.advance(60) == []
+    assert wheel.advance(180) == ["a"]
+    # Past a full turn of the wheel; "b" was in the same slot as tick 2
+    assert wheel.advance(600) == ["b"]
+    assert len(wheel) == 0
+
+
+def test_wheel_fires_overdue_items_on_next_advance():
+    wheel = TimingWheel(tick=60, slots=8, start=600)
+    wheel.schedule(0, "late")
+    assert wheel.advance(660) == ["late"]
+
+
+def test_wheel_discard():
+    wheel = TimingWheel(tick=60, slots=8, start=0)
+    for when in (60, 120, 180):
+        wheel.schedule(when, when)
+    assert wheel.discard(lambda item: item >= 120) == 2
+    assert len(wheel) == 1
+    assert wheel.advance(300) == [60]
+
+
+def test_plan_reminders_and_duration():
+    plan = {"medication": ["Paracetamol 500mg", "Cough syrup as needed"], "monitoring": "Check temperature twice daily",
+            "diet": "Plenty of fluids", "duration": "7-10 days"}
+    tasks = [(reminder.time.hour, reminder.task) for reminder in plan_reminders(plan)]
+    assert tasks[0] == (8, "Take morning medication (Paracetamol 500mg)")
+    assert (12, "Drink plenty of water") in tasks
+    assert (20, "Check temperature") in tasks
+    assert plan_days(plan) == 10
+    assert plan_end(plan, datetime.date(2026, 3, 1), "UTC") == MIDNIGHT + 10 * DAY
+
+
+def test_scheduler_dispatches_daily_until_the_plan_ends():
+    clock = [MIDNIGHT]
+    notifier = LogNotifier()
+    scheduler = ReminderScheduler(notifier, clock=lambda: clock[0])
+    scheduler.set_schedule("a@example.com", [_reminder(9, "Take medication")], "UTC", until=MIDNIGHT + 2 * DAY)
+    assert len(scheduler) == 1
+    assert scheduler.run_pending(MIDNIGHT + 8 * HOUR) == 0
+    assert scheduler.run_pending(MIDNIGHT + 9 * HOUR) == 1
+    assert scheduler.run_pending(MIDNIGHT + DAY + 9 * HOUR) == 1
+    assert len(scheduler) == 0
+    assert scheduler.run_pending(MIDNIGHT + 2 * DAY + 9 * HOUR) == 0
+    assert [notification.due for notification in notifier.sent] == [MIDNIGHT + 9 * HOUR, MIDNIGHT + DAY + 9 * HOUR]
+
+
+def test_scheduler_uses_patient_timezone():
+    clock = [MIDNIGHT]
+    notifier = LogNotifier()
+    scheduler = ReminderScheduler(notifier, clock=lambda: clock[0])
+    scheduler.set_schedule("a@example.com", [_reminder(9, "Take medication")], "Asia/Kolkata")
+    # 09:00 in Kolkata is 03:30 UTC
+    assert scheduler.run_pending(MIDNIGHT + 3.5 * HOUR) == 1
+
+
+def test_cancel_and_replace_drop_old_reminders():
+    clock = [MIDNIGHT]
+    scheduler = ReminderScheduler(LogNotifier(), clock=lambda: clock[0])
+    scheduler.set_schedule("a@example.com", [_reminder(9, "Old task")], "UTC")
+    scheduler.set_schedule("a@example.com", [_reminder(10, "New task")], "UTC")
+    scheduler.set_schedule("b@example.com", [_reminder(9, "Other task")], "UTC")
+    scheduler.cancel("b@example.com")
+    assert len(scheduler) == 1
+    assert scheduler.run_pending(MIDNIGHT + 12 * HOUR) == 1
+    assert [notification.reminder.task for notification in scheduler.notifier.sent] == ["New task"]
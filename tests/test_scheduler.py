@@ -0,0 +1,21 @@
+from epidemiccare.scheduler import get_scheduler
+
+
+def test_risk_bounds_count_free_text_evidence():
+    scheduler = get_scheduler()
+    answers = {3: "Yes", 4: "No", 5: "No", 6: "No", 7: "No"}
+    assert scheduler.risk_bounds(answers) == ("low", "low")
+    assert scheduler.risk_bounds(answers, present=["cough"]) == ("medium", "medium")
+    assert scheduler.risk_bounds({3: "Yes"}, present=["loss of smell"]) == ("high", "high")
+
+
+def test_next_step_asks_intro_questions_first():
+    scheduler = get_scheduler()
+    assert scheduler.next_step(0, {}) == 1
+    assert scheduler.next_step(2, {}) in scheduler.symptom_steps
+
+
+def test_next_step_closes_once_everything_is_answered():
+    scheduler = get_scheduler()
+    answers = {step: "No" for step in scheduler.symptom_steps + scheduler.extra_steps}
+    assert scheduler.next_step(8, answers) == scheduler.final_step
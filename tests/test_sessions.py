@@ -0,0 +1,88 @@
+import pytest
+
+from epidemiccare.session import (MemorySessionBackend, PatientSession, SessionError, SessionStore)
+
+
+@pytest.fixture
+def clock():
+    return [0.0]
+
+
+@pytest.fixture
+def store(clock):
+    return SessionStore(MemorySessionBackend(), idle_timeout=60, clock=lambda: clock[0])
+
+
+def test_snapshot_round_trip():
+    session = PatientSession()
+    session.record_answer("symptom_3", "Yes")
+    session.chat_history.append("doctor", "Have you had a fever?")
+    session.chat_history.append("user", "Yes")
+    session.current_step = 4
+    session.user = {"email": "a@example.com"}
+    restored = PatientSession.from_snapshot(session.snapshot())
+    assert restored.session_id == session.session_id
+    assert restored.symptoms == {"symptom_3": "Yes"}
+    assert list(restored.chat_history) == [("doctor", "Have you had a fever?"), ("user", "Yes")]
+    assert restored.current_step == 4
+    assert restored.user == {"email": "a@example.com"}
+
+
+def test_corrupt_snapshot_is_rejected():
+    with pytest.raises(SessionError):
+        PatientSession.from_snapshot(b"not a snapshot")
+
+
+def test_new_consultation_keeps_progress():
+    session = PatientSession()
+    session.record_answer("symptom_3", "Yes")
+    session.current_step = 10
+    session.risk_level = "medium"
+    session.new_consultation()
+    assert session.symptoms == {}
+    assert session.current_step == 0
+    assert len(session.chat_history) == 0
+    assert session.risk_level == "medium"
+
+
+def test_saved_session_resumes_from_backend(store):
+    session = store.create()
+    session.record_answer("symptom_3", "No")
+    store.save(session)
+    store.flush()
+    other = SessionStore(store.backend)
+    resumed = other.resume(session.session_id)
+    assert resumed.symptoms == {"symptom_3": "No"}
+    assert other.resume("unknown") is None
+
+
+def test_rotate_moves_session_to_new_id(store):
+    session = store.create()
+    session.current_step = 5
+    store.flush()
+    old_id = session.session_id
+    rotated = store.rotate(old_id)
+    assert rotated is session
+    assert rotated.session_id != old_id
+    assert store.backend.load(old_id) is None
+    store.flush()
+    fresh = SessionStore(store.backend)
+    assert fresh.resume(old_id) is None
+    assert fresh.resume(rotated.session_id).current_step == 5
+
+
+def test_discard_removes_session(store):
+    session = store.create()
+    store.flush()
+    store.discard(session.session_id)
+    assert len(store) == 0
+    assert store.backend.load(session.session_id) is None
+
+
+def test_sweep_evicts_idle_sessions_after_saving(store, clock):
+    session = store.create()
+    session.current_step = 3
+    clock[0] += 61
+    store.sweep(force=True)
+    assert len(store) == 0
+    assert store.get(session.session_id).current_step == 3
@@ -0,0 +1,76 @@
+import datetime
+
+import pytest
+
+from epidemiccare.storage import MemoryStorage, SQLiteStorage
+
+DAY = datetime.date(2026, 3, 1)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def storage(request, tmp_path):
+    if request.param == "memory":
+        yield MemoryStorage()
+    else:
+        storage = SQLiteStorage(str(tmp_path / "test.db"), pool_size=2)
+        yield storage
+        storage.close()
+
+
+def test_unknown_user_has_no_history(storage):
+    assert storage.load_history("nobody@example.com") is None
+    assert storage.load_password_hash("nobody@example.com") is None
+
+
+def test_create_account_once(storage):
+    assert storage.create_account("a@example.com", "Ann", "hash-1")
+    assert not storage.create_account("a@example.com", "Impostor", "hash-2")
+    assert storage.load_password_hash("a@example.com") == "hash-1"
+    assert storage.load_history("a@example.com")["name"] == "Ann"
+
+
+def test_create_account_refuses_user_without_password(storage):
+    storage.save_user("legacy@example.com", "Lee")
+    assert not storage.create_account("legacy@example.com", "Lee", "hash")
+    assert storage.load_password_hash("legacy@example.com") is None
+
+
+def test_history_holds_latest_consultation_and_checkins(storage):
+    storage.save_user("a@example.com", "Ann")
+    storage.save_consultation("a@example.com", {"symptom_3": "Yes"}, "medium", 3, {"rest": "Bed rest"})
+    storage.record_checkin("a@example.com", DAY + datetime.timedelta(days=1), 6, ["Cough"], False)
+    storage.record_checkin("a@example.com", DAY, 4, ["Fever"], True)
+    history = storage.load_history("a@example.com")
+    assert history["consultation"]["answers"] == {"symptom_3": "Yes"}
+    assert history["consultation"]["risk_level"] == "medium"
+    assert [checkin["date"] for checkin in history["checkins"]] == [DAY, DAY + datetime.timedelta(days=1)]
+    assert history["checkins"][0] == {"date": DAY, "rating": 4, "symptoms": ["Fever"], "taken": True}
+
+
+def test_checkin_replaces_same_day(storage):
+    storage.record_checkin("a@example.com", DAY, 4, ["Fever"], True)
+    storage.record_checkin("a@example.com", DAY, 7, [], False)
+    assert list(storage.iter_checkins()) == [(DAY, [], False)]
+
+
+def test_iter_checkins_since(storage):
+    for offset in range(3):
+        storage.record_checkin("a@example.com", DAY + datetime.timedelta(days=offset), 5, ["Cough"], True)
+    since = DAY + datetime.timedelta(days=1)
+    assert sorted(day for day, _, _ in storage.iter_checkins(since)) == [since, since + datetime.timedelta(days=1)]
+
+
+def test_iterators_yield_in_date_order(storage):
+    for offset, email in ((2, "a@example.com"), (0, "b@example.com"), (1, "c@example.com")):
+        storage.record_checkin(email, DAY + datetime.timedelta(days=offset), 5, ["Cough"], True)
+    assert [day for day, _, _ in storage.iter_checkins()] == [DAY + datetime.timedelta(days=n) for n in range(3)]
+    storage.save_consultation("a@example.com", {}, "low", 0, {})
+    assert [risk_level for _, risk_level in storage.iter_consultations()] == ["low"]
+
+
+def test_reminders_done(storage):
+    storage.set_reminder_done("a@example.com", DAY, "08:00 Take medication")
+    storage.set_reminder_done("a@example.com", DAY, "20:00 Record symptoms")
+    storage.set_reminder_done("a@example.com", DAY, "08:00 Take medication", False)
+    assert storage.load_reminders_done("a@example.com", DAY) == {"20:00 Record symptoms"}
+    assert storage.load_reminders_done("a@example.com", DAY + datetime.timedelta(days=1)) == set()